@@ -0,0 +1,325 @@
+"""Historial local de libros de Mendez y comprobantes de ARCA en SQLite.
+
+Cada cruce puede guardar sus movimientos y comprobantes por CUIT y período.
+Los faltantes de un período se buscan después en los períodos vecinos con
+consultas sobre la clave PV-Nro indexada, sin volver a leer los TXT ni los
+ZIP anteriores.
+"""
+
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from procesador import ErrorProcesamiento
+
+RUTA_ALMACEN = "historial.sqlite"
+
+# Segundos que una conexión espera a que otra libere la base
+ESPERA_BLOQUEO = 30
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS mendez (
+    cuit TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    pv INTEGER NOT NULL,
+    nro INTEGER NOT NULL,
+    fecha TEXT,
+    comprobante TEXT,
+    letra TEXT,
+    razon_social TEXT,
+    condicion TEXT,
+    cuit_contraparte TEXT,
+    concepto INTEGER,
+    jurisdiccion TEXT,
+    total_centavos INTEGER
+);
+CREATE INDEX IF NOT EXISTS mendez_clave ON mendez (cuit, clave, periodo);
+
+CREATE TABLE IF NOT EXISTS arca (
+    cuit TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    pv INTEGER NOT NULL,
+    nro INTEGER NOT NULL,
+    fecha TEXT,
+    tipo TEXT,
+    nro_doc TEXT,
+    denominacion TEXT,
+    total REAL
+);
+CREATE INDEX IF NOT EXISTS arca_clave ON arca (cuit, clave, periodo);
+
+CREATE TABLE IF NOT EXISTS periodos (
+    cuit TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    fuente TEXT NOT NULL,
+    filas INTEGER NOT NULL,
+    guardado TEXT NOT NULL,
+    PRIMARY KEY (cuit, periodo, fuente)
+);
+"""
+
+# Columnas de movimientos de Mendez -> columnas de la tabla mendez
+COLUMNAS_MENDEZ = {
+    "Fecha": "fecha",
+    "Comprobante": "comprobante",
+    "Letra": "letra",
+    "Razon Social": "razon_social",
+    "Condicion": "condicion",
+    "CUIT": "cuit_contraparte",
+    "Concepto": "concepto",
+    "Jurisdiccion": "jurisdiccion",
+    "Total": "total_centavos",
+}
+
+# Columna de la tabla arca -> nombres posibles en el CSV de ARCA
+COLUMNAS_ARCA = {
+    "fecha": ("Fecha de Emisión",),
+    "tipo": ("Tipo de Comprobante",),
+    "nro_doc": (
+        "Nro. Doc. Emisor/Receptor",
+        "Nro. Doc. Emisor",
+        "Nro. Doc. Receptor",
+    ),
+    "denominacion": (
+        "Denominación Emisor/Receptor",
+        "Denominación Emisor",
+        "Denominación Receptor",
+    ),
+    "total": ("Imp. Total",),
+}
+
+FUENTES = ("mendez", "arca")
+
+
+# ============================================================================
+# CLAVES Y PERÍODOS
+# ============================================================================
+
+
+def normalizar_cuit(cuit):
+    """Deja solo los dígitos del CUIT"""
+    return "".join(caracter for caracter in str(cuit) if caracter.isdigit())
+
+
+def normalizar_periodo(periodo):
+    """Convierte el período del encabezado (MM/AAAA) al formato AAAA-MM"""
+    texto = str(periodo).strip()
+    for formato in ("%m/%Y", "%m-%Y", "%Y-%m", "%Y%m"):
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m")
+        except ValueError:
+            continue
+    raise ErrorProcesamiento(f"No se reconoce el período del libro: {periodo!r}")
+
+
+def periodos_vecinos(periodo, meses=1):
+    """Devuelve los períodos AAAA-MM a menos de 'meses' de distancia (sin el propio)"""
+    base = pd.Period(normalizar_periodo(periodo), freq="M")
+    return [
+        str(base + desplazamiento)
+        for desplazamiento in range(-meses, meses + 1)
+        if desplazamiento != 0
+    ]
+
+
+def claves_comprobantes(df, columna_pv, columna_nro):
+    """Arma la clave PV-Nro con ceros a la izquierda, igual que agregar_clave"""
+    pv = pd.to_numeric(df[columna_pv], errors="coerce")
+    nro = pd.to_numeric(df[columna_nro], errors="coerce")
+    validas = pv.notna() & nro.notna()
+
+    claves = pd.DataFrame(
+        {
+            "pv": pv[validas].astype("int64"),
+            "nro": nro[validas].astype("int64"),
+        }
+    )
+    claves["clave"] = (
+        claves["pv"].astype(str).str.zfill(5)
+        + "-"
+        + claves["nro"].astype(str).str.zfill(8)
+    )
+    return claves, validas
+
+
+# ============================================================================
+# ALMACÉN
+# ============================================================================
+
+
+class AlmacenLibros:
+    """Base SQLite con los movimientos y comprobantes guardados por CUIT y período.
+
+    Cada operación abre su propia conexión, así que una misma instancia se
+    puede usar desde varios hilos (por ejemplo, sesiones de Streamlit).
+    """
+
+    def __init__(self, ruta=RUTA_ALMACEN):
+        self.ruta = ruta
+        with closing(self.conectar()) as con:
+            con.executescript(ESQUEMA)
+
+    def conectar(self):
+        """Abre una conexión nueva a la base"""
+        return sqlite3.connect(self.ruta, timeout=ESPERA_BLOQUEO)
+
+    def reemplazar(self, fuente, cuit, periodo, filas):
+        """Reemplaza en una transacción lo guardado de la fuente para el CUIT y período"""
+        with closing(self.conectar()) as con, con:
+            con.execute(
+                f"DELETE FROM {fuente} WHERE cuit = ? AND periodo = ?", (cuit, periodo)
+            )
+            filas.to_sql(fuente, con, if_exists="append", index=False)
+            con.execute(
+                "INSERT OR REPLACE INTO periodos VALUES (?, ?, ?, ?, ?)",
+                (
+                    cuit,
+                    periodo,
+                    fuente,
+                    len(filas),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+
+    def guardar_mendez(self, cuit, periodo, movimientos):
+        """Guarda los movimientos de un libro (los de procesar_archivo)"""
+        cuit = normalizar_cuit(cuit)
+        periodo = normalizar_periodo(periodo)
+        claves, validas = claves_comprobantes(movimientos, "PV", "Nro")
+
+        filas = movimientos.loc[validas, list(COLUMNAS_MENDEZ)].rename(
+            columns=COLUMNAS_MENDEZ
+        )
+        for col in filas.columns:
+            if isinstance(filas[col].dtype, pd.CategoricalDtype):
+                filas[col] = filas[col].astype("string")
+        filas.insert(0, "cuit", cuit)
+        filas.insert(1, "periodo", periodo)
+        filas.insert(2, "clave", claves["clave"])
+        filas.insert(3, "pv", claves["pv"])
+        filas.insert(4, "nro", claves["nro"])
+
+        self.reemplazar("mendez", cuit, periodo, filas)
+
+    def guardar_arca(self, cuit, periodo, df_arca):
+        """Guarda los comprobantes de ARCA (los de procesar_zip_csv) del período"""
+        cuit = normalizar_cuit(cuit)
+        periodo = normalizar_periodo(periodo)
+        claves, validas = claves_comprobantes(
+            df_arca, "Punto de Venta", "Número de Comprobante"
+        )
+
+        filas = pd.DataFrame(
+            {
+                "cuit": cuit,
+                "periodo": periodo,
+                "clave": claves["clave"],
+                "pv": claves["pv"],
+                "nro": claves["nro"],
+            }
+        )
+        for destino, nombres in COLUMNAS_ARCA.items():
+            origen = next((nombre for nombre in nombres if nombre in df_arca), None)
+            if origen is None:
+                filas[destino] = None
+            elif destino == "fecha":
+                filas[destino] = df_arca.loc[validas, origen].dt.strftime("%Y-%m-%d")
+            elif destino == "total":
+                filas[destino] = df_arca.loc[validas, origen]
+            else:
+                filas[destino] = df_arca.loc[validas, origen].astype("string")
+
+        self.reemplazar("arca", cuit, periodo, filas)
+
+    def buscar(self, fuente, cuit, periodos, claves):
+        """Busca las claves PV-Nro en los períodos indicados de la fuente.
+
+        Devuelve un DataFrame con clave y periodo por cada coincidencia.
+        """
+        if fuente not in FUENTES:
+            raise ValueError(f"Fuente desconocida: {fuente}")
+        if not periodos or len(claves) == 0:
+            return pd.DataFrame({"clave": [], "periodo": []}, dtype=str)
+
+        with closing(self.conectar()) as con:
+            con.execute("CREATE TEMP TABLE buscadas (clave TEXT PRIMARY KEY)")
+            con.executemany(
+                "INSERT OR IGNORE INTO buscadas VALUES (?)",
+                ((clave,) for clave in claves),
+            )
+            marcas = ", ".join("?" * len(periodos))
+            return pd.read_sql_query(
+                f"SELECT DISTINCT t.clave, t.periodo FROM buscadas b "
+                f"JOIN {fuente} t ON t.cuit = ? AND t.clave = b.clave "
+                f"AND t.periodo IN ({marcas}) ORDER BY t.clave, t.periodo",
+                con,
+                params=[normalizar_cuit(cuit), *periodos],
+            )
+
+    def periodos_guardados(self, cuit=None):
+        """Devuelve los períodos guardados por fuente (de un CUIT o de todos)"""
+        consulta = "SELECT * FROM periodos"
+        parametros = []
+        if cuit is not None:
+            consulta += " WHERE cuit = ?"
+            parametros.append(normalizar_cuit(cuit))
+        with closing(self.conectar()) as con:
+            return pd.read_sql_query(
+                consulta + " ORDER BY cuit, periodo, fuente", con, params=parametros
+            )
+
+
+# ============================================================================
+# CRUCE CON PERÍODOS VECINOS
+# ============================================================================
+
+
+def anotar_periodos(faltantes, columna_pv, columna_nro, encontrados, columna):
+    """Devuelve los faltantes encontrados con los períodos donde aparecen"""
+    claves, validas = claves_comprobantes(faltantes, columna_pv, columna_nro)
+    periodos = encontrados.groupby("clave", sort=False)["periodo"].agg(", ".join)
+
+    en_otro_periodo = claves["clave"].map(periodos)
+    encontrados_mask = en_otro_periodo.notna()
+    resultado = faltantes.loc[validas][encontrados_mask.to_numpy()].copy()
+    resultado[columna] = en_otro_periodo[encontrados_mask].to_numpy()
+    return resultado
+
+
+def buscar_en_periodos_vecinos(almacen, cuit, periodo, cruce, meses=1):
+    """Busca los faltantes del cruce en los períodos vecinos guardados.
+
+    Devuelve (mendez_en_otro_periodo, arca_en_otro_periodo): los comprobantes
+    de Mendez que no están en ARCA de este período pero sí en ARCA de un
+    período vecino, y viceversa, con la columna de los períodos encontrados.
+    """
+    vecinos = periodos_vecinos(periodo, meses)
+
+    claves_mendez, _ = claves_comprobantes(cruce.mendez_no_en_arca, "PV", "Nro")
+    claves_arca, _ = claves_comprobantes(
+        cruce.arca_no_en_mendez, "Punto de Venta", "Número de Comprobante"
+    )
+
+    en_arca = almacen.buscar("arca", cuit, vecinos, claves_mendez["clave"])
+    en_mendez = almacen.buscar("mendez", cuit, vecinos, claves_arca["clave"])
+
+    return (
+        anotar_periodos(cruce.mendez_no_en_arca, "PV", "Nro", en_arca, "Período ARCA"),
+        anotar_periodos(
+            cruce.arca_no_en_mendez,
+            "Punto de Venta",
+            "Número de Comprobante",
+            en_mendez,
+            "Período Mendez",
+        ),
+    )
+
+
+def guardar_cruce(almacen, cuit, periodo, libro, df_arca):
+    """Guarda los movimientos de Mendez y los comprobantes de ARCA de un período"""
+    almacen.guardar_mendez(cuit, periodo, libro.movimientos)
+    almacen.guardar_arca(cuit, periodo, df_arca)
@@ -1,553 +1,619 @@
 import streamlit as st
-import pandas as pd
-import re
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font
-from openpyxl.styles import PatternFill
-from openpyxl.styles import NamedStyle
-import zipfile
-
-
-# ============================================================================
-# FUNCIONES DE LECTURA Y LIMPIEZA DE ARCHIVOS
-# ============================================================================
+import cProfile
+import hashlib
+import os
+import sqlite3
+from collections import namedtuple
+from functools import partial
+from io import BytesIO
 
+import pandas as pd
 
-def leer_archivo(file_path):
-    """Lee el archivo con manejo de codificación UTF-8 o Latin-1"""
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.readlines()
-    except UnicodeDecodeError:
-        with open(file_path, "r", encoding="latin-1") as f:
-            return f.readlines()
-
-
-def procesar_encabezado(lines):
-    """Procesa y extrae la información del encabezado del archivo"""
-    try:
-        encabezado = lines[1:7]
-        encabezado_limpio = [line.replace("\n", "").strip() for line in encabezado]
-
-        return {
-            "RAZON SOCIAL": encabezado_limpio[0],
-            "DIRECCION": encabezado_limpio[1],
-            "CUIT": encabezado_limpio[2],
-            "LIBRO": encabezado_limpio[3].split("  ")[-1],
-            "PERIODO": encabezado_limpio[4].split("  ")[-1],
-        }
-    except Exception as e:
-        st.error(f"Ocurrió un error al procesar el encabezado: {e}")
-        return {}
-
-
-def limpiar_lineas(lines):
-    """Limpia las líneas del archivo eliminando caracteres de control y bloques no deseados"""
-    cleaned_lines = []
-    eliminar = False
-    eliminar_desde_totales = False
-    compras_o_ventas = ""
-
-    for i, line in enumerate(lines[9:], start=2):
-        # Detectar tipo de operación
-        if "IVA VENTAS" in line:
-            compras_o_ventas = "Ventas"
-        elif "IVA COMPRAS" in line:
-            compras_o_ventas = "Compras"
-
-        # Detectar fin de datos
-        if "TOTALES POR TASA" in line:
-            eliminar_desde_totales = True
-            continue
-
-        if eliminar_desde_totales:
-            break
-
-        # Manejar bloques a eliminar
-        if line.startswith("----"):
-            eliminar = True
-            continue
-
-        if line.startswith("--"):
-            eliminar = False
-            continue
-
-        # Procesar líneas válidas
-        if not eliminar:
-            cleaned_line = re.sub(r"\x1b[^m]*m", "", line)  # Elimina secuencias ANSI
-            cleaned_line = re.sub(
-                r"[\x00-\x1F\x7F]", "", cleaned_line
-            )  # Eliminación de caracteres de control ASCII
-            cleaned_lines.append(cleaned_line)
-
-    return cleaned_lines, compras_o_ventas
-
-
-def limpiar_lineas_adicional(cleaned_lines):
-    """Segunda limpieza de líneas eliminando líneas con PPag"""
-    doble_cleaned_lines = []
-
-    for i, line in enumerate(cleaned_lines, start=-1):
-        if "PPag." in line or len(line.strip()) < 35:
-            if re.search(r"PPag\.\:\s*\d+\s*$", line):
-                linea = re.sub(r"PPag\.\:\s*\d+\s*$", "", line)
-                cleaned_lines.append(linea)
-            else:
-                break
-        doble_cleaned_lines.append(line)
-
-    return doble_cleaned_lines
+from almacen import (
+    RUTA_ALMACEN,
+    AlmacenLibros,
+    buscar_en_periodos_vecinos,
+    guardar_cruce,
+)
+from diagnostico import (
+    RegistroEtapas,
+    a_json_lines,
+    a_prometheus,
+    agregar_json_lines,
+    escribir_prometheus,
+    perfil_a_bytes,
+    perfil_a_texto,
+)
+from procesador import (
+    ESTADO_SIN_TOTALES,
+    ESTADO_TOTALES_DIFIERE,
+    FORMATOS_CONSOLIDADO,
+    HOJA_CONTROL_TOTALES,
+    HOJA_SUGERENCIAS,
+    TOLERANCIA_IMPORTE,
+    ErrorProcesamiento,
+    crear_archivo_consolidado,
+    cruzar_comprobantes,
+    estado_control_totales,
+    formato_ancho,
+    formatos_disponibles,
+    procesar_archivos,
+    procesar_zips_csv,
+    tasas_con_diferencias,
+)
+from sugerencias import sugerir_coincidencias
+from trabajos import (
+    ESTADO_CANCELADO,
+    ESTADO_EN_COLA,
+    ESTADO_ERROR,
+    ColaTrabajos,
+)
+from vista_previa import (
+    FILAS_POR_PAGINA,
+    FiltroVista,
+    cantidad_paginas,
+    opciones_tipo,
+    pagina,
+    posiciones_filtradas,
+    resumen_filtro,
+    tablas_vista,
+)
 
 
 # ============================================================================
-# FUNCIONES DE PROCESAMIENTO DE MOVIMIENTOS
+# INTERFAZ DE STREAMLIT
 # ============================================================================
 
 
-def procesar_movimientos(doble_cleaned_lines, compras_o_ventas):
-    """Procesa las líneas limpias y extrae los movimientos"""
-    movements = []
-    temp_movement = {}
-
-    for index, cleaned_line in enumerate(doble_cleaned_lines):
-        # Procesar líneas continuas del mismo movimiento
-        if "numero" in temp_movement and temp_movement["numero"] == cleaned_line[12:20]:
-            procesar_linea_continuacion(cleaned_line, temp_movement, compras_o_ventas)
-        else:
-            # Procesar nueva línea de movimiento
-            if cleaned_line[0:2] == "  ":
-                procesar_linea_continuacion(
-                    cleaned_line, temp_movement, compras_o_ventas
-                )
-                if index == len(doble_cleaned_lines) - 1:
-                    movements.append(temp_movement)
-            else:
-                # Nueva entrada de movimiento
-                movement = temp_movement.copy()
-                movements.append(movement)
-                temp_movement.clear()
-
-                procesar_nueva_entrada(cleaned_line, temp_movement, compras_o_ventas)
-
-                if index == len(doble_cleaned_lines) - 1:
-                    movements.append(temp_movement)
-
-    # Limpiar movimiento vacío inicial
-    if not movements[0]:
-        movements.pop(0)
-
-    return movements
-
-
-def procesar_linea_continuacion(cleaned_line, temp_movement, compras_o_ventas):
-    """Procesa una línea que continúa un movimiento existente"""
-    partes = re.split(r"\s{3,}", cleaned_line[70:])
-    if len(partes) < 2:
-        return
-
-    tasa = partes[0]
-    if tasa in [
-        "Tasa 21%",
-        "T.10.5%",
-        "Tasa 27%",
-        "C.F.21%",
-        "C.F.10.5%",
-        "Tasa 2.5%",
-        "T.IMP 21%",
-        "T.IMP 10%",
-    ]:
-        procesar_tasa_con_neto_iva(tasa, partes, temp_movement)
-    elif tasa in ["R.Monot21", "R.Mont.10"]:
-        procesar_tasa_monotributo(tasa, partes, temp_movement, compras_o_ventas)
-    else:
-        procesar_otra_tasa(tasa, partes, temp_movement)
-
-
-def procesar_tasa_con_neto_iva(tasa, partes, temp_movement):
-    """Procesa tasas que tienen neto e IVA separados"""
-    if tasa + " Neto" in temp_movement:
-        # Sumar valores existentes
-        neto_anterior = float(temp_movement[tasa + " Neto"].replace(",", "."))
-        iva_anterior = float(temp_movement[tasa + " IVA"].replace(",", "."))
-        neto_nuevo = float(partes[1].replace(",", "."))
-        iva_nuevo = float(partes[2].replace(",", "."))
+# Resultados por etapa que se conservan entre re-ejecuciones (se descartan
+# los usados hace más tiempo al superar el límite)
+MAX_ENTRADAS_CACHE = 8
+
+# Si están definidas, cada ejecución agrega sus métricas a un archivo de
+# líneas JSON y/o reescribe un textfile para el node_exporter de Prometheus
+VARIABLE_METRICAS_JSONL = "CRUCE_METRICAS_JSONL"
+VARIABLE_METRICAS_PROMETHEUS = "CRUCE_METRICAS_PROM"
+
+# Ruta de la base con el historial de períodos (por defecto, RUTA_ALMACEN)
+VARIABLE_ALMACEN = "CRUCE_ALMACEN"
+
+HOJA_MENDEZ_EN_OTRO_PERIODO = "MENDEZ EN ARCA OTRO PERIODO"
+HOJA_ARCA_EN_OTRO_PERIODO = "ARCA EN MENDEZ OTRO PERIODO"
+
+# Etapas que registra una ejecución completa sin caché (el consolidado se
+# genera aparte, recién al descargarlo)
+ETAPAS_PIPELINE = (
+    "parseo_txt",
+    "control_totales",
+    "combinar_movimientos",
+    "totales",
+    "lectura_zip",
+    "cruce",
+    "sugerencias",
+)
+
+# Pasos del procesamiento en segundo plano, en orden, con el texto que se
+# muestra en la barra de progreso mientras se ejecuta cada uno
+PASOS_TRABAJO = {
+    "txt": "Leyendo, limpiando y parseando los TXT de Mendez...",
+    "zip": "Leyendo los ZIP de ARCA...",
+    "cruce": "Cruzando comprobantes...",
+    "sugerencias": "Buscando coincidencias probables para los faltantes...",
+    "historial": "Buscando faltantes en los períodos vecinos...",
+}
+
+# Procesamientos que corren a la vez entre todas las sesiones (el resto
+# espera en la cola) y segundos entre actualizaciones del progreso
+TRABAJOS_SIMULTANEOS = 2
+INTERVALO_PROGRESO = 0.5
+
+# Lo que deja en la sesión el trabajo del cruce (el cruce en sí es el
+# procesador.ResultadoCruce del campo cruce); exportaciones son los
+# consolidados ya medidos en su registro
+ResultadoTrabajo = namedtuple(
+    "ResultadoTrabajo",
+    [
+        "cruce",
+        "importes",
+        "control",
+        "sugerencias",
+        "hojas_vecinos",
+        "registro",
+        "perfil",
+        "mensajes",
+        "exportaciones",
+    ],
+)
+
+# Descripción de cada formato del consolidado para la interfaz
+ETIQUETAS_FORMATO = {
+    "xlsx": "Excel (.xlsx)",
+    "csv": "CSV (un archivo por hoja, en ZIP)",
+    "parquet": "Parquet (un archivo por hoja, en ZIP)",
+}
+
+
+def huella(uploaded_file):
+    """Devuelve el SHA-256 del contenido de un archivo subido"""
+    return hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+
+
+def huellas(uploaded_files):
+    """Devuelve los pares (nombre, SHA-256) de varios archivos subidos"""
+    return tuple((f.name, huella(f)) for f in uploaded_files)
+
+
+def origenes_subidos(uploaded_files):
+    """Devuelve un dict nombre -> contenido en memoria, con nombres únicos"""
+    origenes = {}
+    for f in uploaded_files:
+        nombre = f.name
+        copia = 1
+        while nombre in origenes:
+            copia += 1
+            nombre = f"{f.name} ({copia})"
+        origenes[nombre] = BytesIO(f.getvalue())
+    return origenes
+
+
+# Cada etapa se memoiza por los nombres y SHA de los archivos subidos; los
+# argumentos con guion bajo no forman parte de la clave. Las etapas que salen
+# de la caché no se ejecutan y por lo tanto no quedan en el registro de
+# diagnóstico.
+
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def procesar_archivos_cacheado(sha_txt, _uploaded_files, _registro=None):
+    """Procesa los TXT de Mendez una sola vez por conjunto de contenidos"""
+    return procesar_archivos(origenes_subidos(_uploaded_files), registro=_registro)
+
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def procesar_zips_csv_cacheado(sha_zip, _uploaded_zips, _registro=None):
+    """Lee los CSV de ARCA una sola vez por conjunto de contenidos"""
+    return procesar_zips_csv(origenes_subidos(_uploaded_zips), registro=_registro)
+
+
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def cruzar_comprobantes_cacheado(
+    sha_txt, sha_zip, tolerancia, _df_mendez, _df_arca, _importes, _registro=None
+):
+    """Cruza Mendez y ARCA una sola vez por par de contenidos y tolerancia"""
+    return cruzar_comprobantes(
+        _df_mendez,
+        _df_arca,
+        registro=_registro,
+        importes_mendez=_importes,
+        tolerancia=tolerancia,
+    )
 
-        temp_movement[tasa + " Neto"] = round(neto_anterior + neto_nuevo, 2)
-        temp_movement[tasa + " IVA"] = round(iva_anterior + iva_nuevo, 2)
-    else:
-        # Primer valor
-        temp_movement[tasa + " Neto"] = partes[1]
-        temp_movement[tasa + " IVA"] = partes[2]
-
-
-def procesar_tasa_monotributo(tasa, partes, temp_movement, compras_o_ventas):
-    """Procesa tasas de monotributo"""
-    if compras_o_ventas == "Ventas":
-        if tasa + " Neto" in temp_movement:
-            neto_anterior = float(temp_movement[tasa + " Neto"].replace(",", "."))
-            iva_anterior = float(temp_movement[tasa + " IVA"].replace(",", "."))
-            neto_nuevo = float(partes[1].replace(",", "."))
-            iva_nuevo = float(partes[2].replace(",", "."))
-
-            temp_movement[tasa + " Neto"] = round(neto_anterior + neto_nuevo, 2)
-            temp_movement[tasa + " IVA"] = round(iva_anterior + iva_nuevo, 2)
-        else:
-            temp_movement[tasa + " Neto"] = partes[1]
-            temp_movement[tasa + " IVA"] = partes[2]
-    else:
-        temp_movement[tasa] = partes[1]
-
-
-def procesar_otra_tasa(tasa, partes, temp_movement):
-    """Procesa otras tasas que no tienen neto/IVA separados"""
-    if tasa in temp_movement:
-        if isinstance(temp_movement[tasa], float):
-            numero_actual = float(partes[1].replace(",", "."))
-            temp_movement[tasa] = round(temp_movement[tasa] + numero_actual, 2)
-        else:
-            numero_anterior = float(temp_movement[tasa].replace(",", "."))
-            numero_actual = float(partes[1].replace(",", "."))
-            temp_movement[tasa] = round(numero_anterior + numero_actual, 2)
-    else:
-        temp_movement[tasa] = partes[1]
 
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def sugerir_coincidencias_cacheado(sha_txt, sha_zip, _cruce, _registro=None):
+    """Busca coincidencias para los faltantes una sola vez por par de contenidos"""
+    return sugerir_coincidencias(
+        _cruce.mendez_no_en_arca, _cruce.arca_no_en_mendez, registro=_registro
+    )
 
-def procesar_nueva_entrada(cleaned_line, temp_movement, compras_o_ventas):
-    """Procesa una nueva entrada de movimiento"""
-    partes = re.split(r"\s{3,}", cleaned_line[70:])
-    if len(partes) < 2:
-        return
 
-    temp_movement.update(
-        {
-            "Fecha": cleaned_line[0:2],
-            "Comprobante": cleaned_line[3:5],
-            "PV": cleaned_line[6:11],
-            "Nro": cleaned_line[12:20],
-            "Letra": cleaned_line[20:21],
-            "Razon Social": cleaned_line[22:44],
-            "Condicion": cleaned_line[45:49],
-            "CUIT": cleaned_line[50:63],
-            "Concepto": cleaned_line[64:67],
-            "Jurisdiccion": cleaned_line[68:69],
-        }
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def crear_archivo_consolidado_cacheado(
+    sha_txt,
+    sha_zip,
+    formato,
+    tolerancia,
+    _cruce,
+    _importes_mendez,
+    hojas_adicionales=None,
+    _registro=None,
+    _sugerencias=None,
+    _control=None,
+):
+    """Genera el consolidado una vez por contenidos, formato, tolerancia y hojas.
+
+    Las sugerencias y el control de los TOTALES POR TASA (que dependen solo
+    de los contenidos) van en sus hojas, antes de hojas_adicionales.
+    """
+    propias = {HOJA_SUGERENCIAS: _sugerencias, HOJA_CONTROL_TOTALES: _control}
+    hojas_adicionales = {
+        **{nombre: df for nombre, df in propias.items() if df is not None},
+        **(hojas_adicionales or {}),
+    }
+    return crear_archivo_consolidado(
+        _cruce.mendez,
+        _cruce.arca,
+        _cruce.arca_no_en_mendez,
+        _cruce.mendez_no_en_arca,
+        _importes_mendez,
+        hojas_adicionales=hojas_adicionales,
+        formato=formato,
+        registro=_registro,
+        diferencias=_cruce.diferencias,
     )
 
-    # Procesar montos
-    if len(partes) == 3:
-        primer_monto = partes[1].split(" ")
-        primer_monto = list(filter(None, primer_monto))
-        segundo_monto = partes[1].split(" ")
-        segundo_monto = list(filter(None, segundo_monto))
-        partes = [partes[0]] + primer_monto + segundo_monto
-
-    tasa = partes[0]
-    if tasa in [
-        "Tasa 21%",
-        "T.10.5%",
-        "Tasa 27%",
-        "C.F.21%",
-        "C.F.10.5%",
-        "Tasa 2.5%",
-        "T.IMP 21%",
-        "T.IMP 10%",
-    ]:
-        temp_movement[tasa + " Neto"] = partes[1]
-        temp_movement[tasa + " IVA"] = partes[2]
-    elif tasa in ["R.Monot21", "R.Mont.10"]:
-        if compras_o_ventas == "Ventas":
-            temp_movement[tasa + " Neto"] = partes[1]
-            temp_movement[tasa + " IVA"] = partes[2]
-        else:
-            temp_movement[tasa] = partes[1]
-    else:
-        temp_movement[tasa] = partes[1]
 
+def cruzar_con_historial(
+    df_encabezado, libro, df_arca, cruce, meses, sha_txt, sha_zip, guardados
+):
+    """Guarda el período en el historial y busca sus faltantes en los períodos vecinos.
+
+    Cada par de archivos se guarda una sola vez por sesión (guardados es el
+    conjunto de la sesión); la búsqueda se repite en cada ejecución para ver
+    los períodos que se agreguen después.
+    """
+    almacen = AlmacenLibros(os.environ.get(VARIABLE_ALMACEN, RUTA_ALMACEN))
+    cuit = df_encabezado.loc["CUIT"].iloc[0]
+    periodo = df_encabezado.loc["PERIODO"].iloc[0]
+
+    if (almacen.ruta, sha_txt, sha_zip) not in guardados:
+        guardar_cruce(almacen, cuit, periodo, libro, df_arca)
+        guardados.add((almacen.ruta, sha_txt, sha_zip))
+
+    mendez_vecinos, arca_vecinos = buscar_en_periodos_vecinos(
+        almacen, cuit, periodo, cruce, meses
+    )
+    return {
+        HOJA_MENDEZ_EN_OTRO_PERIODO: formato_ancho(mendez_vecinos, libro.importes),
+        HOJA_ARCA_EN_OTRO_PERIODO: arca_vecinos,
+    }
+
+
+def mensaje_control_totales(control):
+    """Aviso (tipo, texto) con el resultado del control contra los TOTALES POR TASA"""
+    estado = estado_control_totales(control)
+    if estado == ESTADO_TOTALES_DIFIERE:
+        return (
+            "error",
+            "Los importes de los movimientos no coinciden con los TOTALES POR "
+            f"TASA del TXT en: {', '.join(tasas_con_diferencias(control))}. "
+            "Revisa el TXT antes de usar el cruce.",
+        )
+    if estado == ESTADO_SIN_TOTALES:
+        return (
+            "warning",
+            "El TXT no trae TOTALES POR TASA: no se pudieron controlar los importes.",
+        )
+    return (
+        "success",
+        "Los importes de los movimientos coinciden con los TOTALES POR TASA del TXT.",
+    )
 
-# ============================================================================
-# FUNCIONES DE PROCESAMIENTO DE DATAFRAMES
-# ============================================================================
 
+def mostrar_control_totales(control):
+    """Muestra la comparación de cada tasa con los TOTALES POR TASA del TXT"""
+    difiere = estado_control_totales(control) == ESTADO_TOTALES_DIFIERE
+    with st.expander("🧮 Control contra los TOTALES POR TASA", expanded=difiere):
+        st.dataframe(control, hide_index=True)
 
-def crear_dataframe_movimientos(movements):
-    """Crea y procesa el DataFrame de movimientos"""
-    df = pd.DataFrame(movements)
-    df = df.fillna(0)
 
-    # Reemplazar comas por puntos en columnas numéricas
-    df.iloc[:, 11:] = df.iloc[:, 11:].replace(",", ".", regex=True)
-    df.iloc[:, 11:] = df.iloc[:, 11:].apply(pd.to_numeric, errors="coerce").fillna(0)
+def mostrar_periodos_vecinos(hojas):
+    """Muestra los faltantes que aparecen en períodos vecinos"""
+    st.markdown("---")
+    st.subheader("🗓️ Faltantes encontrados en períodos vecinos")
+    for nombre, df in hojas.items():
+        st.markdown(f"**{nombre}**: {len(df)} comprobantes")
+        if not df.empty:
+            st.dataframe(df)
+
+
+def exportar_metricas(registro, mensajes, nuevas=None):
+    """Escribe las métricas en los destinos configurados por variables de entorno.
+
+    Al JSON lines se agregan solo las mediciones de nuevas (por defecto, todas
+    las del registro) y el textfile de Prometheus se reemplaza con el registro
+    completo. Los errores de escritura se agregan a mensajes como advertencia.
+    """
+    nuevas = registro if nuevas is None else nuevas
+    if not nuevas.etapas:
+        return
 
-    # Convertir notas de crédito a negativas
-    columnas_a_convertir = df.columns[11:]
-    df.loc[df["Comprobante"] == "NC", columnas_a_convertir] *= -1
+    ruta_jsonl = os.environ.get(VARIABLE_METRICAS_JSONL)
+    ruta_prometheus = os.environ.get(VARIABLE_METRICAS_PROMETHEUS)
+    try:
+        if ruta_jsonl:
+            agregar_json_lines(ruta_jsonl, nuevas, origen="app")
+        if ruta_prometheus:
+            escribir_prometheus(ruta_prometheus, registro, origen="app")
+    except OSError as e:
+        mensajes.append(("warning", f"No se pudieron exportar las métricas: {e}"))
 
-    # Convertir tipos de datos
-    df["PV"] = pd.to_numeric(df["PV"])
-    df["Nro"] = pd.to_numeric(df["Nro"])
-    df["Concepto"] = pd.to_numeric(df["Concepto"])
 
-    return df
+def mostrar_diagnostico(registro, perfil):
+    """Muestra el panel con las mediciones por etapa y las descargas asociadas"""
+    st.markdown("---")
+    st.subheader("🩺 Diagnóstico")
+
+    if registro.etapas:
+        tabla = pd.DataFrame(registro.etapas).set_index("etapa")
+        tabla["pico_mb"] = tabla.pop("pico_bytes") / 2**20
+        st.dataframe(tabla)
+        st.caption(f"Total medido: {registro.total_segundos():.3f} s")
+
+        col_json, col_prometheus = st.columns(2)
+        col_json.download_button(
+            label="Descargar métricas (JSON lines)",
+            data=a_json_lines(registro, origen="app"),
+            file_name="metricas.jsonl",
+            mime="application/x-ndjson",
+        )
+        col_prometheus.download_button(
+            label="Descargar métricas (Prometheus)",
+            data=a_prometheus(registro, origen="app"),
+            file_name="metricas.prom",
+            mime="text/plain",
+        )
 
+    medidas = {medicion["etapa"] for medicion in registro.etapas}
+    en_cache = [etapa for etapa in ETAPAS_PIPELINE if etapa not in medidas]
+    if en_cache:
+        st.info(f"Tomadas de la caché, sin volver a ejecutarse: {', '.join(en_cache)}")
+
+    if perfil is not None:
+        with st.expander("Perfil de cProfile"):
+            st.code(perfil_a_texto(perfil))
+        st.download_button(
+            label="Descargar perfil (.prof)",
+            data=perfil_a_bytes(perfil),
+            file_name="perfil.prof",
+            mime="application/octet-stream",
+            help="Se abre con pstats, snakeviz o similares",
+        )
 
-def combinar_movimientos_duplicados(df):
-    """Combina movimientos que tienen la misma clave principal"""
-    resultado = []
-    fila_actual = df.iloc[0].copy()
 
-    for i in range(1, len(df)):
-        fila_siguiente = df.iloc[i]
+def generar_consolidado(
+    sha_txt, sha_zip, formato, tolerancia, resultado, medir_memoria
+):
+    """Genera el consolidado al pulsar la descarga y devuelve sus bytes.
+
+    Streamlit lo ejecuta fuera de la página, así que no puede mostrar nada:
+    la medición se agrega al registro del resultado (se ve en el diagnóstico
+    de la próxima ejecución) una sola vez por contenidos, formato y
+    tolerancia, y se exporta junto con las del resto del cruce.
+    """
+    registro = RegistroEtapas(medir_memoria=medir_memoria)
+    consolidado = crear_archivo_consolidado_cacheado(
+        sha_txt,
+        sha_zip,
+        formato,
+        tolerancia,
+        resultado.cruce,
+        resultado.importes,
+        resultado.hojas_vecinos,
+        registro,
+        _sugerencias=resultado.sugerencias,
+        _control=resultado.control,
+    )
+    exportacion = (sha_txt, sha_zip, formato, tolerancia)
+    if registro.etapas and exportacion not in resultado.exportaciones:
+        resultado.exportaciones.add(exportacion)
+        resultado.registro.etapas.extend(registro.etapas)
+        exportar_metricas(resultado.registro, [], nuevas=registro)
+    return consolidado
 
-        # Si la clave principal se repite, combinar valores
-        if (
-            fila_actual["Nro"] == fila_siguiente["Nro"]
-            and fila_actual["PV"] == fila_siguiente["PV"]
-            and fila_actual["Razon Social"] == fila_siguiente["Razon Social"]
-        ):
 
-            for col in df.columns[11:]:  # Sumar solo las columnas numéricas
-                fila_actual[col] += fila_siguiente[col]
-        else:
-            resultado.append(fila_actual)
-            fila_actual = fila_siguiente.copy()
+@st.cache_data(max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def posiciones_filtradas_cacheado(sha_txt, sha_zip, tolerancia, hoja, filtro, _df):
+    """Filtra una tabla del cruce una sola vez por contenidos, hoja y filtro.
 
-    resultado.append(fila_actual)
-    return pd.DataFrame(resultado)
+    La tolerancia también es parte de la clave, porque con otra tolerancia
+    la hoja de diferencias tiene otras filas.
+    """
+    return posiciones_filtradas(_df, filtro)
 
 
-def agregar_totales_movimientos(df_final):
-    """Agrega fila de totales al DataFrame de movimientos"""
-    df_final["Total"] = df_final.iloc[:, 11:].sum(axis=1)
+@st.fragment
+def mostrar_vista_previa(sha_txt, sha_zip, tolerancia, resultado):
+    """Muestra las tablas del cruce de a una página, con filtros.
 
-    # Crear fila de totales
-    fila_total = pd.DataFrame(df_final.iloc[:, 11:].sum()).T
-    fila_total.insert(0, "Nro", "TOTALES")
-    fila_total.insert(1, "Razon Social", "")
+    Es un fragmento: cambiar de tabla, de filtro o de página solo vuelve a
+    dibujar la vista previa, no toda la página.
+    """
+    st.markdown("---")
+    st.subheader("🔎 Vista previa")
+
+    tablas = tablas_vista(resultado.cruce, resultado.sugerencias)
+    hoja = st.radio(
+        "Tabla",
+        list(tablas),
+        horizontal=True,
+        format_func=lambda nombre: f"{nombre} ({len(tablas[nombre])})",
+    )
+    df = tablas[hoja]
+
+    col_cuit, col_tipo, col_min, col_max = st.columns(4)
+    filtro = FiltroVista(
+        cuit=col_cuit.text_input("CUIT", key=f"cuit_{hoja}"),
+        tipos=tuple(
+            col_tipo.multiselect(
+                "Tipo de comprobante", opciones_tipo(df), key=f"tipos_{hoja}"
+            )
+        ),
+        importe_min=col_min.number_input(
+            "Importe total desde", value=None, step=1000.0, key=f"min_{hoja}"
+        ),
+        importe_max=col_max.number_input(
+            "Importe total hasta", value=None, step=1000.0, key=f"max_{hoja}"
+        ),
+    )
+    posiciones = posiciones_filtradas_cacheado(
+        sha_txt, sha_zip, tolerancia, hoja, filtro, df
+    )
 
-    return pd.concat([df_final, fila_total], ignore_index=True)
+    filas, total = resumen_filtro(df, posiciones)
+    paginas = cantidad_paginas(filas)
+    numero = st.number_input(
+        f"Página (de {paginas})",
+        min_value=1,
+        max_value=paginas,
+        value=1,
+        key=f"pagina_{hoja}_{hash(filtro)}",
+    )
+    st.dataframe(pagina(df, posiciones, numero, resultado.importes))
+    desde = min((numero - 1) * FILAS_POR_PAGINA + 1, filas)
+    hasta = min(numero * FILAS_POR_PAGINA, filas)
+    st.caption(
+        f"Filas {desde}–{hasta} de {filas} (de {len(df)} sin filtrar). "
+        f"Importe total filtrado: $ {total:,.2f}"
+    )
 
 
-# ============================================================================
-# FUNCIONES DE EXCEL
-# ============================================================================
+@st.cache_resource
+def cola_trabajos():
+    """Cola de procesamientos compartida por todas las sesiones"""
+    return ColaTrabajos(TRABAJOS_SIMULTANEOS)
 
 
-def crear_archivo_excel_consolidado(
-    df_mendez, df_arca, df_arca_no_en_mendez, df_mendez_no_en_arca
+def cruzar_en_segundo_plano(
+    trabajo,
+    uploaded_files,
+    uploaded_zips,
+    sha_txt,
+    sha_zip,
+    tolerancia,
+    meses,
+    medir_memoria,
+    perfilar,
+    guardados,
 ):
-    """Crea el archivo Excel consolidado con 4 hojas"""
-    excel_filename = "Cruce_Consolidado.xlsx"
-
-    with pd.ExcelWriter(excel_filename, engine="openpyxl") as writer:
-        # Hoja 1: Mendez (movimientos del TXT)
-        df_mendez.to_excel(writer, sheet_name="Mendez", index=False)
-
-        # Hoja 2: ARCA (movimientos del ZIP)
-        df_arca.to_excel(writer, sheet_name="ARCA", index=False)
-
-        # Hoja 3: ARCA NO EN MENDEZ (comprobantes en ARCA y no en Mendez)
-        df_arca_no_en_mendez.to_excel(
-            writer, sheet_name="ARCA NO EN MENDEZ", index=False
+    """Ejecuta el cruce completo como trabajo en segundo plano.
+
+    No dibuja nada en la página: los avisos para el usuario se devuelven en
+    ResultadoTrabajo.mensajes como pares (tipo, texto), con tipo success, info,
+    warning o error. Con meses=None no se usa el historial.
+    """
+    registro = RegistroEtapas(medir_memoria=medir_memoria)
+    mensajes = []
+    cruce = importes = control = sugerencias = hojas_vecinos = None
+
+    # Con el perfil activo las etapas se ejecutan sin pasar por la caché
+    if perfilar:
+        perfil = cProfile.Profile()
+        etapa_txt = lambda: procesar_archivos(
+            origenes_subidos(uploaded_files), registro=registro
         )
-
-        # Hoja 4: MENDEZ NO EN ARCA (comprobantes en Mendez y no en ARCA)
-        df_mendez_no_en_arca.to_excel(
-            writer, sheet_name="MENDEZ NO EN ARCA", index=False
+        etapa_zip = lambda: procesar_zips_csv(
+            origenes_subidos(uploaded_zips), registro=registro
         )
-
-    return excel_filename
-
-
-def aplicar_formato_excel_consolidado(excel_filename):
-    """Aplica formato de moneda a todas las hojas del archivo consolidado"""
-    wb = load_workbook(excel_filename)
-
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-
-        # Encontrar la última fila y columna con datos
-        max_row = ws.max_row
-        max_col = ws.max_column
-
-        # Aplicar formato de moneda a todas las columnas numéricas (desde la columna 11 en adelante)
-        for col_idx in range(11, max_col + 1):
-            col_letter = get_column_letter(col_idx)
-            for row_idx in range(
-                2, max_row + 1
-            ):  # Empezar desde la fila 2 (después del encabezado)
-                cell = ws[f"{col_letter}{row_idx}"]
-                if cell.value is not None:
-                    cell.number_format = '"$"#,##0.00'
-
-    wb.save(excel_filename)
-
-
-def crear_archivo_excel(df_encabezado, df_final):
-    """Crea el archivo Excel solo con la hoja de movimientos"""
-    excel_filename = "Movimientos.xlsx"
-
-    with pd.ExcelWriter(excel_filename, engine="openpyxl") as writer:
-        # Solo hoja Movimientos
-        df_encabezado.to_excel(
-            writer, sheet_name="Movimientos", startcol=5, index=False
+        etapa_cruce = lambda df_mendez, df_arca, importes: cruzar_comprobantes(
+            df_mendez,
+            df_arca,
+            registro=registro,
+            importes_mendez=importes,
+            tolerancia=tolerancia,
         )
-        df_final.to_excel(writer, sheet_name="Movimientos", startrow=8, index=False)
-
-    return excel_filename
-
-
-def aplicar_formulas_excel(excel_filename, df_final):
-    """Aplica formato de moneda en la hoja de movimientos, sin agregar ninguna fórmula de suma."""
-    wb = load_workbook(excel_filename)
-    wm = wb["Movimientos"]
-
-    # Calcular la fila donde empieza la tabla en Excel
-    inicio_fila_movimientos = 9
-    ultima_fila_movimientos = inicio_fila_movimientos + df_final.shape[0] - 1
-
-    # Aplicar formato de moneda a todas las columnas numéricas (desde columna 11 en adelante)
-    for col_idx in range(11, df_final.shape[1] + 1):
-        col_letter = get_column_letter(col_idx)
-        for row_idx in range(
-            inicio_fila_movimientos + 1, ultima_fila_movimientos + 2
-        ):  # +2 para incluir la última fila
-            cell = wm[f"{col_letter}{row_idx}"]
-            cell.number_format = '"$"#,##0.00'
-
-    wb.save(excel_filename)
-
-
-# ============================================================================
-# FUNCIÓN PRINCIPAL
-# ============================================================================
-
-
-def procesar_archivo(file_path):
-    """Función principal que procesa el archivo completo"""
-    try:
-        # 1. Leer y limpiar archivo
-        lines = leer_archivo(file_path)
-        encabezado_completo = procesar_encabezado(lines)
-        cleaned_lines, compras_o_ventas = limpiar_lineas(lines)
-        doble_cleaned_lines = limpiar_lineas_adicional(cleaned_lines)
-
-        # 2. Procesar movimientos
-        movements = procesar_movimientos(doble_cleaned_lines, compras_o_ventas)
-
-        # 3. Crear DataFrames
-        df = crear_dataframe_movimientos(movements)
-        df_final = combinar_movimientos_duplicados(df)
-        df_final = agregar_totales_movimientos(df_final)
-
-        # Forzar tipo numérico en columnas desde la 11 en adelante
-        for col in df_final.columns[11:]:
-            df_final[col] = (
-                pd.to_numeric(df_final[col], errors="coerce").fillna(0).astype(float)
-            )
-
-        # 4. Preparar DataFrame de encabezado
-        df_encabezado = pd.DataFrame(
-            list(encabezado_completo.values()), columns=["Valor"]
+        etapa_sugerencias = lambda cruce: sugerir_coincidencias(
+            cruce.mendez_no_en_arca, cruce.arca_no_en_mendez, registro=registro
         )
-        df_encabezado.columns = [""] * len(df_encabezado.columns)
-
-        # 5. Crear archivo Excel (sin la fila de totales)
-        df_final_sin_totales = df_final[df_final["Nro"] != "TOTALES"].copy()
-
-        # Forzar tipo float en todas las columnas numéricas posteriores a 'Jurisdiccion'
-        idx_jurisdiccion = df_final_sin_totales.columns.get_loc("Jurisdiccion")
-        for col in df_final_sin_totales.columns[idx_jurisdiccion + 1 :]:
-            df_final_sin_totales[col] = (
-                df_final_sin_totales[col]
-                .astype(str)
-                .str.replace(",", ".", regex=False)
-                .str.replace(" ", "", regex=False)
-            )
-            df_final_sin_totales[col] = (
-                pd.to_numeric(df_final_sin_totales[col], errors="coerce")
-                .fillna(0)
-                .astype(float)
+    else:
+        perfil = None
+        etapa_txt = lambda: procesar_archivos_cacheado(
+            sha_txt, uploaded_files, registro
+        )
+        etapa_zip = lambda: procesar_zips_csv_cacheado(
+            sha_zip, uploaded_zips, registro
+        )
+        etapa_cruce = lambda df_mendez, df_arca, importes: (
+            cruzar_comprobantes_cacheado(
+                sha_txt, sha_zip, tolerancia, df_mendez, df_arca, importes, registro
             )
+        )
+        etapa_sugerencias = lambda cruce: sugerir_coincidencias_cacheado(
+            sha_txt, sha_zip, cruce, registro
+        )
 
-        excel_filename = crear_archivo_excel(df_encabezado, df_final_sin_totales)
-
-        # 6. Aplicar formato
-        aplicar_formulas_excel(excel_filename, df_final_sin_totales)
-
-        st.success("¡Archivo procesado con éxito!")
-        return excel_filename, df_final_sin_totales
-
-    except Exception as e:
-        st.error(f"Error al procesar el archivo: {e}")
-        return None, None
-
+    # El perfil solo abarca el hilo del trabajo
+    if perfil is not None:
+        perfil.enable()
 
-# ============================================================================
-# INTERFAZ DE STREAMLIT
-# ============================================================================
+    try:
+        # Procesar los TXT
+        trabajo.avanzar("txt")
+        try:
+            df_encabezado, libro = etapa_txt()
+            mensajes.append(("success", "¡Archivo procesado con éxito!"))
+            control = libro.control
+            mensajes.append(mensaje_control_totales(control))
+        except ErrorProcesamiento as e:
+            mensajes.append(("error", str(e)))
+            libro = None
+
+        # Procesar los ZIP
+        trabajo.avanzar("zip")
+        try:
+            df_arca = etapa_zip()
+        except ErrorProcesamiento as e:
+            mensajes.append(("error", str(e)))
+            df_arca = None
+
+        if libro is not None and df_arca is not None:
+            # Cruzar comprobantes en ambos sentidos
+            trabajo.avanzar("cruce")
+            cruce = etapa_cruce(libro.movimientos, df_arca, libro.importes)
+            importes = libro.importes
+
+            # Sugerir coincidencias para los comprobantes que no cruzaron
+            trabajo.avanzar("sugerencias")
+            sugerencias = etapa_sugerencias(cruce)
+
+            # Buscar los faltantes en los períodos vecinos del historial
+            varios = len(uploaded_files) > 1 or len(uploaded_zips) > 1
+            if meses is not None and varios:
+                mensajes.append(
+                    ("info", "El historial se usa solo al subir un TXT y un ZIP.")
+                )
+            elif meses is not None:
+                trabajo.avanzar("historial")
+                try:
+                    hojas_vecinos = cruzar_con_historial(
+                        df_encabezado,
+                        libro,
+                        df_arca,
+                        cruce,
+                        meses,
+                        sha_txt,
+                        sha_zip,
+                        guardados,
+                    )
+                except (ErrorProcesamiento, sqlite3.Error) as e:
+                    mensajes.append(("warning", f"No se pudo usar el historial: {e}"))
+    finally:
+        if perfil is not None:
+            perfil.disable()
+        exportar_metricas(registro, mensajes)
+
+    return ResultadoTrabajo(
+        cruce,
+        importes,
+        control,
+        sugerencias,
+        hojas_vecinos,
+        registro,
+        perfil,
+        mensajes,
+        set(),
+    )
 
 
-def procesar_zip_csv(zip_path):
-    with zipfile.ZipFile(zip_path, "r") as z:
-        for file in z.namelist():
-            if file.endswith(".csv"):
-                with z.open(file) as f:
-                    df_zip = pd.read_csv(f, dtype=str, delimiter=";")
-                return df_zip
-    return None
+@st.fragment(run_every=INTERVALO_PROGRESO)
+def seguir_trabajo(trabajo):
+    """Muestra el progreso del trabajo y permite cancelarlo.
 
+    Se vuelve a dibujar solo cada INTERVALO_PROGRESO segundos; cuando el
+    trabajo termina recarga la página entera para mostrar el resultado.
+    """
+    if trabajo.terminado():
+        st.rerun()
 
-def comprobantes_faltantes(df_txt, df_zip):
-    def limpiar_numero(val, largo):
-        if pd.isnull(val):
-            return "".zfill(largo)
-        try:
-            val = int(float(val))
-        except Exception:
-            pass
-        return str(val).zfill(largo)
-
-    df_txt["PV"] = df_txt["PV"].apply(lambda x: limpiar_numero(x, 5))
-    df_txt["Nro"] = df_txt["Nro"].apply(lambda x: limpiar_numero(x, 8))
-    df_zip["Punto de Venta"] = df_zip["Punto de Venta"].apply(
-        lambda x: limpiar_numero(x, 5)
-    )
-    df_zip["Número de Comprobante"] = df_zip["Número de Comprobante"].apply(
-        lambda x: limpiar_numero(x, 8)
-    )
-    df_txt["clave"] = df_txt["PV"] + "-" + df_txt["Nro"]
-    df_zip["clave"] = df_zip["Punto de Venta"] + "-" + df_zip["Número de Comprobante"]
-    faltantes = df_zip[~df_zip["clave"].isin(df_txt["clave"])].copy()
-    if "clave" in faltantes.columns:
-        faltantes = faltantes.drop(columns=["clave"])
-    return faltantes
-
-
-def comprobantes_faltantes_inverso(df_txt, df_zip):
-    def limpiar_numero(val, largo):
-        if pd.isnull(val):
-            return "".zfill(largo)
-        try:
-            val = int(float(val))
-        except Exception:
-            pass
-        return str(val).zfill(largo)
-
-    df_txt["PV"] = df_txt["PV"].apply(lambda x: limpiar_numero(x, 5))
-    df_txt["Nro"] = df_txt["Nro"].apply(lambda x: limpiar_numero(x, 8))
-    df_zip["Punto de Venta"] = df_zip["Punto de Venta"].apply(
-        lambda x: limpiar_numero(x, 5)
-    )
-    df_zip["Número de Comprobante"] = df_zip["Número de Comprobante"].apply(
-        lambda x: limpiar_numero(x, 8)
-    )
-    df_txt["clave"] = df_txt["PV"] + "-" + df_txt["Nro"]
-    df_zip["clave"] = df_zip["Punto de Venta"] + "-" + df_zip["Número de Comprobante"]
-    faltantes = df_txt[~df_txt["clave"].isin(df_zip["clave"])].copy()
-    if "clave" in faltantes.columns:
-        faltantes = faltantes.drop(columns=["clave"])
-    return faltantes
+    if trabajo.estado == ESTADO_EN_COLA:
+        texto = "En cola, esperando que terminen otros procesamientos..."
+    elif trabajo.cancelando():
+        texto = "Cancelando al terminar el paso en curso..."
+    else:
+        texto = PASOS_TRABAJO.get(trabajo.paso, "Procesando archivos...")
+        if trabajo.detalle is not None:
+            texto += f" ({trabajo.detalle})"
+    st.progress(trabajo.progreso(), text=texto)
+    st.button("Cancelar", on_click=trabajo.cancelar, disabled=trabajo.cancelando())
 
 
 def main():
@@ -558,86 +624,149 @@ def main():
     st.title("📊 Procesador de Movimientos IVA")
     st.markdown("---")
 
-    # Subir archivo TXT
-    uploaded_file = st.file_uploader(
-        "Selecciona el archivo de movimientos IVA",
+    # Subir archivos TXT (uno por período o libro)
+    uploaded_files = st.file_uploader(
+        "Selecciona los archivos de movimientos IVA",
         type=["txt"],
-        help="Sube un archivo de texto con los movimientos IVA",
+        accept_multiple_files=True,
+        help="Sube uno o varios archivos de texto con los movimientos IVA",
     )
 
-    # Subir archivo ZIP
-    uploaded_zip = st.file_uploader(
-        "Selecciona el archivo ZIP adicional",
+    # Subir archivos ZIP
+    uploaded_zips = st.file_uploader(
+        "Selecciona los archivos ZIP de ARCA",
         type=["zip"],
-        help="Sube un archivo ZIP adicional",
+        accept_multiple_files=True,
+        help="Sube uno o varios ZIP de ARCA; se cruzan todos juntos",
     )
 
-    if uploaded_file is None or uploaded_zip is None:
+    if not uploaded_files or not uploaded_zips:
         st.warning("Debes subir ambos archivos (TXT y ZIP) para continuar.")
         st.stop()
 
-    # Guardar archivos temporalmente
-    with open("temp_file.txt", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    with open("temp_file.zip", "wb") as f:
-        f.write(uploaded_zip.getbuffer())
+    # Opciones de diagnóstico
+    with st.sidebar:
+        st.header("Diagnóstico")
+        ver_diagnostico = st.checkbox(
+            "Mostrar tiempos por etapa",
+            help="Duración, filas, bytes y (opcional) pico de memoria de cada etapa",
+        )
+        medir_memoria = st.checkbox(
+            "Medir pico de memoria",
+            help="Usa tracemalloc; el procesamiento se vuelve más lento",
+        )
+        perfilar = st.checkbox(
+            "Capturar perfil (cProfile) de esta ejecución",
+            help="Ejecuta todas las etapas sin caché y permite descargar el perfil",
+        )
+
+        st.header("Cruce")
+        tolerancia = st.number_input(
+            "Tolerancia de importes ($)",
+            min_value=0.0,
+            value=TOLERANCIA_IMPORTE,
+            step=0.5,
+            help="Diferencia máxima entre Mendez y ARCA para considerar iguales "
+            "el neto, el IVA y el total de un comprobante",
+        )
 
-    with st.spinner("Procesando archivos..."):
-        # Procesar archivo TXT
-        excel_filename, df_mendez = procesar_archivo("temp_file.txt")
+        st.header("Historial")
+        usar_historial = st.checkbox(
+            "Guardar en el historial y buscar faltantes en períodos vecinos",
+            help="Guarda movimientos y comprobantes por CUIT y período en una base local",
+        )
+        meses_vecinos = st.number_input(
+            "Meses hacia cada lado", min_value=1, max_value=12, value=1, step=1
+        )
 
-        # Procesar archivo ZIP
-        df_arca = procesar_zip_csv("temp_file.zip")
+        st.header("Descarga")
+        formato = st.radio(
+            "Formato del consolidado",
+            formatos_disponibles(),
+            format_func=ETIQUETAS_FORMATO.get,
+            help="Solo se genera el formato elegido. CSV y Parquet no tienen "
+            "el límite de filas por hoja de Excel.",
+        )
 
-        if df_arca is not None:
-            # Crear DataFrames para el cruce
-            faltantes_arca_no_mendez = comprobantes_faltantes(df_mendez, df_arca)
-            faltantes_mendez_no_arca = comprobantes_faltantes_inverso(
-                df_mendez, df_arca
-            )
+    # Los archivos se procesan en memoria, sin escribir nada en disco
+    sha_txt = huellas(uploaded_files)
+    sha_zip = huellas(uploaded_zips)
+    meses = int(meses_vecinos) if usar_historial else None
+    clave = (sha_txt, sha_zip, tolerancia, meses, medir_memoria, perfilar)
+
+    # Otros archivos u opciones cancelan el procesamiento anterior y encolan
+    # uno nuevo; el resultado queda en la sesión al terminar
+    trabajo = st.session_state.get("trabajo")
+    if trabajo is None or trabajo.clave != clave:
+        if trabajo is not None:
+            trabajo.cancelar()
+        trabajo = cola_trabajos().enviar(
+            partial(
+                cruzar_en_segundo_plano,
+                uploaded_files=uploaded_files,
+                uploaded_zips=uploaded_zips,
+                sha_txt=sha_txt,
+                sha_zip=sha_zip,
+                tolerancia=tolerancia,
+                meses=meses,
+                medir_memoria=medir_memoria,
+                perfilar=perfilar,
+                guardados=st.session_state.setdefault("guardados_en_historial", set()),
+            ),
+            PASOS_TRABAJO,
+            clave=clave,
+        )
+        st.session_state["trabajo"] = trabajo
 
-            # Crear archivo Excel consolidado
-            excel_consolidado = crear_archivo_excel_consolidado(
-                df_mendez, df_arca, faltantes_arca_no_mendez, faltantes_mendez_no_arca
-            )
+    if not trabajo.terminado():
+        seguir_trabajo(trabajo)
+        st.stop()
+
+    if trabajo.estado == ESTADO_CANCELADO:
+        st.warning("Procesamiento cancelado.")
+        if st.button("Volver a procesar"):
+            del st.session_state["trabajo"]
+            st.rerun()
+        st.stop()
 
-            # Aplicar formato al archivo consolidado
-            aplicar_formato_excel_consolidado(excel_consolidado)
+    if trabajo.estado == ESTADO_ERROR:
+        st.exception(trabajo.error)
+        st.stop()
+
+    resultado = trabajo.resultado
+    for tipo, texto in resultado.mensajes:
+        getattr(st, tipo)(texto)
+    if resultado.control is not None:
+        mostrar_control_totales(resultado.control)
+
+    if resultado.cruce is not None:
+        st.success("✅ Archivos procesados correctamente!")
+
+        # Solo un botón de descarga para el archivo consolidado, que se
+        # genera recién cuando se pide
+        nombre_archivo, mime, _ = FORMATOS_CONSOLIDADO[formato]
+        st.download_button(
+            label=f"📥 Descargar consolidado: {ETIQUETAS_FORMATO[formato]}",
+            data=partial(
+                generar_consolidado,
+                sha_txt,
+                sha_zip,
+                formato,
+                tolerancia,
+                resultado,
+                medir_memoria,
+            ),
+            file_name=nombre_archivo,
+            mime=mime,
+            on_click="ignore",
+        )
 
-            st.success("✅ Archivos procesados correctamente!")
+        mostrar_vista_previa(sha_txt, sha_zip, tolerancia, resultado)
+        if resultado.hojas_vecinos is not None:
+            mostrar_periodos_vecinos(resultado.hojas_vecinos)
 
-            # Solo un botón de descarga para el archivo consolidado
-            with open(excel_consolidado, "rb") as f:
-                st.download_button(
-                    label="📥 Descargar Excel Consolidado",
-                    data=f.read(),
-                    file_name=excel_consolidado,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
-        else:
-            st.error("No se encontró un archivo CSV dentro del ZIP.")
-            # Limpiar archivos temporales
-            import os
-
-            if os.path.exists("temp_file.txt"):
-                os.remove("temp_file.txt")
-            if os.path.exists("temp_file.zip"):
-                os.remove("temp_file.zip")
-            st.stop()
-
-    # Limpiar archivos temporales
-    import os
-
-    if os.path.exists("temp_file.txt"):
-        os.remove("temp_file.txt")
-    if os.path.exists("temp_file.zip"):
-        os.remove("temp_file.zip")
-    if os.path.exists("Movimientos.xlsx"):
-        os.remove("Movimientos.xlsx")
-    if os.path.exists("Comprobantes_faltantes_zip_no_txt.xlsx"):
-        os.remove("Comprobantes_faltantes_zip_no_txt.xlsx")
-    if os.path.exists("Comprobantes_faltantes_txt_no_zip.xlsx"):
-        os.remove("Comprobantes_faltantes_txt_no_zip.xlsx")
+    if ver_diagnostico or resultado.perfil is not None:
+        mostrar_diagnostico(resultado.registro, resultado.perfil)
 
 
 if __name__ == "__main__":
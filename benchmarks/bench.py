@@ -0,0 +1,370 @@
+"""Benchmark por etapa del procesamiento completo sobre datos sintéticos.
+
+Uso:
+    python -m benchmarks.bench [--tamanos 1000 100000 1000000] [--repeticiones 3]
+                               [--salida resultados.json] [--comparar anterior.json]
+
+Por cada tamaño se genera (o se reutiliza de benchmarks/datos) un par TXT/ZIP
+y se mide cada etapa por separado: el mejor tiempo de varias repeticiones y,
+en una corrida aparte con tracemalloc, el pico de memoria. El resultado se
+guarda en JSON junto con el commit y las versiones usadas; con --comparar se
+contrasta contra una corrida anterior y se informa cada regresión.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import closing
+from itertools import islice
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from benchmarks.generar_datos import generar_par
+from procesador import (
+    FORMATO_XLSX,
+    LECTURA_LINEAS,
+    LINEAS_ENCABEZADO,
+    combinar_movimientos_duplicados,
+    controlar_totales_por_tasa,
+    crear_archivo_consolidado,
+    crear_archivo_excel_consolidado,
+    crear_dataframe_movimientos,
+    cruzar_comprobantes,
+    detectar_operacion,
+    formatos_disponibles,
+    leer_archivo,
+    leer_totales_por_tasa,
+    limpiar_lineas,
+    limpiar_lineas_adicional,
+    procesar_archivo,
+    procesar_movimientos,
+    procesar_zip_csv,
+)
+from sugerencias import sugerir_coincidencias
+
+DIRECTORIO_DATOS = os.path.join(os.path.dirname(__file__), "datos")
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+TAMANOS = (1000, 100000)
+
+# Procesos del parseo por bloques (al menos 2, para medirlo aun con un CPU)
+PROCESOS_PARALELO = max(os.cpu_count() or 1, 2)
+
+# Una etapa se considera más lenta solo si supera ambos márgenes, para no
+# marcar como regresión el ruido de las etapas que tardan milisegundos
+TOLERANCIA = 0.20
+MINIMO_SEGUNDOS = 0.05
+MINIMO_MB = 5.0
+
+
+# ============================================================================
+# ETAPAS
+# ============================================================================
+
+
+def limpiar(txt):
+    """Lee y limpia el cuerpo del TXT, materializando las líneas"""
+    with closing(leer_archivo(txt)) as lines:
+        compras_o_ventas = ""
+        for line in islice(lines, LINEAS_ENCABEZADO):
+            compras_o_ventas = detectar_operacion(line, compras_o_ventas)
+        return list(limpiar_lineas_adicional(limpiar_lineas(lines, compras_o_ventas)))
+
+
+def filas_excel(cruce):
+    """Cantidad de filas de datos escritas en las hojas del Excel consolidado"""
+    return sum(
+        len(df)
+        for df in (
+            cruce.mendez,
+            cruce.arca,
+            cruce.arca_no_en_mendez,
+            cruce.mendez_no_en_arca,
+        )
+    )
+
+
+def etapas(txt, zip_path):
+    """Devuelve las etapas en orden como (nombre, función, cantidad de filas).
+
+    Cada función recibe el diccionario de resultados previos y devuelve el
+    suyo, de modo que las etapas se pueden medir de a una. La cantidad de
+    filas se calcula a partir del resultado de la etapa y de los previos.
+    """
+    return [
+        ("limpiar_lineas", lambda r: limpiar(txt), lambda x, r: len(x)),
+        (
+            "procesar_movimientos",
+            lambda r: procesar_movimientos(r["limpiar_lineas"]),
+            lambda a, r: a.filas,
+        ),
+        (
+            "crear_dataframe_movimientos",
+            lambda r: crear_dataframe_movimientos(r["procesar_movimientos"]),
+            lambda libro, r: len(libro.movimientos),
+        ),
+        (
+            "controlar_totales_por_tasa",
+            lambda r: controlar_totales_por_tasa(
+                leer_totales_por_tasa(txt), r["crear_dataframe_movimientos"].importes
+            ),
+            lambda control, r: len(r["crear_dataframe_movimientos"].importes),
+        ),
+        (
+            "combinar_movimientos_duplicados",
+            lambda r: combinar_movimientos_duplicados(
+                r["crear_dataframe_movimientos"]
+            ),
+            lambda libro, r: len(libro.movimientos),
+        ),
+        ("procesar_archivo", lambda r: procesar_archivo(txt), lambda d, r: len(d[1].movimientos)),
+        (
+            "procesar_archivo_lineas",
+            lambda r: procesar_archivo(txt, lectura=LECTURA_LINEAS),
+            lambda d, r: len(d[1].movimientos),
+        ),
+        (
+            "procesar_archivo_paralelo",
+            lambda r: procesar_archivo(txt, procesos=PROCESOS_PARALELO),
+            lambda d, r: len(d[1].movimientos),
+        ),
+        ("procesar_zip_csv", lambda r: procesar_zip_csv(zip_path), lambda x, r: len(x)),
+        (
+            "cruzar_comprobantes",
+            lambda r: cruzar_comprobantes(
+                r["procesar_archivo"][1].movimientos, r["procesar_zip_csv"]
+            ),
+            lambda c, r: len(c.coincidentes),
+        ),
+        (
+            "cruzar_comprobantes_diferencias",
+            lambda r: cruzar_comprobantes(
+                r["procesar_archivo"][1].movimientos,
+                r["procesar_zip_csv"],
+                importes_mendez=r["procesar_archivo"][1].importes,
+            ),
+            lambda c, r: len(c.diferencias),
+        ),
+        (
+            "sugerir_coincidencias",
+            lambda r: sugerir_coincidencias(
+                r["cruzar_comprobantes"].mendez_no_en_arca,
+                r["cruzar_comprobantes"].arca_no_en_mendez,
+            ),
+            lambda x, r: len(x),
+        ),
+        (
+            "crear_archivo_excel_consolidado",
+            lambda r: crear_archivo_excel_consolidado(
+                r["cruzar_comprobantes"].mendez,
+                r["cruzar_comprobantes"].arca,
+                r["cruzar_comprobantes"].arca_no_en_mendez,
+                r["cruzar_comprobantes"].mendez_no_en_arca,
+                r["procesar_archivo"][1].importes,
+            ),
+            lambda x, r: filas_excel(r["cruzar_comprobantes"]),
+        ),
+        *(
+            (
+                f"crear_archivo_consolidado_{formato}",
+                lambda r, formato=formato: crear_archivo_consolidado(
+                    r["cruzar_comprobantes"].mendez,
+                    r["cruzar_comprobantes"].arca,
+                    r["cruzar_comprobantes"].arca_no_en_mendez,
+                    r["cruzar_comprobantes"].mendez_no_en_arca,
+                    r["procesar_archivo"][1].importes,
+                    formato=formato,
+                ),
+                lambda x, r: filas_excel(r["cruzar_comprobantes"]),
+            )
+            for formato in formatos_disponibles()
+            if formato != FORMATO_XLSX
+        ),
+    ]
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+
+def medir_tiempo(funcion, previos, repeticiones):
+    """Devuelve el resultado y el mejor tiempo de varias repeticiones"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion(previos)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return resultado, mejor
+
+
+def medir_memoria(funcion, previos):
+    """Devuelve el pico de memoria (MB) asignado durante la etapa"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion(previos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico / 2**20
+
+
+def medir_tamano(movimientos, repeticiones, semilla=0, omitir=()):
+    """Mide todas las etapas para un tamaño de libro"""
+    txt, zip_path = generar_par(DIRECTORIO_DATOS, movimientos, semilla=semilla)
+    resultados = {}
+    mediciones = {}
+
+    for nombre, funcion, filas in etapas(txt, zip_path):
+        if nombre in omitir:
+            continue
+
+        resultado, segundos = medir_tiempo(funcion, resultados, repeticiones)
+        pico_mb = medir_memoria(funcion, resultados)
+        resultados[nombre] = resultado
+        mediciones[nombre] = {
+            "segundos": round(segundos, 4),
+            "pico_mb": round(pico_mb, 2),
+            "filas": int(filas(resultado, resultados)),
+        }
+        print(
+            f"{movimientos:>9} {nombre:<34} {segundos:>9.3f} s "
+            f"{pico_mb:>9.1f} MB {mediciones[nombre]['filas']:>9} filas",
+            flush=True,
+        )
+
+    return {
+        "txt_bytes": os.path.getsize(txt),
+        "zip_bytes": os.path.getsize(zip_path),
+        "etapas": mediciones,
+    }
+
+
+def commit_actual():
+    """Devuelve el hash corto del commit y si hay cambios sin commitear"""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=raiz,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        cambios = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=raiz,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido", False
+    return commit, bool(cambios)
+
+
+# ============================================================================
+# COMPARACIÓN ENTRE CORRIDAS
+# ============================================================================
+
+
+def comparar(anterior, actual, tolerancia=TOLERANCIA):
+    """Devuelve la lista de regresiones de actual respecto de anterior"""
+    regresiones = []
+
+    for tamano, medicion in actual["tamanos"].items():
+        previas = anterior.get("tamanos", {}).get(tamano, {}).get("etapas", {})
+        for etapa, valores in medicion["etapas"].items():
+            previa = previas.get(etapa)
+            if previa is None:
+                continue
+
+            for metrica, minimo in (("segundos", MINIMO_SEGUNDOS), ("pico_mb", MINIMO_MB)):
+                antes, ahora = previa[metrica], valores[metrica]
+                if ahora > antes * (1 + tolerancia) and ahora - antes > minimo:
+                    regresiones.append(
+                        f"{tamano} {etapa} {metrica}: {antes} -> {ahora} "
+                        f"(+{(ahora / antes - 1) * 100 if antes else float('inf'):.0f}%)"
+                    )
+
+    return regresiones
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide cada etapa del cruce sobre libros sintéticos."
+    )
+    parser.add_argument(
+        "--tamanos",
+        type=int,
+        nargs="+",
+        default=list(TAMANOS),
+        help="Cantidades de movimientos a medir (por ejemplo 1000 100000 1000000)",
+    )
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument(
+        "--omitir",
+        nargs="*",
+        default=[],
+        help="Etapas a no medir (por ejemplo crear_archivo_excel_consolidado)",
+    )
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args(argv)
+
+    commit, cambios = commit_actual()
+    actual = {
+        "commit": commit,
+        "cambios_sin_commitear": cambios,
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "openpyxl": openpyxl.__version__,
+        "plataforma": platform.platform(),
+        "repeticiones": args.repeticiones,
+        "tamanos": {},
+    }
+
+    for movimientos in args.tamanos:
+        actual["tamanos"][str(movimientos)] = medir_tamano(
+            movimientos, args.repeticiones, args.semilla, args.omitir
+        )
+
+    salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(actual, f, indent=2, ensure_ascii=False)
+    print(f"Resultados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        regresiones = comparar(anterior, actual, args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        if regresiones:
+            return 1
+        print(f"Sin regresiones respecto de {anterior.get('commit', args.comparar)}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
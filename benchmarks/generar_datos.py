@@ -0,0 +1,350 @@
+"""Generador de datos sintéticos: libros IVA de Mendez (TXT) y exportaciones de ARCA (ZIP).
+
+Uso:
+    python -m benchmarks.generar_datos --movimientos 100000 --salida benchmarks/datos
+
+Los archivos son deterministas para una misma semilla, de modo que las
+mediciones de distintos commits se hacen sobre exactamente los mismos datos.
+"""
+
+import argparse
+import os
+import random
+import zipfile
+from io import StringIO
+
+# Importes por línea según el tipo de tasa
+TASAS_IVA = {
+    "Tasa 21%": 0.21,
+    "T.10.5%": 0.105,
+    "Tasa 27%": 0.27,
+    "Tasa 2.5%": 0.025,
+}
+TASAS_MONOTRIBUTO = {"R.Monot21": 0.21, "R.Mont.10": 0.105}
+OTRAS_TASAS = ("Exento", "No Gravado", "Perc.IIBB", "Perc.IVA")
+
+RAZONES_SOCIALES = (
+    "DISTRIBUIDORA DEL NORTE SRL",
+    "PEREZ JUAN CARLOS",
+    "LA ESQUINA DE PALERMO SA",
+    "SERVICIOS INTEGRALES DEL LITORAL SRL",
+    "GOMEZ MARIA",
+    "AGROPECUARIA LOS ALAMOS SA",
+    "FERRETERIA CENTRAL",
+    "TRANSPORTES RAPIDOS DEL SUR SA",
+)
+
+MOVIMIENTOS_POR_PAGINA = 60
+
+# Puntos de venta de los comprobantes (los repetidos salen más seguido)
+PUNTOS_DE_VENTA = (1, 1, 1, 2, 3, 5)
+
+# Código del tipo de comprobante en ARCA según tipo y letra en Mendez
+CODIGOS_TIPO_ARCA = {("FC", "A"): "1", ("NC", "A"): "3", ("FC", "B"): "6", ("NC", "B"): "8"}
+
+COLUMNAS_ARCA = (
+    "Fecha de Emisión",
+    "Tipo de Comprobante",
+    "Punto de Venta",
+    "Número de Comprobante",
+    "Número Hasta",
+    "Cód. Autorización",
+    "Tipo Doc. Emisor/Receptor",
+    "Nro. Doc. Emisor/Receptor",
+    "Denominación Emisor/Receptor",
+    "Tipo Cambio",
+    "Moneda",
+    "Imp. Neto Gravado",
+    "Imp. Neto No Gravado",
+    "Imp. Op. Exentas",
+    "Otros Tributos",
+    "IVA",
+    "Imp. Total",
+)
+
+
+# ============================================================================
+# FORMATO DE LÍNEAS
+# ============================================================================
+
+
+def formatear_importe(valor):
+    """Formatea un importe con coma decimal, como en el libro de Mendez"""
+    return f"{valor:.2f}".replace(".", ",")
+
+
+def region_importes(tasa, importes, pegados=False):
+    """Arma la parte variable de la línea (desde la columna 70).
+
+    Con pegados=True el neto y el IVA quedan separados por solo dos espacios,
+    como ocurre en el libro real con importes muy largos.
+    """
+    textos = [f"{formatear_importe(importe):>12}" for importe in importes]
+    if pegados:
+        textos[:2] = [textos[0] + "  " + textos[1].lstrip()]
+    return f"{tasa:<10}   " + "   ".join(textos)
+
+
+def linea_movimiento(comprobante, region):
+    """Arma la primera línea de un movimiento con sus campos de ancho fijo"""
+    cabecera = (
+        f"{comprobante['dia']:02d} {comprobante['tipo']} {comprobante['pv']:05d} "
+        f"{comprobante['nro']:08d}{comprobante['letra']} "
+        f"{comprobante['razon'][:22]:<22} {comprobante['condicion']:<4} "
+        f"{comprobante['cuit']:<13} {comprobante['concepto']:03d} "
+        f"{comprobante['jurisdiccion']} "
+    )
+    return cabecera + region
+
+
+def cuit_aleatorio(rnd):
+    """Genera un CUIT con formato XX-XXXXXXXX-X"""
+    return f"{rnd.choice((20, 23, 27, 30, 33))}-{rnd.randint(10000000, 99999999)}-{rnd.randint(0, 9)}"
+
+
+# ============================================================================
+# LIBRO DE MENDEZ
+# ============================================================================
+
+
+def importes_tasa(rnd, tasa, operacion):
+    """Devuelve los importes de una línea: neto, IVA y total, o neto y total"""
+    neto = round(rnd.uniform(100, 500000), 2)
+    alicuota = TASAS_IVA.get(tasa)
+    if alicuota is None and operacion == "Ventas":
+        alicuota = TASAS_MONOTRIBUTO.get(tasa)
+
+    if alicuota is not None:
+        iva = round(neto * alicuota, 2)
+        return [neto, iva, round(neto + iva, 2)]
+    return [neto, neto]
+
+
+def generar_txt(
+    salida,
+    movimientos,
+    semilla=0,
+    operacion="Ventas",
+    periodo="01/2024",
+    clientes=500,
+    puntos_de_venta=PUNTOS_DE_VENTA,
+):
+    """Escribe un libro IVA de Mendez con la cantidad de movimientos indicada.
+
+    Devuelve la lista de comprobantes generados (uno por PV-Nro) con sus
+    totales, para armar la exportación de ARCA correspondiente.
+    """
+    rnd = random.Random(semilla)
+    contrapartes = [
+        (rnd.choice(RAZONES_SOCIALES), cuit_aleatorio(rnd)) for _ in range(clientes)
+    ]
+    todas_las_tasas = list(TASAS_IVA) + list(TASAS_MONOTRIBUTO) + list(OTRAS_TASAS)
+
+    comprobantes = []
+    totales = {}
+    numeros = {}
+    pagina = 0
+
+    def escribir(linea):
+        salida.write(linea + "\n")
+
+    # Encabezado que lee procesar_encabezado (líneas 1 a 6) y relleno hasta la 9
+    escribir("\x1b[1m")
+    escribir("ESTUDIO CONTABLE DE PRUEBA SA")
+    escribir("AV. CORRIENTES 1234 - CABA")
+    escribir("30-71234567-8")
+    escribir(f"LIBRO  IVA {operacion.upper()}")
+    escribir(f"PERIODO  {periodo}")
+    escribir("")
+    escribir("")
+    escribir("")
+
+    for i in range(movimientos):
+        if i % MOVIMIENTOS_POR_PAGINA == 0:
+            pagina += 1
+            escribir("-" * 132)
+            escribir(f"Fe Cp PV    Numero   L Razon Social  IVA {operacion.upper()}")
+            escribir("--")
+
+        pv = rnd.choice(puntos_de_venta)
+        numeros[pv] = numeros.get(pv, 0) + rnd.choice((1, 1, 1, 2))
+        razon, cuit = rnd.choice(contrapartes)
+        comprobante = {
+            "dia": rnd.randint(1, 28),
+            "tipo": "NC" if rnd.random() < 0.08 else "FC",
+            "pv": pv,
+            "nro": numeros[pv],
+            "letra": rnd.choice("AAAB"),
+            "razon": razon,
+            "condicion": rnd.choice(("RI", "MT", "CF", "EX")),
+            "cuit": cuit,
+            "concepto": rnd.choice((1, 2, 3)),
+            "jurisdiccion": rnd.choice("BCDS"),
+            "neto": 0.0,
+            "iva": 0.0,
+            "total": 0.0,
+        }
+        signo = -1 if comprobante["tipo"] == "NC" else 1
+
+        # Entre una y tres líneas con tasas distintas; a veces la misma dos veces
+        tasas = rnd.sample(todas_las_tasas, rnd.choice((1, 1, 1, 2, 2, 3)))
+        if len(tasas) == 2 and rnd.random() < 0.2:
+            tasas[1] = tasas[0]
+        # A veces el mismo comprobante aparece partido en dos entradas seguidas
+        partido = rnd.random() < 0.03 and len(tasas) > 1
+
+        for j, tasa in enumerate(tasas):
+            importes = importes_tasa(rnd, tasa, operacion)
+            acumulados = totales.setdefault(tasa, [0.0] * len(importes))
+            for k, importe in enumerate(importes):
+                acumulados[k] = round(acumulados[k] + signo * importe, 2)
+            if len(importes) == 3:
+                comprobante["neto"] += importes[0]
+                comprobante["iva"] += importes[1]
+            comprobante["total"] += importes[-1]
+
+            if j == 0 or (partido and j == 1):
+                pegados = len(importes) == 3 and rnd.random() < 0.02
+                region = region_importes(tasa, importes, pegados)
+                escribir("\x1b[0m" + linea_movimiento(comprobante, region))
+            else:
+                escribir(" " * 70 + region_importes(tasa, importes))
+
+        comprobantes.append(comprobante)
+
+        if i % MOVIMIENTOS_POR_PAGINA == MOVIMIENTOS_POR_PAGINA - 1:
+            escribir(" " * 40 + f"PPag.: {pagina}")
+
+    # Trailer con los totales por tasa con el mismo formato que las líneas
+    # (las NC restan)
+    escribir("")
+    escribir("TOTALES POR TASA")
+    for tasa, acumulados in totales.items():
+        escribir(region_importes(tasa, acumulados))
+
+    return comprobantes
+
+
+# ============================================================================
+# EXPORTACIÓN DE ARCA
+# ============================================================================
+
+
+def generar_zip(
+    ruta, comprobantes, solapamiento=0.95, solo_arca=0.03, semilla=0, archivos_csv=1
+):
+    """Escribe el ZIP de ARCA a partir de los comprobantes del libro.
+
+    solapamiento es la fracción de comprobantes de Mendez que también figuran
+    en ARCA; solo_arca agrega esa proporción de comprobantes que solo están en
+    ARCA. Con archivos_csv > 1 el período se reparte en varios CSV.
+    """
+    rnd = random.Random(semilla)
+    filas = []
+    vistos = set()
+
+    for comprobante in comprobantes:
+        clave = (comprobante["pv"], comprobante["nro"])
+        if clave in vistos or rnd.random() >= solapamiento:
+            continue
+        vistos.add(clave)
+        filas.append(comprobante)
+
+    for i in range(int(len(comprobantes) * solo_arca)):
+        neto = round(rnd.uniform(100, 500000), 2)
+        filas.append(
+            {
+                "dia": rnd.randint(1, 28),
+                "tipo": "FC",
+                "pv": 99,
+                "nro": i + 1,
+                "razon": rnd.choice(RAZONES_SOCIALES),
+                "cuit": cuit_aleatorio(rnd),
+                "neto": neto,
+                "iva": round(neto * 0.21, 2),
+                "total": round(neto * 1.21, 2),
+            }
+        )
+
+    partes = [StringIO() for _ in range(archivos_csv)]
+    for parte in partes:
+        parte.write(";".join(COLUMNAS_ARCA) + "\n")
+
+    for i, comprobante in enumerate(filas):
+        tipo = CODIGOS_TIPO_ARCA[comprobante["tipo"], comprobante.get("letra", "A")]
+        valores = (
+            f"2024-01-{comprobante['dia']:02d}",
+            tipo,
+            str(comprobante["pv"]),
+            str(comprobante["nro"]),
+            str(comprobante["nro"]),
+            str(rnd.randint(10**13, 10**14 - 1)),
+            "80",
+            comprobante["cuit"].replace("-", ""),
+            comprobante["razon"],
+            "1",
+            "PES",
+            formatear_importe(comprobante["neto"]),
+            "0",
+            formatear_importe(comprobante["total"] - comprobante["neto"] - comprobante["iva"]),
+            "0",
+            formatear_importe(comprobante["iva"]),
+            formatear_importe(comprobante["total"]),
+        )
+        partes[i * archivos_csv // max(len(filas), 1)].write(";".join(valores) + "\n")
+
+    with zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED) as z:
+        for i, parte in enumerate(partes, start=1):
+            z.writestr(f"comprobantes_{i}.csv", parte.getvalue())
+
+
+def generar_par(directorio, movimientos, semilla=0, **opciones_zip):
+    """Genera (si no existen) el TXT y el ZIP de un tamaño y devuelve sus rutas"""
+    os.makedirs(directorio, exist_ok=True)
+    txt = os.path.join(directorio, f"mendez_{movimientos}_{semilla}.txt")
+    zip_path = os.path.join(directorio, f"arca_{movimientos}_{semilla}.zip")
+
+    if not (os.path.exists(txt) and os.path.exists(zip_path)):
+        with open(txt, "w", encoding="latin-1", newline="\r\n") as f:
+            comprobantes = generar_txt(f, movimientos, semilla=semilla)
+        generar_zip(zip_path, comprobantes, semilla=semilla, **opciones_zip)
+
+    return txt, zip_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Genera libros de Mendez y exportaciones de ARCA sintéticos."
+    )
+    parser.add_argument("--movimientos", type=int, default=1000)
+    parser.add_argument("--salida", default=os.path.join("benchmarks", "datos"))
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument(
+        "--solapamiento",
+        type=float,
+        default=0.95,
+        help="Fracción de comprobantes de Mendez presentes en ARCA",
+    )
+    parser.add_argument(
+        "--solo-arca",
+        type=float,
+        default=0.03,
+        help="Proporción de comprobantes que solo están en ARCA",
+    )
+    parser.add_argument("--archivos-csv", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    txt, zip_path = generar_par(
+        args.salida,
+        args.movimientos,
+        semilla=args.semilla,
+        solapamiento=args.solapamiento,
+        solo_arca=args.solo_arca,
+        archivos_csv=args.archivos_csv,
+    )
+    print(txt)
+    print(zip_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark del tiempo de importación de cada módulo, en intérpretes nuevos.
+
+Uso:
+    python -m benchmarks.importacion [--modulos procesador lote ...]
+                                     [--repeticiones 5] [--salida resultados.json]
+
+Cada repetición importa el módulo en un proceso de Python aparte (como un
+proceso del lote o un contenedor recién levantado) y mide el tiempo de la
+importación y el del proceso completo; se informa el mejor de cada uno. Además
+se verifica que los módulos del procesamiento no carguen dependencias que
+solo hacen falta para la interfaz o para exportar (por ejemplo streamlit u
+openpyxl): si alguno las carga, termina con código de salida 1.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que se miden, del procesamiento primero
+MODULOS = (
+    "procesador",
+    "sugerencias",
+    "vista_previa",
+    "almacen",
+    "trabajos",
+    "diagnostico",
+    "lote",
+    "servicio",
+    "app",
+)
+
+# Dependencias que cada módulo no debe cargar al importarse (por defecto,
+# las de la interfaz y las de exportar a Excel)
+NO_CARGAR = ("streamlit", "openpyxl")
+NO_CARGAR_POR_MODULO = {"app": ("openpyxl",)}
+
+REPETICIONES = 5
+
+# Código que corre en el proceso nuevo: importa el módulo y devuelve en JSON
+# el tiempo de importación y cuáles de las dependencias quedaron cargadas
+CODIGO_MEDICION = """
+import importlib, json, sys, time
+modulo, vigiladas = sys.argv[1], sys.argv[2:]
+inicio = time.perf_counter()
+importlib.import_module(modulo)
+segundos = time.perf_counter() - inicio
+print(json.dumps({
+    "segundos": segundos,
+    "modulos": len(sys.modules),
+    "cargadas": [nombre for nombre in vigiladas if nombre in sys.modules],
+}))
+"""
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+
+def importar_en_proceso_nuevo(modulo, vigiladas):
+    """Importa el módulo en un intérprete nuevo y devuelve la medición y el total"""
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, "-c", CODIGO_MEDICION, modulo, *vigiladas],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = time.perf_counter() - inicio
+    # La última línea es la medición; lo anterior son avisos del módulo
+    medicion = json.loads(proceso.stdout.strip().splitlines()[-1])
+    return medicion, total
+
+
+def medir_modulo(modulo, repeticiones):
+    """Mejor tiempo de importación y de proceso completo de varias repeticiones"""
+    vigiladas = NO_CARGAR_POR_MODULO.get(modulo, NO_CARGAR)
+    importacion = proceso = float("inf")
+    for _ in range(repeticiones):
+        medicion, total = importar_en_proceso_nuevo(modulo, vigiladas)
+        importacion = min(importacion, medicion["segundos"])
+        proceso = min(proceso, total)
+
+    return {
+        "segundos_importacion": round(importacion, 4),
+        "segundos_proceso": round(proceso, 4),
+        "modulos_cargados": medicion["modulos"],
+        "no_permitidas": medicion["cargadas"],
+    }
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mide el tiempo de importación de cada módulo en procesos nuevos."
+    )
+    parser.add_argument("--modulos", nargs="+", default=list(MODULOS))
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args(argv)
+
+    # Costo de levantar el intérprete sin importar nada del proyecto
+    base = medir_modulo("sys", args.repeticiones)["segundos_proceso"]
+    print(f"{'(intérprete)':<14} {'':>24}{base:>9.3f} s proceso")
+
+    resultados = {"python": sys.version.split()[0], "interprete_vacio": base}
+    problemas = []
+    for modulo in args.modulos:
+        medicion = medir_modulo(modulo, args.repeticiones)
+        resultados[modulo] = medicion
+        print(
+            f"{modulo:<14} {medicion['segundos_importacion']:>9.3f} s importación "
+            f"{medicion['segundos_proceso']:>9.3f} s proceso "
+            f"{medicion['modulos_cargados']:>6} módulos",
+            flush=True,
+        )
+        if medicion["no_permitidas"]:
+            problemas.append(f"{modulo} carga {', '.join(medicion['no_permitidas'])}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.salida}")
+
+    for problema in problemas:
+        print(f"DEPENDENCIA AL IMPORTAR: {problema}")
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Instrumentación por etapa: tiempo, filas, bytes y pico de memoria.
+
+Las funciones de procesador.py reciben un RegistroEtapas opcional y anotan en
+él cada etapa que ejecutan. El registro se puede mostrar en la interfaz o
+exportar como líneas JSON o como textfile de Prometheus.
+"""
+
+import io
+import json
+import marshal
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Prefijo de las métricas exportadas a Prometheus
+PREFIJO_METRICAS = "cruce_arca_etapa"
+
+METRICAS_PROMETHEUS = (
+    ("segundos", "segundos", "Duración de la etapa en segundos"),
+    ("filas", "filas", "Filas producidas por la etapa"),
+    ("bytes_entrada", "bytes_entrada", "Bytes de entrada de la etapa"),
+    ("bytes_salida", "bytes_salida", "Bytes de salida de la etapa"),
+    ("pico_bytes", "pico_memoria_bytes", "Pico de memoria asignada (tracemalloc)"),
+)
+
+# tracemalloc es global al proceso: se enciende con la primera etapa que
+# mide memoria y se apaga con la última, aunque corran en hilos distintos
+_bloqueo_tracemalloc = threading.Lock()
+_etapas_midiendo = 0
+
+
+# ============================================================================
+# REGISTRO DE ETAPAS
+# ============================================================================
+
+
+def iniciar_tracemalloc():
+    """Enciende tracemalloc (si hace falta) y reinicia el pico"""
+    global _etapas_midiendo
+    with _bloqueo_tracemalloc:
+        if _etapas_midiendo == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _etapas_midiendo += 1
+        tracemalloc.reset_peak()
+
+
+def detener_tracemalloc():
+    """Devuelve el pico de memoria y apaga tracemalloc si nadie más lo usa"""
+    global _etapas_midiendo
+    with _bloqueo_tracemalloc:
+        _, pico = tracemalloc.get_traced_memory()
+        _etapas_midiendo -= 1
+        if _etapas_midiendo == 0:
+            tracemalloc.stop()
+    return pico
+
+
+class RegistroEtapas:
+    """Acumula las mediciones de las etapas de una ejecución.
+
+    Con medir_memoria=True cada etapa registra además el pico de memoria
+    asignada según tracemalloc, que vuelve más lento el procesamiento. Si hay
+    varias ejecuciones midiendo a la vez el pico es el de todo el proceso.
+    """
+
+    def __init__(self, medir_memoria=False):
+        self.medir_memoria = medir_memoria
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nombre, bytes_entrada=None):
+        """Mide el bloque como una etapa; el diccionario devuelto admite filas y bytes_salida"""
+        medicion = {
+            "etapa": nombre,
+            "segundos": None,
+            "filas": None,
+            "bytes_entrada": bytes_entrada,
+            "bytes_salida": None,
+            "pico_bytes": None,
+        }
+        if self.medir_memoria:
+            iniciar_tracemalloc()
+        inicio = time.perf_counter()
+
+        try:
+            yield medicion
+        finally:
+            medicion["segundos"] = round(time.perf_counter() - inicio, 6)
+            if self.medir_memoria:
+                medicion["pico_bytes"] = detener_tracemalloc()
+            self.etapas.append(medicion)
+
+    def total_segundos(self):
+        """Suma de la duración de todas las etapas registradas"""
+        return sum(medicion["segundos"] for medicion in self.etapas)
+
+
+@contextmanager
+def medir_etapa(registro, nombre, bytes_entrada=None):
+    """Mide una etapa en el registro, o no hace nada si registro es None.
+
+    bytes_entrada puede ser una función, que solo se evalúa si hay registro.
+    """
+    if registro is None:
+        yield {}
+    else:
+        if callable(bytes_entrada):
+            bytes_entrada = bytes_entrada()
+        with registro.etapa(nombre, bytes_entrada) as medicion:
+            yield medicion
+
+
+def tamano_origen(origen):
+    """Devuelve el tamaño en bytes de una ruta o de un archivo en memoria"""
+    if hasattr(origen, "getbuffer"):
+        return origen.getbuffer().nbytes
+    if hasattr(origen, "seek"):
+        posicion = origen.tell()
+        origen.seek(0, os.SEEK_END)
+        tamano = origen.tell()
+        origen.seek(posicion)
+        return tamano
+    return os.path.getsize(origen)
+
+
+def tamano_dataframes(*dfs):
+    """Devuelve los bytes en memoria de uno o varios DataFrames (sin medir los textos)"""
+    return int(sum(df.memory_usage(index=True).sum() for df in dfs))
+
+
+# ============================================================================
+# EXPORTACIÓN
+# ============================================================================
+
+
+def a_json_lines(registro, **etiquetas):
+    """Devuelve una línea JSON por etapa, con las etiquetas agregadas a cada una"""
+    marca = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return "".join(
+        json.dumps({"fecha": marca, **etiquetas, **medicion}, ensure_ascii=False)
+        + "\n"
+        for medicion in registro.etapas
+    )
+
+
+def formatear_etiquetas(etiquetas):
+    """Arma el bloque {clave="valor",...} de una métrica de Prometheus"""
+    partes = []
+    for clave, valor in etiquetas.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        partes.append(f'{clave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def etiquetas_etapa(medicion):
+    """Etiquetas propias de una medición: la etapa y, si se indicó, el archivo"""
+    propias = {"etapa": medicion["etapa"]}
+    if "archivo" in medicion:
+        propias["archivo"] = medicion["archivo"]
+    return propias
+
+
+def a_prometheus(registro, **etiquetas):
+    """Devuelve las mediciones en el formato de texto de Prometheus"""
+    lineas = []
+    for campo, nombre, ayuda in METRICAS_PROMETHEUS:
+        valores = [
+            (etiquetas_etapa(medicion), medicion[campo])
+            for medicion in registro.etapas
+            if medicion[campo] is not None
+        ]
+        if not valores:
+            continue
+
+        metrica = f"{PREFIJO_METRICAS}_{nombre}"
+        lineas.append(f"# HELP {metrica} {ayuda}")
+        lineas.append(f"# TYPE {metrica} gauge")
+        for propias, valor in valores:
+            lineas.append(
+                f"{metrica}{formatear_etiquetas({**etiquetas, **propias})} {valor}"
+            )
+    return "\n".join(lineas) + "\n" if lineas else ""
+
+
+def agregar_json_lines(ruta, registro, **etiquetas):
+    """Agrega las mediciones al final de un archivo de líneas JSON"""
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(a_json_lines(registro, **etiquetas))
+
+
+def escribir_prometheus(ruta, registro, **etiquetas):
+    """Reemplaza el textfile de Prometheus de forma atómica.
+
+    Si la escritura falla se borra el temporal y el textfile anterior queda
+    como estaba.
+    """
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    f = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=directorio, suffix=".tmp", delete=False
+    )
+    try:
+        with f:
+            f.write(a_prometheus(registro, **etiquetas))
+        os.replace(f.name, ruta)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+# ============================================================================
+# PERFIL CON CPROFILE
+# ============================================================================
+
+
+def perfil_a_bytes(perfil):
+    """Devuelve el perfil en el formato de pstats (el mismo que dump_stats)"""
+    perfil.create_stats()
+    return marshal.dumps(perfil.stats)
+
+
+def perfil_a_texto(perfil, limite=30):
+    """Devuelve el resumen de las funciones con más tiempo acumulado"""
+    salida = io.StringIO()
+    pstats.Stats(perfil, stream=salida).sort_stats("cumulative").print_stats(limite)
+    return salida.getvalue()
@@ -0,0 +1,143 @@
+"""Escritura de hojas de Excel con openpyxl, en modo write-only.
+
+procesador importa este módulo recién al exportar a Excel, así que openpyxl
+no se carga al importar el resto del procesamiento (lo que acelera el
+arranque de los procesos del lote y de la app).
+"""
+
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+FORMATO_MONEDA = '"$"#,##0.00'
+FORMATO_FECHA = "dd/mm/yyyy"
+
+# Primera columna (base 1) con importes en las hojas exportadas
+COLUMNA_MONEDA = 11
+
+# Filas que se convierten a celdas de una vez al escribir una hoja
+FILAS_POR_BLOQUE = 10000
+
+# Mismo estilo de títulos que usa pandas en to_excel
+BORDE_TITULO = Side(style="thin")
+ESTILO_TITULO = {
+    "font": Font(bold=True),
+    "border": Border(
+        left=BORDE_TITULO, right=BORDE_TITULO, top=BORDE_TITULO, bottom=BORDE_TITULO
+    ),
+    "alignment": Alignment(horizontal="center", vertical="top"),
+}
+
+
+# ============================================================================
+# CELDAS Y HOJAS
+# ============================================================================
+
+
+def celda_titulo(ws, valor):
+    """Crea la celda de título de una columna"""
+    cell = WriteOnlyCell(ws, value=valor)
+    cell.font = ESTILO_TITULO["font"]
+    cell.border = ESTILO_TITULO["border"]
+    cell.alignment = ESTILO_TITULO["alignment"]
+    return cell
+
+
+def celda_con_formato(ws, valor, formato):
+    """Crea una celda con el formato numérico indicado"""
+    cell = WriteOnlyCell(ws, value=valor)
+    cell.number_format = formato
+    return cell
+
+
+def escribir_dataframe(
+    ws, df, columna_moneda=COLUMNA_MONEDA, desde_columna=1, al_avanzar=None
+):
+    """Escribe el DataFrame fila por fila aplicando el formato de cada columna.
+
+    Las fechas llevan FORMATO_FECHA y, desde columna_moneda, el resto de las
+    columnas lleva FORMATO_MONEDA. Si se indica, al_avanzar(ws.title) se
+    llama antes de cada bloque de filas.
+    """
+    relleno = [None] * (desde_columna - 1)
+    ws.append(relleno + [celda_titulo(ws, col) for col in df.columns])
+
+    formatos = []
+    for i, col in enumerate(df.columns, start=desde_columna):
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            formatos.append(FORMATO_FECHA)
+        elif i >= columna_moneda:
+            formatos.append(FORMATO_MONEDA)
+        else:
+            formatos.append(None)
+
+    for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+        if al_avanzar is not None:
+            al_avanzar(ws.title)
+        bloque = df.iloc[inicio : inicio + FILAS_POR_BLOQUE].astype(object)
+        bloque = bloque.where(bloque.notna(), None)
+
+        for fila in bloque.itertuples(index=False, name=None):
+            ws.append(
+                relleno
+                + [
+                    celda_con_formato(ws, valor, formato)
+                    if formato is not None and valor is not None
+                    else valor
+                    for valor, formato in zip(fila, formatos)
+                ]
+            )
+
+
+# ============================================================================
+# LIBROS
+# ============================================================================
+
+
+def escribir_libro(hojas, destino, al_avanzar=None, columnas_moneda=None):
+    """Escribe las hojas (pares nombre, DataFrame) en un libro y lo guarda en destino.
+
+    columnas_moneda es un dict opcional nombre -> primera columna con
+    importes, para las hojas que no los tienen desde COLUMNA_MONEDA.
+    """
+    columnas_moneda = columnas_moneda or {}
+    wb = Workbook(write_only=True)
+    try:
+        for nombre, df in hojas:
+            escribir_dataframe(
+                wb.create_sheet(nombre),
+                df,
+                columna_moneda=columnas_moneda.get(nombre, COLUMNA_MONEDA),
+                al_avanzar=al_avanzar,
+            )
+    except BaseException:
+        # Cierra las hojas a medio escribir, que si no quedan abiertas hasta
+        # que las recolecta el garbage collector
+        for ws in wb.worksheets:
+            ws.close()
+        raise
+    wb.save(destino)
+
+
+def libro_movimientos(df_encabezado, df_movimientos):
+    """Arma el libro con la hoja Movimientos bajo el encabezado y devuelve sus bytes"""
+    wb = Workbook(write_only=True)
+    wm = wb.create_sheet("Movimientos")
+
+    # Encabezado en la columna F, filas 1 a 6
+    relleno = [None] * 5
+    wm.append(relleno + [celda_titulo(wm, col) for col in df_encabezado.columns])
+    for valor in df_encabezado.iloc[:, 0]:
+        wm.append(relleno + [valor])
+
+    # Movimientos desde la fila 9, con formato de moneda desde la columna 11
+    for _ in range(8 - 1 - len(df_encabezado)):
+        wm.append([])
+    escribir_dataframe(wm, df_movimientos)
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,334 @@
+"""Cruce por lotes de muchos clientes, sin la interfaz de Streamlit.
+
+Uso:
+    python lote.py ENTRADA [--salida DIR] [--procesos N] [--formato xlsx|csv|parquet]
+                           [--tolerancia PESOS]
+
+ENTRADA puede ser un directorio con pares <cliente>.txt / <cliente>.zip o un
+manifiesto CSV separado por ";" con las columnas cliente, txt y zip (las rutas
+relativas se toman desde la carpeta del manifiesto).
+
+Por cada cliente se escribe el consolidado en la carpeta de salida
+(<cliente>.xlsx, <cliente>_csv.zip o <cliente>_parquet.zip según --formato)
+y, al final, un índice resumen.csv con el estado y los totales de cada uno. Un
+TXT cuyos movimientos no coinciden con sus TOTALES POR TASA queda como error,
+sin leer su ZIP ni escribir el consolidado. Con
+--metricas se agregan las mediciones por etapa de cada cliente a un archivo de
+líneas JSON.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import pandas as pd
+
+from diagnostico import RegistroEtapas, agregar_json_lines
+from procesador import (
+    FORMATO_XLSX,
+    FORMATOS_CONSOLIDADO,
+    HOJA_CONTROL_TOTALES,
+    HOJA_SUGERENCIAS,
+    TOLERANCIA_IMPORTE,
+    crear_archivo_consolidado,
+    cruzar_archivos,
+    estado_control_totales,
+)
+from sugerencias import sugerir_coincidencias
+
+NOMBRE_RESUMEN = "resumen.csv"
+
+# Sufijo del archivo de cada cliente según el formato del consolidado
+SUFIJOS_FORMATO = {
+    "xlsx": ".xlsx",
+    "csv": "_csv.zip",
+    "parquet": "_parquet.zip",
+}
+
+COLUMNAS_RESUMEN = [
+    "cliente",
+    "estado",
+    "error",
+    "cuit",
+    "periodo",
+    "control_totales",
+    "movimientos_mendez",
+    "comprobantes_arca",
+    "arca_no_en_mendez",
+    "mendez_no_en_arca",
+    "diferencias_de_importe",
+    "sugerencias",
+    "consolidado",
+    "segundos",
+    "txt",
+    "zip",
+]
+COLUMNAS_CANTIDADES = [
+    "movimientos_mendez",
+    "comprobantes_arca",
+    "arca_no_en_mendez",
+    "mendez_no_en_arca",
+    "diferencias_de_importe",
+    "sugerencias",
+]
+
+
+# ============================================================================
+# ARMADO DEL LOTE
+# ============================================================================
+
+
+def buscar_pares(entrada):
+    """Devuelve la lista de (cliente, txt, zip) a procesar.
+
+    Un cliente al que le falta el TXT o el ZIP se devuelve igual, con None en
+    la ruta faltante, para que figure como error en el resumen.
+    """
+    if os.path.isdir(entrada):
+        archivos = {}
+        for nombre in sorted(os.listdir(entrada)):
+            cliente, extension = os.path.splitext(nombre)
+            extension = extension.lower()
+            if extension in (".txt", ".zip"):
+                archivos.setdefault(cliente, {})[extension] = os.path.join(
+                    entrada, nombre
+                )
+
+        return [
+            (cliente, rutas.get(".txt"), rutas.get(".zip"))
+            for cliente, rutas in archivos.items()
+        ]
+
+    base = os.path.dirname(os.path.abspath(entrada))
+    manifiesto = pd.read_csv(entrada, sep=";", dtype=str).fillna("")
+
+    def ruta(valor):
+        return os.path.join(base, valor) if valor else None
+
+    return [
+        (fila["cliente"], ruta(fila["txt"]), ruta(fila["zip"]))
+        for _, fila in manifiesto.iterrows()
+    ]
+
+
+# ============================================================================
+# PROCESAMIENTO
+# ============================================================================
+
+
+@contextmanager
+def archivo_atomico(ruta):
+    """Abre un temporal junto a ruta y lo mueve a ruta solo si el bloque termina bien.
+
+    Así un cliente que falla a mitad de la escritura no deja un consolidado
+    incompleto (ni el temporal) en la carpeta de salida.
+    """
+    f = tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(os.path.abspath(ruta)), suffix=".tmp", delete=False
+    )
+    try:
+        with f:
+            yield f
+        os.replace(f.name, ruta)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+def procesar_cliente(
+    cliente,
+    txt,
+    zip_path,
+    salida,
+    formato=FORMATO_XLSX,
+    tolerancia=TOLERANCIA_IMPORTE,
+):
+    """Cruza un cliente y escribe su consolidado; los errores se devuelven en la fila.
+
+    La fila incluye además el registro con las mediciones de cada etapa.
+    """
+    inicio = time.perf_counter()
+    registro = RegistroEtapas()
+    fila = {
+        "cliente": cliente,
+        "estado": "ok",
+        "error": "",
+        "txt": txt,
+        "zip": zip_path,
+        "registro": registro,
+    }
+
+    try:
+        if txt is None or zip_path is None:
+            raise FileNotFoundError("Falta el archivo TXT o el ZIP del cliente")
+
+        # Los clientes ya corren en paralelo: cada TXT se parsea en serie
+        df_encabezado, libro, cruce = cruzar_archivos(
+            txt,
+            zip_path,
+            registro=registro,
+            procesos=1,
+            tolerancia=tolerancia,
+            exigir_totales=True,
+        )
+        sugerencias = sugerir_coincidencias(
+            cruce.mendez_no_en_arca, cruce.arca_no_en_mendez, registro=registro
+        )
+
+        # El consolidado se escribe directo en el archivo, sin armarlo en memoria
+        consolidado = os.path.join(salida, cliente + SUFIJOS_FORMATO[formato])
+        with archivo_atomico(consolidado) as f:
+            crear_archivo_consolidado(
+                cruce.mendez,
+                cruce.arca,
+                cruce.arca_no_en_mendez,
+                cruce.mendez_no_en_arca,
+                libro.importes,
+                hojas_adicionales={
+                    HOJA_SUGERENCIAS: sugerencias,
+                    HOJA_CONTROL_TOTALES: libro.control,
+                },
+                formato=formato,
+                destino=f,
+                registro=registro,
+                diferencias=cruce.diferencias,
+            )
+
+        encabezado = df_encabezado.iloc[:, 0]
+        fila.update(
+            {
+                "cuit": encabezado.get("CUIT", ""),
+                "periodo": encabezado.get("PERIODO", ""),
+                "control_totales": estado_control_totales(libro.control),
+                "movimientos_mendez": len(cruce.mendez),
+                "comprobantes_arca": len(cruce.arca),
+                "arca_no_en_mendez": len(cruce.arca_no_en_mendez),
+                "mendez_no_en_arca": len(cruce.mendez_no_en_arca),
+                "diferencias_de_importe": len(cruce.diferencias),
+                "sugerencias": len(sugerencias),
+                "consolidado": consolidado,
+            }
+        )
+    except Exception as e:
+        fila.update({"estado": "error", "error": f"{type(e).__name__}: {e}"})
+
+    fila["segundos"] = round(time.perf_counter() - inicio, 3)
+    return fila
+
+
+def procesar_lote(
+    pares,
+    salida,
+    procesos=None,
+    metricas=None,
+    formato=FORMATO_XLSX,
+    tolerancia=TOLERANCIA_IMPORTE,
+):
+    """Procesa todos los clientes en un pool de procesos y escribe el resumen.
+
+    Cada cliente corre aislado: un error en uno queda registrado en su fila
+    del resumen y el resto del lote sigue adelante. Si se indica metricas, las
+    mediciones por etapa se agregan a ese archivo de líneas JSON.
+    """
+    os.makedirs(salida, exist_ok=True)
+    filas = []
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {
+            pool.submit(
+                procesar_cliente, cliente, txt, zip_path, salida, formato, tolerancia
+            ): (
+                cliente,
+                txt,
+                zip_path,
+            )
+            for cliente, txt, zip_path in pares
+        }
+
+        for futuro in as_completed(futuros):
+            cliente, txt, zip_path = futuros[futuro]
+            try:
+                fila = futuro.result()
+            except Exception as e:
+                # El proceso del cliente terminó de forma anormal
+                fila = {
+                    "cliente": cliente,
+                    "estado": "error",
+                    "error": f"{type(e).__name__}: {e}",
+                    "txt": txt,
+                    "zip": zip_path,
+                }
+            filas.append(fila)
+            if metricas and fila.get("registro") is not None:
+                agregar_json_lines(metricas, fila["registro"], cliente=cliente)
+            print(f"[{fila['estado']}] {cliente} {fila['error']}".rstrip())
+
+    resumen = pd.DataFrame(filas, columns=COLUMNAS_RESUMEN).sort_values("cliente")
+    resumen[COLUMNAS_CANTIDADES] = resumen[COLUMNAS_CANTIDADES].astype("Int64")
+    resumen.to_csv(os.path.join(salida, NOMBRE_RESUMEN), sep=";", index=False)
+    return resumen
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Cruza por lotes los TXT de Mendez contra los ZIP de ARCA."
+    )
+    parser.add_argument(
+        "entrada", help="Directorio con pares <cliente>.txt/.zip o manifiesto CSV"
+    )
+    parser.add_argument(
+        "--salida", default="resultados", help="Carpeta donde escribir los consolidados"
+    )
+    parser.add_argument(
+        "--procesos",
+        type=int,
+        default=None,
+        help="Cantidad de procesos en paralelo (por defecto, uno por CPU)",
+    )
+    parser.add_argument(
+        "--metricas",
+        default=None,
+        help="Archivo de líneas JSON donde agregar las mediciones por etapa",
+    )
+    parser.add_argument(
+        "--formato",
+        choices=list(FORMATOS_CONSOLIDADO),
+        default=FORMATO_XLSX,
+        help="Formato del consolidado de cada cliente (por defecto, xlsx)",
+    )
+    parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=TOLERANCIA_IMPORTE,
+        help="Diferencia máxima en pesos entre los importes de Mendez y ARCA "
+        "de un mismo comprobante",
+    )
+    args = parser.parse_args(argv)
+
+    pares = buscar_pares(args.entrada)
+    if not pares:
+        parser.error(f"No se encontraron archivos para procesar en {args.entrada}")
+
+    resumen = procesar_lote(
+        pares, args.salida, args.procesos, args.metricas, args.formato, args.tolerancia
+    )
+
+    errores = int((resumen["estado"] != "ok").sum())
+    print(
+        f"{len(resumen) - errores} clientes procesados, {errores} con error. "
+        f"Resumen en {os.path.join(args.salida, NOMBRE_RESUMEN)}"
+    )
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
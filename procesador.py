@@ -0,0 +1,2084 @@
+import pandas as pd
+import numpy as np
+import re
+import mmap
+import os
+import zipfile
+import importlib.util
+from io import BytesIO, TextIOWrapper
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing, contextmanager, nullcontext
+from functools import partial
+from itertools import islice
+
+from diagnostico import RegistroEtapas, medir_etapa, tamano_dataframes, tamano_origen
+
+
+# ============================================================================
+# ERRORES
+# ============================================================================
+
+
+class ErrorProcesamiento(Exception):
+    """Error al procesar los archivos de entrada; el mensaje es apto para el usuario"""
+
+
+# ============================================================================
+# FUNCIONES DE LECTURA Y LIMPIEZA DE ARCHIVOS
+# ============================================================================
+
+
+# Líneas del encabezado del reporte antes del cuerpo de movimientos
+LINEAS_ENCABEZADO = 9
+
+# Secuencias ANSI y caracteres de control ASCII, en una sola pasada
+PATRON_CONTROL = re.compile(r"\x1b[^m]*m|[\x00-\x1F\x7F]")
+PATRON_PPAG = re.compile(r"PPag\.\:\s*\d+\s*$")
+
+
+def abrir_binario(origen):
+    """Abre una ruta en modo binario; un archivo ya abierto se usa sin cerrarlo"""
+    if hasattr(origen, "read"):
+        return nullcontext(origen)
+    return open(origen, "rb")
+
+
+def leer_archivo(file_path):
+    """Genera las líneas del archivo decodificadas como UTF-8 o, si falla, Latin-1.
+
+    Acepta una ruta o un archivo binario en memoria (por ejemplo, BytesIO).
+    """
+    with abrir_binario(file_path) as f:
+        for line in f:
+            try:
+                yield line.decode("utf-8")
+            except UnicodeDecodeError:
+                yield line.decode("latin-1")
+
+
+def procesar_encabezado(lines):
+    """Procesa y extrae la información del encabezado del archivo"""
+    try:
+        encabezado = lines[1:7]
+        encabezado_limpio = [line.replace("\n", "").strip() for line in encabezado]
+
+        return {
+            "RAZON SOCIAL": encabezado_limpio[0],
+            "DIRECCION": encabezado_limpio[1],
+            "CUIT": encabezado_limpio[2],
+            "LIBRO": encabezado_limpio[3].split("  ")[-1],
+            "PERIODO": encabezado_limpio[4].split("  ")[-1],
+        }
+    except Exception as e:
+        raise ErrorProcesamiento(
+            f"Ocurrió un error al procesar el encabezado: {e}"
+        ) from e
+
+
+def detectar_operacion(line, compras_o_ventas=""):
+    """Devuelve "Ventas" o "Compras" si la línea lo indica, o el valor actual.
+
+    Los parsers la aplican desde el encabezado ("LIBRO IVA VENTAS") y línea
+    por línea: cada movimiento usa la operación vigente en su línea. Así un
+    libro cuyo cuerpo no repite la marca toma la del encabezado, y en un TXT
+    con secciones de ventas y de compras cada sección usa la suya (antes se
+    usaba para todo el archivo la última marca del cuerpo).
+    """
+    if "IVA VENTAS" in line:
+        return "Ventas"
+    if "IVA COMPRAS" in line:
+        return "Compras"
+    return compras_o_ventas
+
+
+def limpiar_lineas(lines, compras_o_ventas=""):
+    """Genera las líneas del cuerpo limpias de caracteres de control y bloques no deseados.
+
+    Recibe las líneas posteriores al encabezado y produce tuplas
+    (línea limpia, compras_o_ventas) hasta llegar a "TOTALES POR TASA".
+    """
+    eliminar = False
+
+    for line in lines:
+        # Detectar tipo de operación
+        compras_o_ventas = detectar_operacion(line, compras_o_ventas)
+
+        # Detectar fin de datos
+        if "TOTALES POR TASA" in line:
+            break
+
+        # Manejar bloques a eliminar
+        if line.startswith("----"):
+            eliminar = True
+            continue
+
+        if line.startswith("--"):
+            eliminar = False
+            continue
+
+        # Procesar líneas válidas
+        if not eliminar:
+            yield PATRON_CONTROL.sub("", line), compras_o_ventas
+
+
+def limpiar_pie(line):
+    """Quita el pie "PPag.: N" de una línea limpia.
+
+    Devuelve "" si lo que queda es muy corto y se saltea, o None si la línea
+    es corta sin pie, lo que marca el fin del cuerpo.
+    """
+    if "PPag." in line or len(line.strip()) < 35:
+        if not PATRON_PPAG.search(line):
+            return None
+        line = PATRON_PPAG.sub("", line)
+        if len(line.strip()) < 35:
+            return ""
+    return line
+
+
+def limpiar_lineas_adicional(cleaned_lines):
+    """Segunda limpieza: quita los pies "PPag.: N" y corta en la primera línea corta"""
+    for line, compras_o_ventas in cleaned_lines:
+        line = limpiar_pie(line)
+        if line is None:
+            return
+        if line:
+            yield line, compras_o_ventas
+
+
+# ============================================================================
+# FUNCIONES DE PROCESAMIENTO DE MOVIMIENTOS
+# ============================================================================
+
+
+# Tasas que se informan con neto e IVA en columnas separadas
+TASAS_NETO_IVA = (
+    "Tasa 21%",
+    "T.10.5%",
+    "Tasa 27%",
+    "C.F.21%",
+    "C.F.10.5%",
+    "Tasa 2.5%",
+    "T.IMP 21%",
+    "T.IMP 10%",
+)
+TASAS_MONOTRIBUTO = ("R.Monot21", "R.Mont.10")
+
+# Campos de ancho fijo de la primera línea de cada movimiento
+CAMPOS_ENCABEZADO = (
+    ("Fecha", 0, 2),
+    ("Comprobante", 3, 5),
+    ("PV", 6, 11),
+    ("Nro", 12, 20),
+    ("Letra", 20, 21),
+    ("Razon Social", 22, 44),
+    ("Condicion", 45, 49),
+    ("CUIT", 50, 63),
+    ("Concepto", 64, 67),
+    ("Jurisdiccion", 68, 69),
+)
+
+PATRON_SEPARADOR = re.compile(r"\s{3,}")
+
+
+def tasas_con_iva(compras_o_ventas):
+    """Devuelve las tasas que se informan con neto e IVA para el tipo de operación"""
+    if compras_o_ventas == "Ventas":
+        return frozenset(TASAS_NETO_IVA + TASAS_MONOTRIBUTO)
+    return frozenset(TASAS_NETO_IVA)
+
+
+TASAS_CON_IVA = {
+    operacion: tasas_con_iva(operacion) for operacion in ("Ventas", "Compras", "")
+}
+
+
+def nombres_columnas_tasa(tasa, con_iva):
+    """Nombres de las columnas de la tasa en la tabla ancha de exportación"""
+    if con_iva:
+        return (tasa + " Neto", tasa + " IVA")
+    return (tasa,)
+
+
+def convertir_monto(texto):
+    """Convierte un importe con coma decimal a centavos enteros (0 si no es numérico).
+
+    Los importes traen a lo sumo dos decimales, así que redondear el float
+    multiplicado por 100 da exactamente los centavos del texto.
+    """
+    try:
+        return round(float(texto.replace(",", ".")) * 100)
+    except (ValueError, OverflowError):
+        return 0
+
+
+class AcumuladorMovimientos:
+    """Acumula los movimientos directamente en columnas tipadas.
+
+    Los campos del encabezado se guardan en listas, una entrada por
+    movimiento. Los importes se guardan en formato largo, una entrada por
+    línea de tasa: número de movimiento, tasa, neto e IVA en centavos y si la
+    tasa discrimina IVA.
+    """
+
+    def __init__(self, continua_anterior=False):
+        self.continua_anterior = continua_anterior
+        self.encabezados = {campo: [] for campo, _, _ in CAMPOS_ENCABEZADO}
+        self.movimiento = array("q")
+        self.tasa = []
+        self.neto = array("q")
+        self.iva = array("q")
+        self.con_iva = array("b")
+        self.filas = 0
+
+    def nueva_fila(self, cleaned_line):
+        """Abre un movimiento nuevo con los campos de ancho fijo de la línea"""
+        for campo, desde, hasta in CAMPOS_ENCABEZADO:
+            self.encabezados[campo].append(cleaned_line[desde:hasta])
+        self.filas += 1
+
+    def sumar(self, tasa, montos, compras_o_ventas):
+        """Agrega los importes de la tasa al movimiento abierto.
+
+        Varias líneas de una misma tasa en un movimiento se suman, también
+        el monotributo de compras (que antes quedaba con el importe de la
+        última línea). Sin movimiento abierto los importes se descartan o, con
+        continua_anterior, quedan en el movimiento -1 (el último de un bloque
+        anterior, ver extender).
+        """
+        if not self.filas and not self.continua_anterior:
+            return
+
+        con_iva = tasa in TASAS_CON_IVA[compras_o_ventas]
+        self.movimiento.append(self.filas - 1)
+        self.tasa.append(tasa)
+        self.neto.append(convertir_monto(montos[0]))
+        self.iva.append(convertir_monto(montos[1]) if con_iva and len(montos) > 1 else 0)
+        self.con_iva.append(con_iva)
+
+    def extender(self, otro):
+        """Agrega al final los movimientos de otro acumulador (el bloque siguiente).
+
+        Los importes del movimiento -1 de otro pasan al último movimiento
+        propio, o se descartan si todavía no hay ninguno.
+        """
+        movimiento = np.frombuffer(otro.movimiento, dtype=np.int64) + self.filas
+        validos = movimiento >= 0
+
+        for campo, valores in otro.encabezados.items():
+            self.encabezados[campo].extend(valores)
+        self.movimiento.frombytes(movimiento[validos].tobytes())
+        self.tasa.extend(tasa for tasa, valido in zip(otro.tasa, validos) if valido)
+        for nombre in ("neto", "iva", "con_iva"):
+            valores = getattr(otro, nombre)
+            getattr(self, nombre).frombytes(
+                np.frombuffer(valores, dtype=valores.typecode)[validos].tobytes()
+            )
+        self.filas += otro.filas
+
+
+def procesar_movimientos(doble_cleaned_lines, acumulador=None):
+    """Procesa las líneas limpias acumulando los movimientos en columnas"""
+    if acumulador is None:
+        acumulador = AcumuladorMovimientos()
+
+    for cleaned_line, compras_o_ventas in doble_cleaned_lines:
+        if cleaned_line[0:2] == "  ":
+            # Línea continua del mismo movimiento
+            procesar_linea_continuacion(cleaned_line, acumulador, compras_o_ventas)
+        else:
+            procesar_nueva_entrada(cleaned_line, acumulador, compras_o_ventas)
+
+    return acumulador
+
+
+def procesar_linea_continuacion(cleaned_line, acumulador, compras_o_ventas):
+    """Procesa una línea que continúa un movimiento existente"""
+    partes = PATRON_SEPARADOR.split(cleaned_line[70:])
+    if len(partes) < 2:
+        return
+
+    acumulador.sumar(partes[0], partes[1:], compras_o_ventas)
+
+
+def procesar_nueva_entrada(cleaned_line, acumulador, compras_o_ventas):
+    """Procesa una nueva entrada de movimiento"""
+    partes = PATRON_SEPARADOR.split(cleaned_line[70:])
+    if len(partes) < 2:
+        return
+
+    acumulador.nueva_fila(cleaned_line)
+
+    # Neto e IVA separados por menos de tres espacios quedan en la misma parte
+    if len(partes) == 3:
+        partes = [partes[0]] + partes[1].split() + partes[2:]
+
+    acumulador.sumar(partes[0], partes[1:], compras_o_ventas)
+
+
+# ============================================================================
+# PARSEO DEL TXT
+# ============================================================================
+
+
+# Tamaño del TXT a partir del cual se parsea por bloques en paralelo
+UMBRAL_PARSEO_PARALELO = 32 * 2**20
+
+# Bloques por proceso, para repartir mejor la carga entre procesos
+BLOQUES_POR_PROCESO = 4
+
+# Los bloques empiezan en una línea "----", donde limpiar_lineas reinicia
+# su estado (abre un bloque a eliminar sin importar lo anterior)
+INICIO_BLOQUE = b"\n----"
+FIN_CUERPO = b"TOTALES POR TASA"
+
+
+def parsear_txt(file_path):
+    """Lee el TXT línea por línea y devuelve el encabezado y el acumulador"""
+    with closing(leer_archivo(file_path)) as lines:
+        encabezado = list(islice(lines, LINEAS_ENCABEZADO))
+
+        compras_o_ventas = ""
+        for line in encabezado:
+            compras_o_ventas = detectar_operacion(line, compras_o_ventas)
+
+        cleaned_lines = limpiar_lineas(lines, compras_o_ventas)
+        doble_cleaned_lines = limpiar_lineas_adicional(cleaned_lines)
+        return encabezado, procesar_movimientos(doble_cleaned_lines)
+
+
+def dividir_cuerpo(cuerpo, partes):
+    """Devuelve los comienzos de bloque: el del cuerpo y líneas "----" repartidas"""
+    inicios = [0]
+    for i in range(1, partes):
+        corte = cuerpo.find(INICIO_BLOQUE, max(len(cuerpo) * i // partes, inicios[-1]))
+        if corte < 0:
+            break
+        if corte + 1 > inicios[-1]:
+            inicios.append(corte + 1)
+    return inicios
+
+
+def operacion_al_inicio(cuerpo, inicio, compras_o_ventas):
+    """Devuelve el tipo de operación vigente al comienzo de un bloque.
+
+    Es el que dejaría detectar_operacion después de recorrer las líneas
+    anteriores: el de la última línea con "IVA VENTAS" o "IVA COMPRAS".
+    """
+    ventas = cuerpo.rfind(b"IVA VENTAS", 0, inicio)
+    compras = cuerpo.rfind(b"IVA COMPRAS", 0, inicio)
+    if ventas < 0 and compras < 0:
+        return compras_o_ventas
+    if ventas > compras:
+        return "Ventas"
+    # En una línea con las dos marcas gana "IVA VENTAS"
+    linea = cuerpo.rfind(b"\n", 0, compras) + 1
+    return "Ventas" if ventas >= linea else "Compras"
+
+
+def procesar_bloque(bloque, compras_o_ventas):
+    """Parsea un bloque del cuerpo; devuelve el acumulador y si el cuerpo terminó en él.
+
+    Las líneas de continuación del comienzo quedan en el movimiento -1, que
+    AcumuladorMovimientos.extender une al último movimiento del bloque anterior.
+    """
+    terminado = False
+
+    def lineas():
+        nonlocal terminado
+        for line, operacion in limpiar_lineas(
+            leer_archivo(BytesIO(bloque)), compras_o_ventas
+        ):
+            line = limpiar_pie(line)
+            if line is None:
+                terminado = True
+                return
+            if line:
+                yield line, operacion
+
+    acumulador = procesar_movimientos(
+        lineas(), AcumuladorMovimientos(continua_anterior=True)
+    )
+    return acumulador, terminado
+
+
+def parsear_txt_en_paralelo(file_path, procesos):
+    """Parsea el TXT por bloques en un pool de procesos con el mismo resultado que parsear_txt.
+
+    El cuerpo se corta en líneas "----" y cada bloque arranca con el tipo de
+    operación vigente en ese punto. Los movimientos que continúan de un
+    bloque al siguiente se vuelven a unir al juntar los acumuladores, y los
+    bloques posteriores al fin del cuerpo se descartan.
+    """
+    with abrir_binario(file_path) as f:
+        contenido = f.read()
+
+    inicio = 0
+    for _ in range(LINEAS_ENCABEZADO):
+        fin = contenido.find(b"\n", inicio)
+        inicio = len(contenido) if fin < 0 else fin + 1
+    encabezado = list(leer_archivo(BytesIO(contenido[:inicio])))
+    cuerpo = contenido[inicio:]
+
+    # limpiar_lineas se detiene en la línea de "TOTALES POR TASA"
+    fin = cuerpo.find(FIN_CUERPO)
+    if fin >= 0:
+        cuerpo = cuerpo[: cuerpo.rfind(b"\n", 0, fin) + 1]
+
+    compras_o_ventas = ""
+    for line in encabezado:
+        compras_o_ventas = detectar_operacion(line, compras_o_ventas)
+
+    inicios = dividir_cuerpo(cuerpo, procesos * BLOQUES_POR_PROCESO)
+    finales = inicios[1:] + [len(cuerpo)]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [
+            pool.submit(
+                procesar_bloque,
+                cuerpo[desde:hasta],
+                operacion_al_inicio(cuerpo, desde, compras_o_ventas),
+            )
+            for desde, hasta in zip(inicios, finales)
+        ]
+
+        acumulador = AcumuladorMovimientos()
+        for futuro in futuros:
+            bloque, terminado = futuro.result()
+            acumulador.extender(bloque)
+            if terminado:
+                for pendiente in futuros:
+                    pendiente.cancel()
+                break
+
+    return encabezado, acumulador
+
+
+def parsear_en_paralelo(file_path, procesos):
+    """Decide si conviene parsear en paralelo y con cuántos procesos (0 = en serie).
+
+    procesos=None usa todos los CPU solo si el TXT supera
+    UMBRAL_PARSEO_PARALELO; un número mayor que 1 fuerza el parseo paralelo.
+    """
+    if procesos is None:
+        if tamano_origen(file_path) < UMBRAL_PARSEO_PARALELO:
+            return 0
+        procesos = os.cpu_count() or 1
+    return procesos if procesos > 1 else 0
+
+
+# ============================================================================
+# LECTURA MAPEADA DEL TXT
+# ============================================================================
+
+
+# Modos de lectura del TXT: por líneas decodificadas o sobre los bytes mapeados
+LECTURA_LINEAS = "lineas"
+LECTURA_MAPEADA = "mapeada"
+
+# Largo máximo de la secuencia de escape del comienzo de línea (ESC [ 0 m)
+LARGO_MAXIMO_ESCAPE = 8
+
+# Columna desde la que empieza la región de tasas e importes
+COLUMNA_IMPORTES = 70
+
+PATRON_OPERACION = re.compile(rb"IVA (VENTAS|COMPRAS)")
+PATRON_PPAG_BYTES = re.compile(rb"PPag\.")
+PATRON_FIN_CUERPO = re.compile(re.escape(FIN_CUERPO))
+
+# Bytes que PATRON_CONTROL quitaría (sin el salto de línea) y bytes no ASCII
+BYTES_CONTROL = np.zeros(256, dtype=bool)
+BYTES_CONTROL[list(range(0x20)) + [0x7F]] = True
+BYTES_CONTROL[ord("\n")] = False
+BYTES_ESPECIALES = BYTES_CONTROL.copy()
+BYTES_ESPECIALES[0x80:] = True
+
+OPERACIONES = ("", "Ventas", "Compras")
+
+
+@contextmanager
+def mapear_origen(origen):
+    """Expone el contenido como buffer: un mmap de una ruta o el de un archivo en memoria.
+
+    El buffer solo es válido dentro del bloque with.
+    """
+    if hasattr(origen, "getbuffer"):
+        buffer = origen.getbuffer()[origen.tell() :]
+        try:
+            yield buffer
+        finally:
+            try:
+                buffer.release()
+            except BufferError:
+                pass
+    elif hasattr(origen, "read"):
+        yield origen.read()
+    else:
+        with open(origen, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapa
+            finally:
+                # Si un error dejó vistas de NumPy vivas, el mapa se libera después
+                try:
+                    mapa.close()
+                except BufferError:
+                    pass
+
+
+def decodificar_linea(linea):
+    """Decodifica una línea como UTF-8 o, si falla, Latin-1 (igual que leer_archivo)"""
+    try:
+        return linea.decode("utf-8")
+    except UnicodeDecodeError:
+        return linea.decode("latin-1")
+
+
+def lineas_de(posiciones, inicios):
+    """Devuelve el número de línea de cada posición del buffer"""
+    return np.searchsorted(inicios, posiciones, side="right") - 1
+
+
+def empieza_con(buf, inicios, largos, prefijo):
+    """Marca las líneas que empiezan con los bytes de prefijo"""
+    marcadas = largos >= len(prefijo)
+    for k, byte in enumerate(prefijo):
+        marcadas &= buf[np.minimum(inicios + k, len(buf) - 1)] == byte
+    return marcadas
+
+
+def largo_escape(buf, inicios, largos):
+    """Largo de la secuencia ESC [ dígitos m del comienzo de cada línea (0 si no hay)"""
+    fin = len(buf) - 1
+    largo = np.zeros(len(inicios), dtype=np.int64)
+    abierta = empieza_con(buf, inicios, largos, b"\x1b[")
+    for k in range(2, LARGO_MAXIMO_ESCAPE):
+        byte = buf[np.minimum(inicios + k, fin)]
+        abierta &= k < largos
+        largo[abierta & (byte == ord("m"))] = k + 1
+        abierta &= ((byte >= ord("0")) & (byte <= ord("9"))) | (byte == ord(";"))
+    return largo
+
+
+def operacion_por_linea(datos, inicios, desde, hasta, compras_o_ventas):
+    """Código en OPERACIONES del tipo de operación vigente en cada línea.
+
+    Es el que deja detectar_operacion después de ver la línea: el de la
+    última línea anterior (o la misma) con "IVA VENTAS" o "IVA COMPRAS".
+    """
+    marcas = {}
+    for encontrado in PATRON_OPERACION.finditer(datos, desde, hasta):
+        linea = int(lineas_de(encontrado.start(), inicios))
+        # En una línea con las dos marcas gana "IVA VENTAS"
+        ventas = encontrado.group(1) == b"VENTAS"
+        marcas[linea] = marcas.get(linea, False) or ventas
+
+    codigos = np.full(len(inicios), OPERACIONES.index(compras_o_ventas), dtype=np.int8)
+    if marcas:
+        lineas = np.fromiter(marcas, dtype=np.int64, count=len(marcas))
+        valores = np.where(list(marcas.values()), 1, 2).astype(np.int8)
+        ultima = np.searchsorted(lineas, np.arange(len(inicios)), side="right") - 1
+        codigos = np.where(ultima >= 0, valores[np.maximum(ultima, 0)], codigos)
+    return codigos
+
+
+class AcumuladorMapeado(AcumuladorMovimientos):
+    """Acumulador que guarda dónde empieza cada movimiento en lugar de sus campos.
+
+    Los campos de ancho fijo se extraen al final para todos los movimientos
+    juntos (ver extraer_campos). Los movimientos cuya línea se procesó como
+    texto guardan la línea limpia.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.inicios = array("q")
+        self.finales = array("q")
+        self.lineas = {}
+
+    def nueva_fila(self, cleaned_line):
+        """Abre un movimiento desde una línea ya decodificada y limpia"""
+        self.lineas[self.filas] = cleaned_line
+        self.nueva_fila_mapeada(0, 0)
+
+    def nueva_fila_mapeada(self, inicio, fin):
+        """Abre un movimiento cuya línea limpia ocupa buf[inicio:fin]"""
+        self.inicios.append(inicio)
+        self.finales.append(fin)
+        self.filas += 1
+
+    def extraer_campos(self, buf):
+        """Arma las columnas de encabezado con NumPy a partir de los bytes de cada línea.
+
+        Cada byte pasa a un carácter Latin-1 (las líneas mapeadas son ASCII o
+        Latin-1) y lo que queda fuera de la línea se rellena con NUL, que el
+        tipo de texto de NumPy descarta al final.
+        """
+        inicios = np.frombuffer(self.inicios, dtype=np.int64)
+        largos = np.frombuffer(self.finales, dtype=np.int64) - inicios
+
+        for campo, desde, hasta in CAMPOS_ENCABEZADO:
+            codigos = np.zeros((self.filas, hasta - desde), dtype=np.uint32)
+            for k, columna in enumerate(range(desde, hasta)):
+                dentro = columna < largos
+                codigos[dentro, k] = buf[inicios[dentro] + columna]
+            valores = codigos.view(f"U{hasta - desde}").ravel()
+            for fila, linea in self.lineas.items():
+                valores[fila] = linea[desde:hasta]
+            self.encabezados[campo] = valores
+
+
+def parsear_txt_mapeado(file_path):
+    """Parsea el TXT sobre sus bytes mapeados con el mismo resultado que parsear_txt.
+
+    Las líneas se ubican y clasifican con NumPy sin decodificarlas; de cada
+    movimiento solo se decodifica la región de importes y los campos de
+    ancho fijo se extraen todos juntos al final. Las líneas que no se pueden
+    tratar por posición de bytes (caracteres de control en el medio, pies
+    "PPag.", UTF-8 multibyte) siguen el camino de texto de limpiar_lineas.
+    """
+    with mapear_origen(file_path) as datos:
+        buf = np.frombuffer(datos, dtype=np.uint8)
+
+        saltos = np.flatnonzero(buf == ord("\n"))
+        inicios = np.concatenate(([0], saltos + 1))
+        finales = np.concatenate((saltos, [len(buf)]))
+        if inicios[-1] == len(buf):
+            inicios, finales = inicios[:-1], finales[:-1]
+
+        fin_encabezado = (
+            int(inicios[LINEAS_ENCABEZADO])
+            if len(inicios) > LINEAS_ENCABEZADO
+            else len(buf)
+        )
+        encabezado = list(leer_archivo(BytesIO(bytes(datos[:fin_encabezado]))))
+        compras_o_ventas = ""
+        for line in encabezado:
+            compras_o_ventas = detectar_operacion(line, compras_o_ventas)
+
+        # limpiar_lineas se detiene en la línea de "TOTALES POR TASA"
+        inicios = inicios[LINEAS_ENCABEZADO:]
+        finales = finales[LINEAS_ENCABEZADO:]
+        fin = PATRON_FIN_CUERPO.search(datos, fin_encabezado)
+        if fin is not None:
+            ultima = int(lineas_de(fin.start(), inicios))
+            inicios, finales = inicios[:ultima], finales[:ultima]
+        acumulador = AcumuladorMapeado()
+        if not len(inicios):
+            acumulador.extraer_campos(buf)
+            return encabezado, acumulador
+        fin_cuerpo = int(min(finales[-1] + 1, len(buf)))
+        largos = finales - inicios
+
+        # Líneas "----" abren un bloque a eliminar y líneas "--" lo cierran
+        abre = empieza_con(buf, inicios, largos, b"----")
+        marca = abre | empieza_con(buf, inicios, largos, b"--")
+        ultima_marca = np.maximum.accumulate(
+            np.where(marca, np.arange(len(inicios)), -1)
+        )
+        eliminada = marca | ((ultima_marca >= 0) & abre[np.maximum(ultima_marca, 0)])
+
+        operaciones = operacion_por_linea(
+            datos, inicios, fin_encabezado, fin_cuerpo, compras_o_ventas
+        )
+
+        # Línea limpia: sin la secuencia de escape inicial ni el \r final
+        escape = largo_escape(buf, inicios, largos)
+        retorno = (largos > 0) & (buf[np.maximum(finales - 1, 0)] == ord("\r"))
+        limpio_desde = inicios + escape
+        limpio_hasta = finales - retorno
+
+        # Líneas que siguen el camino de texto
+        especial = buf[inicios] == 0x1B
+        especial &= escape == 0
+        posiciones = np.flatnonzero(BYTES_ESPECIALES[buf[fin_encabezado:fin_cuerpo]])
+        posiciones += fin_encabezado
+        lineas = lineas_de(posiciones, inicios)
+        bytes_posicion = buf[posiciones]
+        permitido = (posiciones < limpio_desde[lineas]) | (
+            (posiciones == limpio_hasta[lineas]) & retorno[lineas]
+        )
+        no_ascii = bytes_posicion >= 0x80
+        especial[lineas[~permitido & ~no_ascii]] = True
+        for linea in np.unique(lineas[no_ascii]).tolist():
+            crudo = bytes(datos[inicios[linea] : finales[linea] + 1])
+            try:
+                crudo.decode("utf-8")
+                especial[linea] = True
+            except UnicodeDecodeError:
+                # Latin-1: un byte por carácter, salvo espacios que str.strip quita
+                especial[linea] |= b"\x85" in crudo or b"\xa0" in crudo
+        for encontrado in PATRON_PPAG_BYTES.finditer(datos, fin_encabezado, fin_cuerpo):
+            especial[lineas_de(encontrado.start(), inicios)] = True
+
+        # Con 35 o más caracteres que no son espacio la línea no es corta. La
+        # suma en uint8 evita una copia de 8 bytes por byte: si desborda, la
+        # línea solo pasa a revisarse una por una
+        no_espacios = np.add.reduceat(
+            (buf[fin_encabezado:fin_cuerpo] != ord(" ")).view(np.uint8),
+            inicios - fin_encabezado,
+            dtype=np.uint8,
+        ).astype(np.int64)
+        no_espacios -= escape + retorno + (finales < len(buf))
+        dudosa = no_espacios < 35
+
+        candidatas = np.flatnonzero(~eliminada)
+        for linea, es_especial, es_dudosa, desde, hasta, operacion in zip(
+            candidatas.tolist(),
+            especial[candidatas].tolist(),
+            dudosa[candidatas].tolist(),
+            limpio_desde[candidatas].tolist(),
+            limpio_hasta[candidatas].tolist(),
+            operaciones[candidatas].tolist(),
+        ):
+            compras_o_ventas = OPERACIONES[operacion]
+
+            if es_especial:
+                line = decodificar_linea(
+                    bytes(datos[inicios[linea] : finales[linea] + 1])
+                )
+                line = limpiar_pie(PATRON_CONTROL.sub("", line))
+                if line is None:
+                    break
+                if line:
+                    if line[0:2] == "  ":
+                        procesar_linea_continuacion(line, acumulador, compras_o_ventas)
+                    else:
+                        procesar_nueva_entrada(line, acumulador, compras_o_ventas)
+                continue
+
+            if es_dudosa and len(bytes(datos[desde:hasta]).strip()) < 35:
+                break
+
+            # Misma lógica que procesar_nueva_entrada y procesar_linea_continuacion
+            partes = PATRON_SEPARADOR.split(
+                str(datos[desde + COLUMNA_IMPORTES : hasta], "latin-1")
+            )
+            if len(partes) < 2:
+                continue
+            if datos[desde : desde + 2] != b"  ":
+                acumulador.nueva_fila_mapeada(desde, hasta)
+                if len(partes) == 3:
+                    partes = [partes[0]] + partes[1].split() + partes[2:]
+            acumulador.sumar(partes[0], partes[1:], compras_o_ventas)
+
+        acumulador.extraer_campos(buf)
+        return encabezado, acumulador
+
+
+# ============================================================================
+# FUNCIONES DE PROCESAMIENTO DE DATAFRAMES
+# ============================================================================
+
+
+LibroMendez = namedtuple(
+    "LibroMendez", ["movimientos", "importes", "control"], defaults=(None,)
+)
+LibroMendez.__doc__ = """Movimientos del libro de Mendez.
+
+movimientos tiene una fila por comprobante (el índice es el número de
+movimiento) e importes una fila por movimiento y tasa, en centavos. control
+es la comparación contra los TOTALES POR TASA del TXT (ver
+controlar_totales_por_tasa), si ya se hizo.
+"""
+
+# Tipos de los campos de cada movimiento
+TIPOS_MOVIMIENTOS = {
+    "Fecha": "str",
+    "Comprobante": "category",
+    "PV": "uint32",
+    "Nro": "uint32",
+    "Letra": "category",
+    "Razon Social": "str",
+    "Condicion": "category",
+    "CUIT": "str",
+    "Concepto": "uint16",
+    "Jurisdiccion": "category",
+}
+
+# Tipos de la tabla larga de importes
+TIPOS_IMPORTES = {
+    "movimiento": "int32",
+    "tasa": "category",
+    "neto": "int64",
+    "iva": "int64",
+    "con_iva": "bool",
+}
+
+
+def crear_dataframe_movimientos(acumulador):
+    """Crea el LibroMendez a partir de las columnas acumuladas"""
+    # Las columnas de texto se crean como str también sin movimientos, para
+    # que las categorías sean de texto en todos los parsers
+    movimientos = pd.DataFrame(
+        {
+            campo: pd.Series(valores, dtype=str)
+            for campo, valores in acumulador.encabezados.items()
+        }
+    )
+
+    # Convertir tipos de datos (falla si PV, Nro o Concepto no son numéricos)
+    for campo in ("PV", "Nro", "Concepto"):
+        movimientos[campo] = pd.to_numeric(movimientos[campo])
+    movimientos = movimientos.astype(TIPOS_MOVIMIENTOS)
+
+    importes = pd.DataFrame(
+        {
+            "movimiento": np.frombuffer(acumulador.movimiento, dtype=np.int64),
+            "tasa": pd.Series(acumulador.tasa, dtype=str),
+            "neto": np.frombuffer(acumulador.neto, dtype=np.int64),
+            "iva": np.frombuffer(acumulador.iva, dtype=np.int64),
+            "con_iva": np.frombuffer(acumulador.con_iva, dtype=np.int8),
+        }
+    ).astype(TIPOS_IMPORTES)
+
+    # Convertir notas de crédito a negativas
+    nc = (movimientos["Comprobante"] == "NC").to_numpy()
+    signo = np.where(nc[importes["movimiento"].to_numpy()], -1, 1)
+    importes["neto"] *= signo
+    importes["iva"] *= signo
+
+    return LibroMendez(movimientos, importes)
+
+
+def agrupar_importes(importes):
+    """Suma las líneas de una misma tasa dentro de cada movimiento"""
+    return (
+        importes.groupby(["movimiento", "tasa", "con_iva"], sort=False, observed=True)[
+            ["neto", "iva"]
+        ]
+        .sum()
+        .reset_index()
+        .astype(TIPOS_IMPORTES)
+    )
+
+
+def combinar_movimientos_duplicados(libro):
+    """Combina movimientos consecutivos que tienen la misma clave principal.
+
+    Es la versión vectorizada de recorrer las filas sumando los importes de
+    cada fila repetida a la anterior: los ids de cada racha de la clave salen
+    de comparar cada fila con la anterior, los campos se toman de la primera
+    fila de la racha y los importes se suman con el groupby(sort=False) de
+    agrupar_importes sobre la tabla larga, en centavos enteros (sin el
+    redondeo de sumar floats que tenía el recorrido fila por fila).
+    """
+    movimientos, importes, control = libro
+    if movimientos.empty:
+        return LibroMendez(movimientos.copy(), agrupar_importes(importes), control)
+
+    # Cada cambio de clave respecto de la fila anterior abre un grupo nuevo
+    clave = movimientos[["Nro", "PV", "Razon Social"]]
+    inicio = (clave != clave.shift()).any(axis=1).to_numpy()
+    grupo = np.cumsum(inicio) - 1
+
+    # El resto de los campos se toma de la primera fila de cada grupo y los
+    # importes pasan al movimiento combinado
+    movimientos = movimientos[inicio].reset_index(drop=True)
+    importes = importes.assign(
+        movimiento=grupo[importes["movimiento"].to_numpy()].astype(np.int32)
+    )
+
+    return LibroMendez(movimientos, agrupar_importes(importes), control)
+
+
+def calcular_total_movimientos(libro):
+    """Agrega a los movimientos la columna Total (neto más IVA de todas las tasas)"""
+    importes = libro.importes
+    total = np.zeros(len(libro.movimientos), dtype=np.int64)
+    np.add.at(
+        total,
+        importes["movimiento"].to_numpy(),
+        importes["neto"].to_numpy() + importes["iva"].to_numpy(),
+    )
+    libro.movimientos["Total"] = total
+
+
+def columnas_tasas(importes):
+    """Devuelve los nombres de las columnas de tasas en orden de aparición"""
+    pares = importes[["tasa", "con_iva"]].drop_duplicates()
+    return [
+        nombre
+        for tasa, con_iva in pares.itertuples(index=False, name=None)
+        for nombre in nombres_columnas_tasa(tasa, con_iva)
+    ]
+
+
+def formato_ancho(df, importes):
+    """Arma la tabla ancha de exportación con una columna de importe por tasa.
+
+    df son movimientos (o un subconjunto, con su índice original) e importes
+    la tabla larga del libro completo. Las columnas de tasas se ubican después
+    de Jurisdiccion, en el orden en que aparecen en el libro.
+    """
+    # Un libro sin movimientos (un mes vacío) no tiene columnas de tasas
+    if importes.empty:
+        return df.copy()
+
+    columnas = columnas_tasas(importes)
+    posicion_columna = {nombre: i for i, nombre in enumerate(columnas)}
+    matriz = np.zeros((len(df), len(columnas)), dtype=np.int64)
+
+    filas = df.index.get_indexer(importes["movimiento"])
+    presentes = filas >= 0
+    filas = filas[presentes]
+    seleccion = importes[presentes]
+    tasas = seleccion["tasa"].astype(str).to_numpy()
+    con_iva = seleccion["con_iva"].to_numpy()
+
+    netos = pd.Series(tasas).where(~con_iva, pd.Series(tasas) + " Neto")
+    np.add.at(
+        matriz,
+        (filas, netos.map(posicion_columna).to_numpy(dtype=np.int64)),
+        seleccion["neto"].to_numpy(),
+    )
+    ivas = pd.Series(tasas[con_iva]) + " IVA"
+    np.add.at(
+        matriz,
+        (filas[con_iva], ivas.map(posicion_columna).to_numpy(dtype=np.int64)),
+        seleccion["iva"].to_numpy()[con_iva],
+    )
+
+    hasta = df.columns.get_loc("Jurisdiccion") + 1
+    return pd.concat(
+        [
+            df.iloc[:, :hasta],
+            pd.DataFrame(matriz, columns=columnas, index=df.index),
+            df.iloc[:, hasta:],
+        ],
+        axis=1,
+    )
+
+
+def agregar_totales_movimientos(df_final):
+    """Agrega fila de totales a la tabla ancha de movimientos"""
+    fila_total = pd.DataFrame(df_final[columnas_importe(df_final)].sum()).T
+    fila_total.insert(0, "Nro", "TOTALES")
+    fila_total.insert(1, "Razon Social", "")
+
+    return pd.concat([df_final, fila_total], ignore_index=True)
+
+
+def columnas_importe(df):
+    """Devuelve las columnas de importes en centavos de un DataFrame de movimientos"""
+    if "Jurisdiccion" not in df.columns:
+        return []
+    desde = df.columns.get_loc("Jurisdiccion") + 1
+    return [
+        col for col in df.columns[desde:] if pd.api.types.is_integer_dtype(df[col])
+    ]
+
+
+def importes_en_pesos(df):
+    """Devuelve el DataFrame con los importes en centavos pasados a pesos"""
+    columnas = columnas_importe(df)
+    if not columnas:
+        return df
+    return df.assign(**{col: df[col] / 100 for col in columnas})
+
+
+# ============================================================================
+# CONTROL CONTRA LOS TOTALES POR TASA
+# ============================================================================
+
+
+HOJA_CONTROL_TOTALES = "CONTROL TOTALES POR TASA"
+
+# Estado de cada tasa al comparar los movimientos con el pie del TXT
+ESTADO_TOTALES_OK = "OK"
+ESTADO_TOTALES_DIFIERE = "DIFIERE"
+ESTADO_SIN_TOTALES = "SIN TOTALES"
+
+# Importes que se controlan, en el orden de las columnas del pie
+IMPORTES_CONTROLADOS = ("Neto", "IVA", "Total")
+
+PATRON_MONTO = re.compile(r"-?\d+(?:,\d+)?")
+
+
+def filas_totales(lineas):
+    """Genera (tasa, importes) de cada línea del pie, hasta la primera que no es una.
+
+    Las líneas vacías, los pies "PPag.: N" y los títulos anteriores a la
+    primera tasa se saltean.
+    """
+    empezado = False
+    for line in lineas:
+        line = PATRON_PPAG.sub("", PATRON_CONTROL.sub("", line)).strip()
+        if not line:
+            continue
+        partes = PATRON_SEPARADOR.split(line, maxsplit=1)
+        montos = partes[1].split() if len(partes) == 2 else []
+        if montos and all(PATRON_MONTO.fullmatch(monto) for monto in montos):
+            empezado = True
+            yield partes[0], montos
+        elif empezado:
+            return
+
+
+def leer_totales_por_tasa(file_path):
+    """Lee el pie "TOTALES POR TASA" del TXT como tabla de tasa, neto, IVA y total.
+
+    Los importes quedan en centavos y con las NC ya restadas, igual que en el
+    libro; una línea con dos importes es neto y total, sin IVA. Devuelve None
+    si el TXT no tiene el pie. Un archivo abierto queda en la posición en que
+    estaba.
+    """
+    posicion = file_path.tell() if hasattr(file_path, "seek") else None
+    try:
+        with mapear_origen(file_path) as datos:
+            fin = PATRON_FIN_CUERPO.search(datos)
+            if fin is None:
+                return None
+            pie = bytes(datos[fin.end() :])
+    finally:
+        if posicion is not None:
+            file_path.seek(posicion)
+
+    # La primera parte es el resto de la línea de "TOTALES POR TASA"
+    lineas = (decodificar_linea(linea) for linea in pie.split(b"\n")[1:])
+    tasas = []
+    centavos = array("q")
+    for tasa, montos in filas_totales(lineas):
+        importes = [convertir_monto(monto) for monto in montos]
+        iva = importes[1] if len(importes) > 2 else 0
+        tasas.append(tasa)
+        centavos.extend((importes[0], iva, importes[-1]))
+
+    matriz = np.frombuffer(centavos, dtype=np.int64).reshape(-1, 3)
+    return pd.DataFrame(
+        {
+            "tasa": tasas,
+            "neto": matriz[:, 0],
+            "iva": matriz[:, 1],
+            "total": matriz[:, 2],
+        }
+    )
+
+
+def controlar_totales_por_tasa(totales, importes):
+    """Compara los importes de los movimientos con los TOTALES POR TASA, vectorizado.
+
+    Suma neto e IVA de la tabla larga de importes por tasa y compara en
+    centavos neto, IVA y total (neto más IVA) con los del pie; una tasa que
+    falta de un lado suma 0. Devuelve una fila por tasa con el estado, en qué
+    difiere y los importes de cada lado en pesos. Sin pie (totales None)
+    todas las tasas quedan en ESTADO_SIN_TOTALES.
+    """
+    parseados = (
+        importes.assign(tasa=importes["tasa"].astype(str))
+        .groupby("tasa", sort=False)[["neto", "iva"]]
+        .sum()
+    )
+    parseados["total"] = parseados["neto"] + parseados["iva"]
+    if totales is None:
+        del_pie = parseados.iloc[:0]
+    else:
+        del_pie = totales.groupby("tasa", sort=False)[["neto", "iva", "total"]].sum()
+
+    # Las tasas en el orden del pie y después las que solo tienen movimientos
+    tasas = del_pie.index.union(parseados.index, sort=False)
+    del_pie = del_pie.reindex(tasas, fill_value=0).to_numpy(dtype=np.int64)
+    parseados = parseados.reindex(tasas, fill_value=0).to_numpy(dtype=np.int64)
+
+    difiere = del_pie != parseados
+    if totales is None:
+        estado = np.full(len(tasas), ESTADO_SIN_TOTALES, dtype=object)
+        difiere[:] = False
+    else:
+        estado = np.where(
+            difiere.any(axis=1), ESTADO_TOTALES_DIFIERE, ESTADO_TOTALES_OK
+        ).astype(object)
+    observaciones = [
+        np.where(difiere[:, k], nombre, "")
+        for k, nombre in enumerate(IMPORTES_CONTROLADOS)
+    ]
+
+    columnas = {}
+    for k, nombre in enumerate(IMPORTES_CONTROLADOS):
+        columnas[f"{nombre} Totales"] = del_pie[:, k] / 100
+        columnas[f"{nombre} Movimientos"] = parseados[:, k] / 100
+        columnas[f"Diferencia {nombre}"] = (parseados[:, k] - del_pie[:, k]) / 100
+
+    return pd.DataFrame(
+        {
+            "Tasa": np.asarray(tasas, dtype=object),
+            "Estado": estado,
+            "Difiere en": [
+                ", ".join(filter(None, partes)) for partes in zip(*observaciones)
+            ],
+            **columnas,
+        }
+    )
+
+
+def tasas_con_diferencias(control):
+    """Tasas que no coinciden con el pie, con el período si se unieron varios libros"""
+    difiere = control[control["Estado"] == ESTADO_TOTALES_DIFIERE]
+    tasas = difiere["Tasa"].astype(str)
+    if COLUMNA_PERIODO in difiere.columns:
+        tasas = tasas + " (" + difiere[COLUMNA_PERIODO].astype(str) + ")"
+    return tasas.tolist()
+
+
+def estado_control_totales(control):
+    """Estado del control completo: el de la peor tasa (DIFIERE, SIN TOTALES u OK)"""
+    if control is None:
+        return ESTADO_SIN_TOTALES
+    if (control["Estado"] == ESTADO_TOTALES_DIFIERE).any():
+        return ESTADO_TOTALES_DIFIERE
+    if control.empty or (control["Estado"] == ESTADO_SIN_TOTALES).any():
+        return ESTADO_SIN_TOTALES
+    return ESTADO_TOTALES_OK
+
+
+def verificar_totales_por_tasa(control):
+    """Lanza ErrorProcesamiento si alguna tasa no coincide con los TOTALES POR TASA"""
+    tasas = tasas_con_diferencias(control)
+    if tasas:
+        raise ErrorProcesamiento(
+            "Los importes de los movimientos no coinciden con los TOTALES POR "
+            f"TASA del TXT en: {', '.join(tasas)}"
+        )
+
+
+# ============================================================================
+# FUNCIONES DE EXCEL
+# ============================================================================
+
+
+NOMBRE_EXCEL_CONSOLIDADO = "Cruce_Consolidado.xlsx"
+NOMBRE_EXCEL_MOVIMIENTOS = "Movimientos.xlsx"
+
+# Formatos del consolidado: nombre de archivo, tipo MIME y etapa que se mide
+FORMATO_XLSX = "xlsx"
+FORMATO_CSV = "csv"
+FORMATO_PARQUET = "parquet"
+FORMATOS_CONSOLIDADO = {
+    FORMATO_XLSX: (
+        NOMBRE_EXCEL_CONSOLIDADO,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "excel",
+    ),
+    FORMATO_CSV: ("Cruce_Consolidado_csv.zip", "application/zip", "csv"),
+    FORMATO_PARQUET: ("Cruce_Consolidado_parquet.zip", "application/zip", "parquet"),
+}
+
+# Filas de datos por hoja de Excel (el límite es 1.048.576 contando los títulos)
+MAX_FILAS_HOJA = 1048576 - 1
+
+# Largo máximo del nombre de una hoja de Excel
+LARGO_NOMBRE_HOJA = 31
+
+# Hoja con las coincidencias probables de los faltantes (ver sugerencias)
+HOJA_SUGERENCIAS = "SUGERENCIAS"
+
+# Primera columna con importes de las hojas que no los tienen desde la
+# columna 11 del Excel (ver libro_excel.COLUMNA_MONEDA)
+PRIMERA_COLUMNA_MONEDA = {
+    HOJA_SUGERENCIAS: "Total Mendez",
+    # Con varios libros la hoja lleva además la columna Periodo adelante
+    HOJA_CONTROL_TOTALES: f"{IMPORTES_CONTROLADOS[0]} Totales",
+}
+
+# Filas por grupo al escribir Parquet y por bloque al escribir CSV
+FILAS_POR_GRUPO_PARQUET = 100000
+
+# Filas que se escriben de una vez en cada bloque del CSV
+FILAS_POR_BLOQUE = 10000
+
+
+def hojas_consolidado(
+    df_mendez,
+    df_arca,
+    df_arca_no_en_mendez,
+    df_mendez_no_en_arca,
+    importes_mendez,
+    hojas_adicionales=None,
+    diferencias=None,
+):
+    """Arma las hojas del consolidado, con los importes ya pasados a pesos.
+
+    Las hojas de Mendez se pasan a formato ancho (una columna por tasa) con
+    la tabla larga importes_mendez del libro. Si se pasan las diferencias
+    del cruce van en la hoja HOJA_DIFERENCIAS, y hojas_adicionales es un
+    dict opcional nombre -> DataFrame que se agrega al final.
+    """
+    hojas = {
+        # Hoja 1: Mendez (movimientos del TXT)
+        "Mendez": formato_ancho(df_mendez, importes_mendez),
+        # Hoja 2: ARCA (movimientos del ZIP)
+        "ARCA": df_arca,
+        # Hoja 3: ARCA NO EN MENDEZ (comprobantes en ARCA y no en Mendez)
+        "ARCA NO EN MENDEZ": df_arca_no_en_mendez,
+        # Hoja 4: MENDEZ NO EN ARCA (comprobantes en Mendez y no en ARCA)
+        "MENDEZ NO EN ARCA": formato_ancho(df_mendez_no_en_arca, importes_mendez),
+    }
+    if diferencias is not None:
+        # Hoja 5: comprobantes en ambos lados con otro tipo, CUIT o importe
+        hojas[HOJA_DIFERENCIAS] = diferencias
+    hojas.update(hojas_adicionales or {})
+    return {nombre: importes_en_pesos(df) for nombre, df in hojas.items()}
+
+
+def partir_hoja(nombre, df, max_filas=None):
+    """Genera (nombre, parte) con a lo sumo max_filas filas por hoja.
+
+    Las hojas de continuación se llaman "<nombre> (2)", "<nombre> (3)", etc.
+    """
+    max_filas = max_filas or MAX_FILAS_HOJA
+    for numero, inicio in enumerate(range(0, max(len(df), 1), max_filas), start=1):
+        sufijo = f" ({numero})" if numero > 1 else ""
+        yield (
+            nombre[: LARGO_NOMBRE_HOJA - len(sufijo)] + sufijo,
+            df.iloc[inicio : inicio + max_filas],
+        )
+
+
+def columna_moneda_hoja(nombre, df):
+    """Primera columna (base 1) con importes de la hoja, o None si es la de siempre"""
+    columna = PRIMERA_COLUMNA_MONEDA.get(nombre)
+    if columna is None or columna not in df.columns:
+        return None
+    return df.columns.get_loc(columna) + 1
+
+
+def escribir_xlsx(hojas, destino, al_avanzar=None):
+    """Escribe las hojas en un libro de Excel, partiendo las que no entran en una"""
+    # openpyxl se carga recién acá, al pedir un Excel
+    from libro_excel import escribir_libro
+
+    partes = []
+    columnas_moneda = {}
+    for sheet_name, df in hojas.items():
+        columna = columna_moneda_hoja(sheet_name, df)
+        for nombre, parte in partir_hoja(sheet_name, df):
+            partes.append((nombre, parte))
+            if columna is not None:
+                columnas_moneda[nombre] = columna
+
+    escribir_libro(partes, destino, al_avanzar, columnas_moneda)
+
+
+def escribir_csv_zip(hojas, destino, al_avanzar=None):
+    """Escribe un CSV por hoja dentro de un ZIP, por bloques y sin armarlo en memoria.
+
+    Los CSV usan ";" y coma decimal, como los que descarga ARCA.
+    """
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as z:
+        for nombre, df in hojas.items():
+            with z.open(f"{nombre}.csv", "w") as binario, TextIOWrapper(
+                binario, encoding="utf-8-sig", newline=""
+            ) as f:
+                for inicio in range(0, max(len(df), 1), FILAS_POR_BLOQUE):
+                    if al_avanzar is not None:
+                        al_avanzar(nombre)
+                    df.iloc[inicio : inicio + FILAS_POR_BLOQUE].to_csv(
+                        f, sep=";", decimal=",", index=False, header=inicio == 0
+                    )
+
+
+def escribir_parquet_zip(hojas, destino, al_avanzar=None):
+    """Escribe un Parquet por hoja dentro de un ZIP, por grupos de filas.
+
+    Requiere pyarrow. Los Parquet ya están comprimidos, así que se guardan
+    en el ZIP sin volver a comprimir.
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ErrorProcesamiento("Para exportar a Parquet hace falta instalar pyarrow.")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_STORED) as z:
+        for nombre, df in hojas.items():
+            esquema = pa.Schema.from_pandas(df, preserve_index=False)
+            with z.open(f"{nombre}.parquet", "w") as f, pq.ParquetWriter(
+                f, esquema
+            ) as escritor:
+                for inicio in range(0, len(df), FILAS_POR_GRUPO_PARQUET):
+                    if al_avanzar is not None:
+                        al_avanzar(nombre)
+                    escritor.write_table(
+                        pa.Table.from_pandas(
+                            df.iloc[inicio : inicio + FILAS_POR_GRUPO_PARQUET],
+                            schema=esquema,
+                            preserve_index=False,
+                        )
+                    )
+
+
+ESCRITORES_CONSOLIDADO = {
+    FORMATO_XLSX: escribir_xlsx,
+    FORMATO_CSV: escribir_csv_zip,
+    FORMATO_PARQUET: escribir_parquet_zip,
+}
+
+
+def formatos_disponibles():
+    """Formatos del consolidado que se pueden generar con lo instalado"""
+    return [
+        formato
+        for formato in FORMATOS_CONSOLIDADO
+        if formato != FORMATO_PARQUET or importlib.util.find_spec("pyarrow")
+    ]
+
+
+def crear_archivo_consolidado(
+    df_mendez,
+    df_arca,
+    df_arca_no_en_mendez,
+    df_mendez_no_en_arca,
+    importes_mendez,
+    hojas_adicionales=None,
+    formato=FORMATO_XLSX,
+    destino=None,
+    registro=None,
+    al_avanzar=None,
+    diferencias=None,
+):
+    """Crea el consolidado en el formato indicado (ver FORMATOS_CONSOLIDADO).
+
+    Si se pasa destino (un archivo binario abierto) el consolidado se
+    escribe ahí a medida que se genera; si no, se arma en memoria y se
+    devuelven sus bytes. al_avanzar(hoja), si se indica, se llama antes de
+    escribir cada bloque de filas; sirve para informar el avance o, lanzando
+    una excepción, para interrumpir la escritura.
+    """
+    if formato not in ESCRITORES_CONSOLIDADO:
+        raise ErrorProcesamiento(f"Formato de exportación desconocido: {formato}")
+
+    with medir_etapa(
+        registro,
+        FORMATOS_CONSOLIDADO[formato][2],
+        bytes_entrada=lambda: tamano_dataframes(
+            df_mendez,
+            df_arca,
+            df_arca_no_en_mendez,
+            df_mendez_no_en_arca,
+            importes_mendez,
+        ),
+    ) as medicion:
+        hojas = hojas_consolidado(
+            df_mendez,
+            df_arca,
+            df_arca_no_en_mendez,
+            df_mendez_no_en_arca,
+            importes_mendez,
+            hojas_adicionales,
+            diferencias,
+        )
+
+        salida = BytesIO() if destino is None else destino
+        ESCRITORES_CONSOLIDADO[formato](hojas, salida, al_avanzar)
+
+        medicion["filas"] = sum(len(df) for df in hojas.values())
+        if destino is None:
+            contenido = salida.getvalue()
+            medicion["bytes_salida"] = len(contenido)
+            return contenido
+
+
+def crear_archivo_excel_consolidado(
+    df_mendez,
+    df_arca,
+    df_arca_no_en_mendez,
+    df_mendez_no_en_arca,
+    importes_mendez,
+    hojas_adicionales=None,
+    registro=None,
+    diferencias=None,
+):
+    """Crea en memoria el Excel consolidado con 4 hojas y formato de moneda"""
+    return crear_archivo_consolidado(
+        df_mendez,
+        df_arca,
+        df_arca_no_en_mendez,
+        df_mendez_no_en_arca,
+        importes_mendez,
+        hojas_adicionales,
+        registro=registro,
+        diferencias=diferencias,
+    )
+
+
+def crear_archivo_excel(df_encabezado, libro):
+    """Crea en memoria el Excel solo con la hoja de movimientos del LibroMendez"""
+    from libro_excel import libro_movimientos
+
+    df_final = formato_ancho(libro.movimientos, libro.importes)
+    return libro_movimientos(df_encabezado, importes_en_pesos(df_final))
+
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+
+def procesar_archivo(
+    file_path,
+    registro=None,
+    procesos=None,
+    lectura=LECTURA_MAPEADA,
+    exigir_totales=False,
+):
+    """Función principal que procesa el archivo completo.
+
+    Devuelve el encabezado y un LibroMendez con los importes en centavos
+    (int64), que se pasan a formato ancho y a pesos recién al exportar, y el
+    control contra los TOTALES POR TASA del TXT. Si se pasa un
+    RegistroEtapas, se anota la medición de cada etapa. procesos indica
+    cuántos procesos usar para parsear (ver parsear_en_paralelo) y lectura,
+    si el parseo en serie es sobre los bytes mapeados o por líneas. Con
+    exigir_totales, una tasa que no coincide con el pie corta el
+    procesamiento con ErrorProcesamiento.
+    """
+    try:
+        # 1-2. Leer, limpiar y procesar movimientos en una sola pasada
+        with medir_etapa(
+            registro, "parseo_txt", bytes_entrada=lambda: tamano_origen(file_path)
+        ) as medicion:
+            totales = leer_totales_por_tasa(file_path)
+            procesos = parsear_en_paralelo(file_path, procesos)
+            if procesos:
+                encabezado, movements = parsear_txt_en_paralelo(file_path, procesos)
+            elif lectura == LECTURA_MAPEADA:
+                encabezado, movements = parsear_txt_mapeado(file_path)
+            else:
+                encabezado, movements = parsear_txt(file_path)
+            encabezado_completo = procesar_encabezado(encabezado)
+
+            # 3. Crear DataFrames
+            libro = crear_dataframe_movimientos(movements)
+            medicion["filas"] = len(libro.movimientos)
+
+        # Control de los importes parseados contra el pie del TXT
+        with medir_etapa(registro, "control_totales") as medicion:
+            control = controlar_totales_por_tasa(totales, libro.importes)
+            libro = libro._replace(control=control)
+            medicion["filas"] = len(control)
+        if exigir_totales:
+            verificar_totales_por_tasa(control)
+
+        with medir_etapa(registro, "combinar_movimientos") as medicion:
+            libro = combinar_movimientos_duplicados(libro)
+            medicion["filas"] = len(libro.movimientos)
+
+        # 4. Preparar DataFrame de encabezado
+        df_encabezado = pd.DataFrame(
+            list(encabezado_completo.values()),
+            index=list(encabezado_completo.keys()),
+            columns=["Valor"],
+        )
+        df_encabezado.columns = [""] * len(df_encabezado.columns)
+
+        # 5. Total de cada movimiento
+        with medir_etapa(registro, "totales") as medicion:
+            calcular_total_movimientos(libro)
+            medicion["filas"] = len(libro.movimientos)
+
+        return df_encabezado, libro
+
+    except ErrorProcesamiento:
+        raise
+    except Exception as e:
+        raise ErrorProcesamiento(f"Error al procesar el archivo: {e}") from e
+
+
+# ============================================================================
+# FUNCIONES DE CRUCE CON ARCA
+# ============================================================================
+
+
+ResultadoCruce = namedtuple(
+    "ResultadoCruce",
+    [
+        "mendez",
+        "arca",
+        "coincidentes",
+        "arca_no_en_mendez",
+        "mendez_no_en_arca",
+        "diferencias",
+    ],
+    defaults=(None,),
+)
+
+HOJA_DIFERENCIAS = "DIFERENCIAS DE IMPORTE"
+
+# Diferencia máxima, en pesos, entre los importes de Mendez y de ARCA de un
+# mismo comprobante para considerarlos iguales
+TOLERANCIA_IMPORTE = 1.0
+
+# Código de ARCA de cada tipo de comprobante de Mendez según su letra
+CODIGOS_TIPO_ARCA = {
+    ("FC", "A"): "1",
+    ("ND", "A"): "2",
+    ("NC", "A"): "3",
+    ("FC", "B"): "6",
+    ("ND", "B"): "7",
+    ("NC", "B"): "8",
+    ("FC", "C"): "11",
+    ("ND", "C"): "12",
+    ("NC", "C"): "13",
+    ("FC", "M"): "51",
+    ("ND", "M"): "52",
+    ("NC", "M"): "53",
+}
+
+# Importes que se comparan: nombre, columnas de ARCA que lo suman
+IMPORTES_COMPARADOS = (
+    ("Neto", ("Imp. Neto Gravado",)),
+    ("IVA", ("IVA",)),
+    ("Total", ("Imp. Total",)),
+)
+
+
+# Columnas del CSV de ARCA que se cargan, según su tipo
+COLUMNAS_ARCA_FECHA = ("Fecha de Emisión",)
+COLUMNAS_ARCA_ENTERAS = ("Punto de Venta", "Número de Comprobante", "Número Hasta")
+COLUMNAS_ARCA_CATEGORIAS = (
+    "Tipo de Comprobante",
+    "Tipo Doc. Emisor",
+    "Tipo Doc. Receptor",
+    "Tipo Doc. Emisor/Receptor",
+    "Moneda",
+)
+COLUMNAS_ARCA_TEXTO = (
+    "Cód. Autorización",
+    "Nro. Doc. Emisor",
+    "Nro. Doc. Receptor",
+    "Nro. Doc. Emisor/Receptor",
+    "Denominación Emisor",
+    "Denominación Receptor",
+    "Denominación Emisor/Receptor",
+)
+
+# Las columnas de importes se reconocen por el comienzo del nombre
+PREFIJOS_ARCA_IMPORTE = ("Tipo Cambio", "Imp.", "IVA", "Otros Tributos")
+
+# Nombres alternativos que usan algunas versiones del CSV
+ALIAS_COLUMNAS_ARCA = {"Número Desde": "Número de Comprobante"}
+
+# Columnas sin las que no se puede armar la clave PV-Nro del cruce
+COLUMNAS_ARCA_OBLIGATORIAS = ("Punto de Venta", "Número de Comprobante")
+
+# Filas por bloque al leer el CSV con el motor de C
+FILAS_POR_BLOQUE_CSV = 100000
+
+
+def tipo_columna_arca(columna):
+    """Devuelve el dtype con que se carga una columna de ARCA (None si se descarta)"""
+    columna = ALIAS_COLUMNAS_ARCA.get(columna, columna)
+    if columna in COLUMNAS_ARCA_ENTERAS:
+        return "Int64"
+    if (
+        columna in COLUMNAS_ARCA_CATEGORIAS
+        or columna in COLUMNAS_ARCA_TEXTO
+        or columna in COLUMNAS_ARCA_FECHA
+    ):
+        return str
+    if columna.startswith(PREFIJOS_ARCA_IMPORTE):
+        return "float64"
+    return None
+
+
+def convertir_fechas(serie):
+    """Convierte fechas AAAA-MM-DD o DD/MM/AAAA (NaT si no se reconocen)"""
+    fechas = pd.to_datetime(serie, format="%Y-%m-%d", errors="coerce")
+    faltan = fechas.isna() & serie.notna()
+    if faltan.any():
+        fechas[faltan] = pd.to_datetime(
+            serie[faltan], format="%d/%m/%Y", errors="coerce"
+        )
+    return fechas
+
+
+def leer_csv_arca(z, nombre, motor, filas_por_bloque):
+    """Lee un CSV del ZIP de ARCA cargando solo las columnas conocidas con su tipo"""
+    with z.open(nombre) as f:
+        encabezado = f.readline().decode("utf-8-sig").rstrip("\r\n")
+    columnas = [col.strip().strip('"') for col in encabezado.split(";")]
+
+    presentes = {ALIAS_COLUMNAS_ARCA.get(col, col) for col in columnas}
+    faltantes = [col for col in COLUMNAS_ARCA_OBLIGATORIAS if col not in presentes]
+    if faltantes:
+        raise ErrorProcesamiento(
+            f"Al CSV {nombre} del ZIP le faltan las columnas: {', '.join(faltantes)}"
+        )
+
+    tipos = {}
+    for col in columnas:
+        tipo = tipo_columna_arca(col)
+        if tipo is not None:
+            tipos[col] = tipo
+
+    opciones = {
+        "sep": ";",
+        "decimal": ",",
+        "encoding": "utf-8-sig",
+        "usecols": list(tipos),
+        "dtype": tipos,
+    }
+    with z.open(nombre) as f:
+        if motor == "pyarrow":
+            df = pd.read_csv(f, engine="pyarrow", **opciones)
+        else:
+            bloques = pd.read_csv(f, chunksize=filas_por_bloque, **opciones)
+            df = pd.concat(bloques, ignore_index=True)
+
+    return df.rename(columns=ALIAS_COLUMNAS_ARCA)
+
+
+def procesar_zip_csv(
+    zip_path, motor=None, filas_por_bloque=FILAS_POR_BLOQUE_CSV, registro=None
+):
+    """Lee y concatena todos los CSV de ARCA del ZIP (ruta o archivo en memoria).
+
+    Los importes se cargan como float (coma decimal), PV y números como enteros
+    y la fecha de emisión como fecha. motor puede ser "c" (lectura por bloques)
+    o "pyarrow"; por defecto se usa pyarrow si está instalado. Devuelve None si
+    el ZIP no tiene ningún CSV y levanta ErrorProcesamiento si a alguno le
+    faltan las columnas de PV o Nro.
+    """
+    if motor is None:
+        motor = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+    with medir_etapa(
+        registro, "lectura_zip", bytes_entrada=lambda: tamano_origen(zip_path)
+    ) as medicion:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            nombres = [
+                nombre for nombre in z.namelist() if nombre.lower().endswith(".csv")
+            ]
+            if not nombres:
+                return None
+            partes = [
+                leer_csv_arca(z, nombre, motor, filas_por_bloque) for nombre in nombres
+            ]
+
+        df_zip = pd.concat(partes, ignore_index=True)
+
+        # Las categorías se arman una sola vez, después de concatenar
+        for col in df_zip.columns:
+            if col in COLUMNAS_ARCA_CATEGORIAS:
+                df_zip[col] = df_zip[col].astype("category")
+            elif col in COLUMNAS_ARCA_FECHA:
+                df_zip[col] = convertir_fechas(df_zip[col])
+        medicion["filas"] = len(df_zip)
+
+    return df_zip
+
+
+def normalizar_numero(serie, largo):
+    """Normaliza PV o Nro a texto con ceros a la izquierda (vacío si falta)"""
+    numeros = pd.to_numeric(serie, errors="coerce")
+    enteros = np.isfinite(numeros.to_numpy(dtype=np.float64, na_value=np.nan))
+
+    texto = serie.astype(object).where(serie.notna(), "").astype(str)
+    texto[enteros] = numeros[enteros].astype(np.int64).astype(str)
+
+    return texto.str.zfill(largo)
+
+
+def agregar_clave(df, columna_pv, columna_nro):
+    """Devuelve una copia con PV y Nro normalizados y la clave PV-Nro"""
+    df = df.copy()
+    df[columna_pv] = normalizar_numero(df[columna_pv], 5)
+    df[columna_nro] = normalizar_numero(df[columna_nro], 8)
+    df["clave"] = df[columna_pv] + "-" + df[columna_nro]
+    return df
+
+
+def cruzar_comprobantes(
+    df_mendez,
+    df_arca,
+    registro=None,
+    importes_mendez=None,
+    tolerancia=TOLERANCIA_IMPORTE,
+):
+    """Cruza los comprobantes de Mendez y ARCA por PV-Nro sin modificar los originales.
+
+    Devuelve un ResultadoCruce con ambos DataFrames normalizados (con la
+    columna clave), los pares coincidentes y los faltantes de cada lado. Si
+    se pasa la tabla larga importes_mendez del libro, también las diferencias
+    de tipo, CUIT e importes de los comprobantes que están en ambos lados.
+    """
+    with medir_etapa(
+        registro, "cruce", bytes_entrada=lambda: tamano_dataframes(df_mendez, df_arca)
+    ) as medicion:
+        resultado = cruzar_por_clave(df_mendez, df_arca, importes_mendez, tolerancia)
+        medicion["filas"] = len(resultado.coincidentes)
+    return resultado
+
+
+def importes_por_movimiento(mendez, importes):
+    """Suma neto gravado e IVA de la tabla larga por fila de mendez (en centavos)"""
+    filas = mendez.index.get_indexer(importes["movimiento"])
+    presentes = (filas >= 0) & importes["con_iva"].to_numpy()
+    neto = np.zeros(len(mendez), dtype=np.int64)
+    iva = np.zeros(len(mendez), dtype=np.int64)
+    np.add.at(neto, filas[presentes], importes["neto"].to_numpy()[presentes])
+    np.add.at(iva, filas[presentes], importes["iva"].to_numpy()[presentes])
+    return {"Neto": neto, "IVA": iva, "Total": mendez["Total"].to_numpy()}
+
+
+def importes_arca_centavos(arca, filas):
+    """Neto gravado, IVA y total de las filas de ARCA, en centavos de pesos"""
+    cambio = np.ones(len(filas))
+    if "Tipo Cambio" in arca.columns:
+        cambio = arca["Tipo Cambio"].to_numpy()[filas]
+        cambio = np.where(np.isfinite(cambio) & (cambio > 0), cambio, 1.0)
+
+    importes = {}
+    for nombre, columnas in IMPORTES_COMPARADOS:
+        suma = np.zeros(len(filas))
+        for col in columnas:
+            if col in arca.columns:
+                suma += np.nan_to_num(arca[col].to_numpy(dtype=np.float64)[filas])
+        importes[nombre] = np.round(suma * cambio * 100).astype(np.int64)
+    return importes
+
+
+def solo_digitos(serie):
+    """Deja solo los dígitos de cada valor (vacío si falta)"""
+    return serie.astype("string").str.replace(r"\D", "", regex=True).fillna("")
+
+
+def diferencias_de_importe(mendez, arca, fila_mendez, fila_arca, importes, tolerancia):
+    """Compara los pares del cruce por tipo, CUIT e importes, vectorizado.
+
+    La clave compuesta es PV-Nro más tipo de comprobante y CUIT de la
+    contraparte: si una fila tiene varios pares con el mismo PV-Nro (por
+    ejemplo, de proveedores distintos) solo se comparan los que coinciden
+    en la clave completa, si los hay. Los importes se comparan en valor
+    absoluto (Mendez resta las NC y ARCA no) y difieren si la diferencia
+    supera tolerancia pesos. Devuelve un DataFrame con los pares que
+    difieren en algo, con los importes en pesos.
+    """
+    cuit_mendez = solo_digitos(mendez["CUIT"]).to_numpy()[fila_mendez]
+    columna_doc = next(
+        (
+            col
+            for col in COLUMNAS_ARCA_TEXTO
+            if col.startswith("Nro. Doc.") and col in arca.columns
+        ),
+        None,
+    )
+    if columna_doc is None:
+        cuit_arca = cuit_mendez
+    else:
+        cuit_arca = solo_digitos(arca[columna_doc]).to_numpy()[fila_arca]
+    distinto_cuit = (cuit_mendez != cuit_arca) & (cuit_mendez != "") & (cuit_arca != "")
+
+    tipo_letra = (
+        mendez["Comprobante"].astype(str).str.strip()
+        + mendez["Letra"].astype(str).str.strip()
+    )
+    tipo_mendez = tipo_letra.iloc[fila_mendez].map(
+        {tipo + letra: codigo for (tipo, letra), codigo in CODIGOS_TIPO_ARCA.items()}
+    )
+    tipo_arca = (
+        arca["Tipo de Comprobante"].astype(str).str.strip().to_numpy()[fila_arca]
+        if "Tipo de Comprobante" in arca.columns
+        else np.full(len(fila_arca), "")
+    )
+    distinto_tipo = tipo_mendez.notna().to_numpy() & (
+        tipo_mendez.to_numpy() != tipo_arca
+    )
+
+    # Si una fila tiene algún par con la clave compuesta completa, se
+    # descartan sus otros pares con el mismo PV-Nro
+    compuesta = ~distinto_cuit & ~distinto_tipo
+    con_compuesta_mendez = np.zeros(len(mendez), dtype=bool)
+    con_compuesta_mendez[fila_mendez[compuesta]] = True
+    con_compuesta_arca = np.zeros(len(arca), dtype=bool)
+    con_compuesta_arca[fila_arca[compuesta]] = True
+    validos = compuesta | ~(
+        con_compuesta_mendez[fila_mendez] | con_compuesta_arca[fila_arca]
+    )
+
+    importes_mendez = importes_por_movimiento(mendez, importes)
+    importes_arca = importes_arca_centavos(arca, fila_arca)
+    limite = round(tolerancia * 100)
+
+    columnas = {}
+    observaciones = [
+        np.where(distinto_tipo, "Tipo", ""),
+        np.where(distinto_cuit, "CUIT", ""),
+    ]
+    difiere = distinto_cuit | distinto_tipo
+    for nombre, _ in IMPORTES_COMPARADOS:
+        de_mendez = np.abs(importes_mendez[nombre][fila_mendez])
+        de_arca = np.abs(importes_arca[nombre])
+        diferencia = de_mendez - de_arca
+        fuera = np.abs(diferencia) > limite
+        difiere |= fuera
+        observaciones.append(np.where(fuera, nombre, ""))
+        columnas[f"{nombre} Mendez"] = de_mendez / 100
+        columnas[f"{nombre} ARCA"] = de_arca / 100
+        columnas[f"Diferencia {nombre}"] = diferencia / 100
+
+    seleccion = validos & difiere
+    detalle = pd.Series(
+        [
+            ", ".join(filter(None, partes))
+            for partes in zip(*(obs[seleccion] for obs in observaciones))
+        ],
+        dtype=object,
+    )
+    fm = fila_mendez[seleccion]
+    return pd.DataFrame(
+        {
+            "PV": mendez["PV"].to_numpy()[fm],
+            "Nro": mendez["Nro"].to_numpy()[fm],
+            "Fecha": mendez["Fecha"].to_numpy()[fm],
+            "Comprobante": mendez["Comprobante"].to_numpy()[fm],
+            "Letra": mendez["Letra"].to_numpy()[fm],
+            "Tipo ARCA": tipo_arca[seleccion],
+            "Razon Social": mendez["Razon Social"].to_numpy()[fm],
+            "CUIT Mendez": mendez["CUIT"].to_numpy()[fm],
+            "CUIT ARCA": cuit_arca[seleccion],
+            "Difiere en": detalle.to_numpy(),
+            **{nombre: valores[seleccion] for nombre, valores in columnas.items()},
+        }
+    )
+
+
+def cruzar_por_clave(
+    df_mendez, df_arca, importes_mendez=None, tolerancia=TOLERANCIA_IMPORTE
+):
+    """Arma el ResultadoCruce con un único merge externo sobre la clave PV-Nro.
+
+    Los pares del mismo merge se usan para las diferencias de importe.
+    """
+    mendez = agregar_clave(df_mendez, "PV", "Nro")
+    arca = agregar_clave(df_arca, "Punto de Venta", "Número de Comprobante")
+
+    cruce = pd.merge(
+        pd.DataFrame({"clave": mendez["clave"], "fila_mendez": np.arange(len(mendez))}),
+        pd.DataFrame({"clave": arca["clave"], "fila_arca": np.arange(len(arca))}),
+        on="clave",
+        how="outer",
+        indicator=True,
+    )
+
+    def filas(lado, columna):
+        seleccion = cruce.loc[cruce["_merge"] == lado, columna]
+        return np.sort(seleccion.to_numpy(dtype=np.int64))
+
+    ambos = cruce[cruce["_merge"] == "both"].sort_values(["fila_mendez", "fila_arca"])
+    coincidentes = pd.concat(
+        [
+            mendez.iloc[ambos["fila_mendez"].to_numpy(dtype=np.int64)].reset_index(
+                drop=True
+            ),
+            arca.drop(columns=["clave"])
+            .iloc[ambos["fila_arca"].to_numpy(dtype=np.int64)]
+            .reset_index(drop=True),
+        ],
+        axis=1,
+    )
+
+    diferencias = None
+    if importes_mendez is not None:
+        diferencias = diferencias_de_importe(
+            mendez,
+            arca,
+            ambos["fila_mendez"].to_numpy(dtype=np.int64),
+            ambos["fila_arca"].to_numpy(dtype=np.int64),
+            importes_mendez,
+            tolerancia,
+        )
+
+    return ResultadoCruce(
+        mendez=mendez,
+        arca=arca,
+        coincidentes=coincidentes,
+        arca_no_en_mendez=arca.iloc[filas("right_only", "fila_arca")].drop(
+            columns=["clave"]
+        ),
+        mendez_no_en_arca=mendez.iloc[filas("left_only", "fila_mendez")].drop(
+            columns=["clave"]
+        ),
+        diferencias=diferencias,
+    )
+
+
+def cruzar_archivos(
+    file_path,
+    zip_path,
+    registro=None,
+    procesos=None,
+    tolerancia=TOLERANCIA_IMPORTE,
+    exigir_totales=False,
+):
+    """Procesa el TXT de Mendez y el ZIP de ARCA de un cliente y los cruza.
+
+    Devuelve el encabezado, el LibroMendez y el ResultadoCruce (con las
+    diferencias de importe según tolerancia, en pesos). Con exigir_totales
+    se corta antes de leer el ZIP si el TXT no coincide con sus TOTALES POR
+    TASA.
+    """
+    df_encabezado, libro = procesar_archivo(
+        file_path, registro=registro, procesos=procesos, exigir_totales=exigir_totales
+    )
+
+    df_arca = procesar_zip_csv(zip_path, registro=registro)
+    if df_arca is None:
+        raise ErrorProcesamiento("No se encontró un archivo CSV dentro del ZIP.")
+
+    cruce = cruzar_comprobantes(
+        libro.movimientos,
+        df_arca,
+        registro=registro,
+        importes_mendez=libro.importes,
+        tolerancia=tolerancia,
+    )
+    return df_encabezado, libro, cruce
+
+
+# ============================================================================
+# PROCESAMIENTO DE VARIOS ARCHIVOS
+# ============================================================================
+
+
+# Columna con el período del encabezado al unir varios libros
+COLUMNA_PERIODO = "Periodo"
+
+
+def procesar_con_registro(funcion, origen, medir_memoria=None):
+    """Ejecuta funcion(origen) con un registro propio, que se devuelve junto al resultado.
+
+    Con medir_memoria=None no se mide nada. Se usa desde los pools, donde el
+    registro del llamador no se comparte (procesos) o mezclaría archivos (hilos).
+    """
+    registro = None if medir_memoria is None else RegistroEtapas(medir_memoria)
+    return funcion(origen, registro=registro), registro
+
+
+def procesar_en_paralelo(funcion, origenes, pool, registro=None, max_workers=None):
+    """Aplica funcion a cada origen (dict nombre -> ruta o archivo) en un pool.
+
+    Devuelve los resultados en el orden de origenes. Las mediciones de cada
+    archivo se agregan a registro con su nombre en "archivo", y un error en
+    cualquiera de ellos se informa como ErrorProcesamiento con el nombre.
+    """
+    medir_memoria = None if registro is None else registro.medir_memoria
+
+    def esperar(nombre, obtener):
+        try:
+            return obtener()
+        except Exception as e:
+            raise ErrorProcesamiento(f"{nombre}: {e}") from e
+
+    # Con un solo archivo no vale la pena levantar el pool
+    if len(origenes) == 1:
+        hechos = [
+            esperar(
+                nombre, lambda: procesar_con_registro(funcion, origen, medir_memoria)
+            )
+            for nombre, origen in origenes.items()
+        ]
+    else:
+        with pool(max_workers=max_workers) as ejecutor:
+            futuros = {
+                nombre: ejecutor.submit(
+                    procesar_con_registro, funcion, origen, medir_memoria
+                )
+                for nombre, origen in origenes.items()
+            }
+            hechos = [
+                esperar(nombre, futuro.result) for nombre, futuro in futuros.items()
+            ]
+
+    resultados = []
+    for nombre, (resultado, registro_archivo) in zip(origenes, hechos):
+        if registro is not None:
+            registro.etapas.extend(
+                {**medicion, "archivo": nombre} for medicion in registro_archivo.etapas
+            )
+        resultados.append(resultado)
+    return resultados
+
+
+def combinar_libros(libros, periodos):
+    """Une varios LibroMendez en uno, con el período de cada movimiento en COLUMNA_PERIODO"""
+    movimientos = []
+    importes = []
+    controles = []
+    desplazamiento = 0
+    for libro, periodo in zip(libros, periodos):
+        movimientos.append(libro.movimientos.assign(**{COLUMNA_PERIODO: periodo}))
+        importes.append(
+            libro.importes.assign(
+                movimiento=libro.importes["movimiento"] + desplazamiento
+            )
+        )
+        desplazamiento += len(libro.movimientos)
+        if libro.control is not None:
+            control = libro.control.copy()
+            control.insert(0, COLUMNA_PERIODO, periodo)
+            controles.append(control)
+
+    # Las categorías distintas entre libros se vuelven a armar tras concatenar
+    movimientos = pd.concat(movimientos, ignore_index=True).astype(
+        {**TIPOS_MOVIMIENTOS, COLUMNA_PERIODO: "category"}
+    )
+    importes = pd.concat(importes, ignore_index=True).astype(TIPOS_IMPORTES)
+    control = pd.concat(controles, ignore_index=True) if controles else None
+    return LibroMendez(movimientos, importes, control)
+
+
+def procesar_archivos(origenes, registro=None, procesos=None):
+    """Procesa varios TXT de Mendez en paralelo y los une en un solo libro.
+
+    origenes es un dict nombre -> ruta o archivo en memoria. Cada TXT se
+    procesa en un pool de procesos, porque el parseo es Python puro y no
+    libera el GIL. Devuelve los encabezados (una columna por archivo) y un
+    LibroMendez con el período de cada movimiento en COLUMNA_PERIODO.
+    """
+    # Con varios archivos el paralelismo es entre archivos, no dentro de cada uno
+    funcion = procesar_archivo
+    if len(origenes) > 1:
+        funcion = partial(procesar_archivo, procesos=1)
+
+    resultados = procesar_en_paralelo(
+        funcion, origenes, ProcessPoolExecutor, registro, procesos
+    )
+
+    encabezados = pd.concat(
+        [
+            df_encabezado.set_axis([nombre], axis=1)
+            for nombre, (df_encabezado, _) in zip(origenes, resultados)
+        ],
+        axis=1,
+    )
+    libro = combinar_libros(
+        [libro for _, libro in resultados], encabezados.loc["PERIODO"]
+    )
+    return encabezados, libro
+
+
+def procesar_zips_csv(origenes, registro=None, hilos=None):
+    """Lee en paralelo varios ZIP de ARCA y concatena sus comprobantes.
+
+    origenes es un dict nombre -> ruta o archivo en memoria. La lectura del
+    CSV libera el GIL, así que alcanza con un pool de hilos.
+    """
+    partes = procesar_en_paralelo(
+        procesar_zip_csv, origenes, ThreadPoolExecutor, registro, hilos
+    )
+
+    sin_csv = [nombre for nombre, df in zip(origenes, partes) if df is None]
+    if sin_csv:
+        raise ErrorProcesamiento(
+            f"No se encontró un archivo CSV dentro de: {', '.join(sin_csv)}"
+        )
+
+    df_arca = pd.concat(partes, ignore_index=True)
+    for col in df_arca.columns:
+        if col in COLUMNAS_ARCA_CATEGORIAS:
+            df_arca[col] = df_arca[col].astype("category")
+    return df_arca
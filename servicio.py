@@ -0,0 +1,559 @@
+"""Servicio HTTP local para enviar cruces y consultar sus resultados.
+
+Uso:
+    python servicio.py [--host 127.0.0.1] [--puerto 8765] [--trabajos 1]
+                       [--max-en-cola 8] [--max-mb 512]
+
+Rutas (las respuestas son JSON salvo la descarga del consolidado):
+
+    POST   /trabajos                    multipart/form-data con los archivos
+                                        txt y zip y, opcionales, tolerancia
+                                        (pesos) y formato (xlsx, csv o
+                                        parquet). Responde 202 con el id del
+                                        trabajo, o 503 si la cola está llena.
+    GET    /trabajos                    estado de todos los trabajos
+    GET    /trabajos/<id>               estado, paso, progreso y resumen
+    GET    /trabajos/<id>/consolidado   el consolidado, cuando terminó
+    GET    /trabajos/<id>/resultado     faltantes, diferencias, sugerencias y
+                                        control contra los TOTALES POR TASA
+    DELETE /trabajos/<id>               cancela el trabajo; si ya terminó, lo
+                                        olvida
+
+Los trabajos corren en un pool acotado de hilos (ver trabajos.ColaTrabajos)
+y el consolidado se genera dentro del mismo trabajo, así que las peticiones
+HTTP solo leen estados y resultados ya calculados. Los envíos que superan
+--max-mb se rechazan con 413 antes de leerlos si el cliente manda
+"Expect: 100-continue" (como curl con archivos grandes).
+"""
+
+import argparse
+import email.parser
+import email.policy
+import json
+import sys
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from diagnostico import RegistroEtapas
+from procesador import (
+    FORMATO_XLSX,
+    FORMATOS_CONSOLIDADO,
+    HOJA_CONTROL_TOTALES,
+    HOJA_SUGERENCIAS,
+    TOLERANCIA_IMPORTE,
+    ErrorProcesamiento,
+    crear_archivo_consolidado,
+    cruzar_comprobantes,
+    estado_control_totales,
+    formato_ancho,
+    formatos_disponibles,
+    importes_en_pesos,
+    procesar_archivo,
+    procesar_zip_csv,
+)
+from sugerencias import sugerir_coincidencias
+from trabajos import ESTADO_ERROR, ESTADO_TERMINADO, ColaTrabajos
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+
+# Trabajos que se procesan a la vez y trabajos sin terminar que se aceptan
+# (los que exceden TRABAJOS_SIMULTANEOS esperan en la cola)
+TRABAJOS_SIMULTANEOS = 1
+MAX_EN_COLA = 8
+
+# Trabajos terminados que se conservan; al superarlo se olvidan los más viejos
+MAX_TRABAJOS_GUARDADOS = 32
+
+# Tamaño máximo del cuerpo de un POST
+MAX_MB_SUBIDA = 512
+
+# Segundos sugeridos al cliente para reintentar cuando la cola está llena
+SEGUNDOS_REINTENTO = 5
+
+# Pasos de cada trabajo, en orden
+PASOS_TRABAJO = ("txt", "zip", "cruce", "sugerencias", "consolidado")
+
+ResultadoTrabajo = namedtuple(
+    "ResultadoTrabajo",
+    [
+        "encabezado",
+        "libro",
+        "cruce",
+        "sugerencias",
+        "consolidado",
+        "formato",
+        "registro",
+    ],
+)
+
+
+class ColaLlena(Exception):
+    """Se lanza al enviar un trabajo cuando ya hay MAX_EN_COLA sin terminar"""
+
+
+class PeticionInvalida(Exception):
+    """Error en los datos de la petición; el mensaje es apto para el cliente"""
+
+
+# ============================================================================
+# TRABAJOS
+# ============================================================================
+
+
+def cruzar_subidos(trabajo, txt, zip_bytes, tolerancia, formato):
+    """Procesa un TXT y un ZIP en memoria, los cruza y genera el consolidado"""
+    registro = RegistroEtapas()
+
+    trabajo.avanzar("txt")
+    # El servicio ya corre varios trabajos a la vez: cada TXT se parsea en serie
+    df_encabezado, libro = procesar_archivo(
+        BytesIO(txt), registro=registro, procesos=1
+    )
+
+    trabajo.avanzar("zip")
+    df_arca = procesar_zip_csv(BytesIO(zip_bytes), registro=registro)
+    if df_arca is None:
+        raise ErrorProcesamiento("No se encontró un archivo CSV dentro del ZIP.")
+
+    trabajo.avanzar("cruce")
+    cruce = cruzar_comprobantes(
+        libro.movimientos,
+        df_arca,
+        registro=registro,
+        importes_mendez=libro.importes,
+        tolerancia=tolerancia,
+    )
+
+    trabajo.avanzar("sugerencias")
+    sugerencias = sugerir_coincidencias(
+        cruce.mendez_no_en_arca, cruce.arca_no_en_mendez, registro=registro
+    )
+
+    trabajo.avanzar("consolidado")
+    consolidado = crear_archivo_consolidado(
+        cruce.mendez,
+        cruce.arca,
+        cruce.arca_no_en_mendez,
+        cruce.mendez_no_en_arca,
+        libro.importes,
+        hojas_adicionales={
+            HOJA_SUGERENCIAS: sugerencias,
+            HOJA_CONTROL_TOTALES: libro.control,
+        },
+        formato=formato,
+        registro=registro,
+        al_avanzar=lambda hoja: trabajo.verificar(f"hoja {hoja}"),
+        diferencias=cruce.diferencias,
+    )
+
+    return ResultadoTrabajo(
+        df_encabezado, libro, cruce, sugerencias, consolidado, formato, registro
+    )
+
+
+def resumen_resultado(resultado):
+    """Cantidades del cruce y datos del encabezado de un trabajo terminado"""
+    encabezado = resultado.encabezado.iloc[:, 0]
+    cruce = resultado.cruce
+    return {
+        "cuit": encabezado.get("CUIT", ""),
+        "periodo": encabezado.get("PERIODO", ""),
+        "control_totales": estado_control_totales(resultado.libro.control),
+        "movimientos_mendez": len(cruce.mendez),
+        "comprobantes_arca": len(cruce.arca),
+        "arca_no_en_mendez": len(cruce.arca_no_en_mendez),
+        "mendez_no_en_arca": len(cruce.mendez_no_en_arca),
+        "diferencias_de_importe": len(cruce.diferencias),
+        "sugerencias": len(resultado.sugerencias),
+        "segundos": round(resultado.registro.total_segundos(), 3),
+    }
+
+
+def tablas_resultado(resultado):
+    """Tablas del resultado como listas de registros, con los importes en pesos"""
+    importes = resultado.libro.importes
+    tablas = {
+        "arca_no_en_mendez": resultado.cruce.arca_no_en_mendez,
+        "mendez_no_en_arca": formato_ancho(resultado.cruce.mendez_no_en_arca, importes),
+        "diferencias": resultado.cruce.diferencias,
+        "sugerencias": resultado.sugerencias,
+        "control_totales": resultado.libro.control,
+    }
+    return {
+        nombre: json.loads(
+            importes_en_pesos(df).to_json(
+                orient="records", date_format="iso", force_ascii=False
+            )
+        )
+        for nombre, df in tablas.items()
+    }
+
+
+class ServicioCruce:
+    """Trabajos del servicio por id, sobre una ColaTrabajos acotada.
+
+    Acepta hasta max_en_cola trabajos sin terminar; los terminados se
+    conservan (para consultar y descargar) hasta que hay más de
+    max_guardados, y entonces se olvidan los más viejos.
+    """
+
+    def __init__(
+        self,
+        trabajos_simultaneos=TRABAJOS_SIMULTANEOS,
+        max_en_cola=MAX_EN_COLA,
+        max_guardados=MAX_TRABAJOS_GUARDADOS,
+    ):
+        self.cola = ColaTrabajos(trabajos_simultaneos)
+        self.max_en_cola = max_en_cola
+        self.max_guardados = max_guardados
+        self.trabajos = OrderedDict()
+        self.lock = threading.RLock()
+
+    def lleno(self):
+        """Indica si ya hay max_en_cola trabajos sin terminar"""
+        with self.lock:
+            pendientes = sum(
+                not trabajo.terminado() for trabajo in self.trabajos.values()
+            )
+        return pendientes >= self.max_en_cola
+
+    def enviar(self, txt, zip_bytes, tolerancia, formato):
+        """Encola un cruce y devuelve su id; lanza ColaLlena si no hay lugar"""
+        with self.lock:
+            if self.lleno():
+                raise ColaLlena()
+            self.olvidar_terminados()
+
+            id_trabajo = uuid.uuid4().hex
+            self.trabajos[id_trabajo] = self.cola.enviar(
+                lambda trabajo: cruzar_subidos(
+                    trabajo, txt, zip_bytes, tolerancia, formato
+                ),
+                PASOS_TRABAJO,
+            )
+        return id_trabajo
+
+    def olvidar_terminados(self):
+        """Descarta los trabajos terminados más viejos que exceden max_guardados"""
+        terminados = [
+            id_trabajo
+            for id_trabajo, trabajo in self.trabajos.items()
+            if trabajo.terminado()
+        ]
+        for id_trabajo in terminados[: max(len(terminados) - self.max_guardados, 0)]:
+            del self.trabajos[id_trabajo]
+
+    def buscar(self, id_trabajo):
+        """Devuelve el Trabajo con ese id o None"""
+        with self.lock:
+            return self.trabajos.get(id_trabajo)
+
+    def cancelar(self, id_trabajo):
+        """Pide cancelar el trabajo y, si ya terminó, lo olvida.
+
+        Un trabajo en curso sigue ocupando su lugar en la cola hasta que la
+        cancelación toma efecto. Devuelve el Trabajo o None si no existe.
+        """
+        with self.lock:
+            trabajo = self.trabajos.get(id_trabajo)
+            if trabajo is None:
+                return None
+            trabajo.cancelar()
+            if trabajo.terminado():
+                del self.trabajos[id_trabajo]
+        return trabajo
+
+    def estados(self):
+        """Estado de todos los trabajos conservados, del más viejo al más nuevo"""
+        with self.lock:
+            trabajos = list(self.trabajos.items())
+        return [estado_trabajo(id_trabajo, trabajo) for id_trabajo, trabajo in trabajos]
+
+
+def estado_trabajo(id_trabajo, trabajo):
+    """Estado de un trabajo para responder en JSON"""
+    estado = {
+        "id": id_trabajo,
+        "estado": trabajo.estado,
+        "paso": trabajo.paso,
+        "detalle": trabajo.detalle,
+        "progreso": round(trabajo.progreso(), 3),
+        "cancelando": trabajo.cancelando(),
+        "url": f"/trabajos/{id_trabajo}",
+    }
+    if trabajo.estado == ESTADO_ERROR:
+        error = trabajo.error
+        estado["error"] = (
+            str(error)
+            if isinstance(error, ErrorProcesamiento)
+            else f"{type(error).__name__}: {error}"
+        )
+    elif trabajo.estado == ESTADO_TERMINADO:
+        estado["resumen"] = resumen_resultado(trabajo.resultado)
+        estado["consolidado"] = f"/trabajos/{id_trabajo}/consolidado"
+        estado["resultado"] = f"/trabajos/{id_trabajo}/resultado"
+    return estado
+
+
+# ============================================================================
+# PETICIONES
+# ============================================================================
+
+
+def leer_formulario(tipo_contenido, cuerpo):
+    """Devuelve el dict campo -> bytes de un cuerpo multipart/form-data"""
+    if not tipo_contenido.startswith("multipart/form-data"):
+        raise PeticionInvalida("Se espera un formulario multipart/form-data.")
+
+    mensaje = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + tipo_contenido.encode("latin-1") + b"\r\n\r\n" + cuerpo
+    )
+    campos = {}
+    for parte in mensaje.iter_parts():
+        nombre = parte.get_param("name", header="content-disposition")
+        if nombre:
+            campos[nombre] = parte.get_payload(decode=True) or b""
+    return campos
+
+
+def datos_envio(campos):
+    """Valida los campos del formulario y devuelve (txt, zip, tolerancia, formato)"""
+    faltantes = [campo for campo in ("txt", "zip") if not campos.get(campo)]
+    if faltantes:
+        raise PeticionInvalida(f"Faltan los archivos: {', '.join(faltantes)}.")
+
+    try:
+        tolerancia = float(campos.get("tolerancia") or TOLERANCIA_IMPORTE)
+    except ValueError:
+        raise PeticionInvalida("La tolerancia debe ser un número (en pesos).")
+    if tolerancia < 0:
+        raise PeticionInvalida("La tolerancia no puede ser negativa.")
+
+    formato = (campos.get("formato") or FORMATO_XLSX.encode()).decode().strip()
+    if formato not in formatos_disponibles():
+        raise PeticionInvalida(
+            f"Formato no disponible: {formato} "
+            f"(disponibles: {', '.join(formatos_disponibles())})."
+        )
+    return campos["txt"], campos["zip"], tolerancia, formato
+
+
+class ManejadorCruce(BaseHTTPRequestHandler):
+    """Atiende las rutas del servicio sobre el ServicioCruce del servidor"""
+
+    server_version = "CruceARCA/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def responder_json(self, estado_http, datos, encabezados=None):
+        """Envía datos como JSON con el código de estado indicado"""
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado_http)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (encabezados or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def responder_error(self, estado_http, mensaje, encabezados=None):
+        """Envía un error como JSON {"error": mensaje}"""
+        self.responder_json(estado_http, {"error": mensaje}, encabezados)
+
+    def ruta(self):
+        """Partes de la ruta pedida, sin barras ni parámetros"""
+        return [parte for parte in urlsplit(self.path).path.split("/") if parte]
+
+    def trabajo_pedido(self, partes):
+        """Devuelve (id, Trabajo) de la ruta o responde 404 y devuelve None"""
+        trabajo = self.server.servicio.buscar(partes[1])
+        if trabajo is None:
+            self.responder_error(HTTPStatus.NOT_FOUND, "No existe el trabajo.")
+            return None
+        return partes[1], trabajo
+
+    def demasiado_grande(self):
+        """Indica si el cuerpo anunciado supera el máximo del servidor"""
+        return int(self.headers.get("Content-Length") or 0) > self.server.max_bytes
+
+    def rechazar_envio(self):
+        """Responde el error de un POST que se rechaza sin leer; False si se acepta.
+
+        Con "Expect: 100-continue" se rechaza todo lo que se puede saber por
+        los encabezados; sin él, solo lo que es demasiado grande para leerlo.
+        Como el cuerpo queda sin leer, además se cierra la conexión.
+        """
+        esperando = self.headers.get("Expect", "").lower() == "100-continue"
+        if esperando and self.ruta() != ["trabajos"]:
+            self.responder_error(HTTPStatus.NOT_FOUND, "Ruta desconocida.")
+        elif self.demasiado_grande():
+            self.responder_error(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                f"El envío supera {self.server.max_bytes // 2**20} MB.",
+            )
+        elif esperando and self.server.servicio.lleno():
+            self.responder_cola_llena()
+        else:
+            return False
+        self.close_connection = True
+        return True
+
+    def responder_cola_llena(self):
+        """Responde 503 con el tiempo sugerido para reintentar"""
+        self.responder_error(
+            HTTPStatus.SERVICE_UNAVAILABLE,
+            "Hay demasiados trabajos en curso; reintente más tarde.",
+            {"Retry-After": str(SEGUNDOS_REINTENTO)},
+        )
+
+    def handle_expect_100(self):
+        # Rechaza el envío antes de que el cliente mande el cuerpo
+        if self.rechazar_envio():
+            return False
+        return super().handle_expect_100()
+
+    def do_POST(self):
+        if self.rechazar_envio():
+            return
+
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.ruta() != ["trabajos"]:
+            self.responder_error(HTTPStatus.NOT_FOUND, "Ruta desconocida.")
+            return
+
+        try:
+            campos = leer_formulario(self.headers.get("Content-Type", ""), cuerpo)
+            id_trabajo = self.server.servicio.enviar(*datos_envio(campos))
+        except PeticionInvalida as e:
+            self.responder_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except ColaLlena:
+            self.responder_cola_llena()
+            return
+
+        trabajo = self.server.servicio.buscar(id_trabajo)
+        self.responder_json(
+            HTTPStatus.ACCEPTED,
+            estado_trabajo(id_trabajo, trabajo),
+            {"Location": f"/trabajos/{id_trabajo}"},
+        )
+
+    def do_GET(self):
+        partes = self.ruta()
+        if partes == ["trabajos"]:
+            self.responder_json(HTTPStatus.OK, self.server.servicio.estados())
+            return
+        if not (partes[:1] == ["trabajos"] and len(partes) in (2, 3)):
+            self.responder_error(HTTPStatus.NOT_FOUND, "Ruta desconocida.")
+            return
+
+        pedido = self.trabajo_pedido(partes)
+        if pedido is None:
+            return
+        id_trabajo, trabajo = pedido
+
+        if len(partes) == 2:
+            self.responder_json(HTTPStatus.OK, estado_trabajo(id_trabajo, trabajo))
+        elif trabajo.estado != ESTADO_TERMINADO:
+            self.responder_error(
+                HTTPStatus.CONFLICT,
+                f"El trabajo no terminó (estado: {trabajo.estado}).",
+            )
+        elif partes[2] == "resultado":
+            self.responder_json(
+                HTTPStatus.OK,
+                {
+                    **estado_trabajo(id_trabajo, trabajo),
+                    **tablas_resultado(trabajo.resultado),
+                },
+            )
+        elif partes[2] == "consolidado":
+            self.enviar_consolidado(trabajo.resultado)
+        else:
+            self.responder_error(HTTPStatus.NOT_FOUND, "Ruta desconocida.")
+
+    def enviar_consolidado(self, resultado):
+        """Envía el archivo consolidado de un trabajo terminado"""
+        nombre, mime, _ = FORMATOS_CONSOLIDADO[resultado.formato]
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(len(resultado.consolidado)))
+        self.send_header("Content-Disposition", f'attachment; filename="{nombre}"')
+        self.end_headers()
+        self.wfile.write(resultado.consolidado)
+
+    def do_DELETE(self):
+        partes = self.ruta()
+        if not (partes[:1] == ["trabajos"] and len(partes) == 2):
+            self.responder_error(HTTPStatus.NOT_FOUND, "Ruta desconocida.")
+            return
+
+        trabajo = self.server.servicio.cancelar(partes[1])
+        if trabajo is None:
+            self.responder_error(HTTPStatus.NOT_FOUND, "No existe el trabajo.")
+            return
+        self.responder_json(HTTPStatus.OK, estado_trabajo(partes[1], trabajo))
+
+
+def crear_servidor(
+    host=HOST,
+    puerto=PUERTO,
+    trabajos_simultaneos=TRABAJOS_SIMULTANEOS,
+    max_en_cola=MAX_EN_COLA,
+    max_mb=MAX_MB_SUBIDA,
+):
+    """Crea el servidor HTTP (sin iniciarlo); con puerto=0 se elige uno libre"""
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorCruce)
+    servidor.daemon_threads = True
+    servidor.servicio = ServicioCruce(trabajos_simultaneos, max_en_cola)
+    servidor.max_bytes = max_mb * 2**20
+    return servidor
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Servicio HTTP local para cruzar TXT de Mendez con ZIP de ARCA."
+    )
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument(
+        "--trabajos",
+        type=int,
+        default=TRABAJOS_SIMULTANEOS,
+        help="Trabajos que se procesan a la vez",
+    )
+    parser.add_argument(
+        "--max-en-cola",
+        type=int,
+        default=MAX_EN_COLA,
+        help="Trabajos sin terminar que se aceptan antes de responder 503",
+    )
+    parser.add_argument("--max-mb", type=int, default=MAX_MB_SUBIDA)
+    args = parser.parse_args(argv)
+
+    servidor = crear_servidor(
+        args.host, args.puerto, args.trabajos, args.max_en_cola, args.max_mb
+    )
+    host, puerto = servidor.server_address[:2]
+    print(f"Escuchando en http://{host}:{puerto}/trabajos", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""Sugerencias de coincidencia para los comprobantes que quedaron sin cruzar.
+
+Muchos faltantes de ARCA NO EN MENDEZ y MENDEZ NO EN ARCA son errores de
+carga: dígitos del Nro invertidos, un PV equivocado o la razón social que
+Mendez corta en 22 caracteres. En vez de comparar cada faltante de un lado
+con todos los del otro, los candidatos salen de índices de bloqueo (mismo
+CUIT, mismo importe, mismo PV con los mismos dígitos en el Nro, mismo Nro)
+y solo esos pares se puntúan, con distancia de edición vectorizada.
+"""
+
+import numpy as np
+import pandas as pd
+
+from almacen import COLUMNAS_ARCA
+from diagnostico import medir_etapa, tamano_dataframes
+from procesador import importes_arca_centavos, solo_digitos
+
+# Sugerencias que se informan por cada faltante, de mayor a menor puntaje
+MAX_SUGERENCIAS = 3
+
+# Puntaje mínimo (0 a 100) para sugerir un par
+PUNTAJE_MINIMO = 75
+
+# Los bloques con más pares que este límite se descartan: suelen ser un
+# CUIT o un importe muy repetido y los buenos candidatos aparecen igual por
+# otro bloque. Acota el tiempo aunque haya 100.000 faltantes de cada lado
+MAX_PARES_POR_BLOQUE = 2000
+
+# Ancho en centavos de los rangos de importe del bloqueo (se comparan el
+# rango propio y los dos vecinos)
+ANCHO_RANGO_IMPORTE = 100
+
+# Largo con que Mendez guarda la razón social (ver CAMPOS_ENCABEZADO)
+LARGO_RAZON_SOCIAL = 22
+
+# Peso de cada criterio en el puntaje
+PESOS_PUNTAJE = {
+    "CUIT": 0.30,
+    "importe": 0.25,
+    "Nro": 0.20,
+    "razón social": 0.15,
+    "PV": 0.10,
+}
+
+
+# ============================================================================
+# NORMALIZACIÓN
+# ============================================================================
+
+
+def normalizar_texto(serie, largo=None):
+    """Mayúsculas sin acentos ni signos, cortado a largo caracteres antes de limpiar"""
+    texto = serie.astype("string").fillna("")
+    if largo is not None:
+        texto = texto.str.slice(0, largo)
+    texto = (
+        texto.str.normalize("NFKD")
+        .str.encode("ascii", errors="ignore")
+        .str.decode("ascii")
+        .str.upper()
+    )
+    return texto.str.replace(r"[^A-Z0-9]", "", regex=True)
+
+
+def digitos_ordenados(serie):
+    """Dígitos de cada valor ordenados (iguales si solo están permutados)"""
+    return serie.map(lambda texto: "".join(sorted(texto)))
+
+
+def a_matriz(textos):
+    """Convierte textos ASCII a una matriz uint8 (relleno con ceros) y sus largos"""
+    largos = textos.str.len().to_numpy(dtype=np.int64)
+    ancho = max(int(largos.max(initial=0)), 1)
+    matriz = (
+        np.array(textos.to_numpy(dtype=object), dtype=f"S{ancho}")
+        .view(np.uint8)
+        .reshape(len(textos), ancho)
+    )
+    return matriz, largos
+
+
+def preparar_mendez(df):
+    """Campos de comparación de los faltantes de Mendez"""
+    return pd.DataFrame(
+        {
+            "pv": solo_digitos(df["PV"]).str.lstrip("0"),
+            "nro": solo_digitos(df["Nro"]).str.lstrip("0"),
+            "cuit": solo_digitos(df["CUIT"]),
+            "razon": normalizar_texto(df["Razon Social"], LARGO_RAZON_SOCIAL),
+            "importe": np.abs(df["Total"].to_numpy(dtype=np.int64)),
+        }
+    )
+
+
+def columna_arca(df, campo):
+    """Valores de la columna de ARCA del campo (según el formato del CSV) o vacíos"""
+    columna = next((col for col in COLUMNAS_ARCA[campo] if col in df.columns), None)
+    if columna is None:
+        return pd.Series(None, index=df.index, dtype="string")
+    return df[columna]
+
+
+def preparar_arca(df):
+    """Campos de comparación de los faltantes de ARCA"""
+    importes = importes_arca_centavos(df, np.arange(len(df)))
+    return pd.DataFrame(
+        {
+            "pv": solo_digitos(df["Punto de Venta"]).str.lstrip("0"),
+            "nro": solo_digitos(df["Número de Comprobante"]).str.lstrip("0"),
+            "cuit": solo_digitos(columna_arca(df, "nro_doc")),
+            "razon": normalizar_texto(
+                columna_arca(df, "denominacion"), LARGO_RAZON_SOCIAL
+            ),
+            "importe": np.abs(importes["Total"]),
+        }
+    ).reset_index(drop=True)
+
+
+# ============================================================================
+# BLOQUEO
+# ============================================================================
+
+
+def codigos_clave(claves_mendez, claves_arca):
+    """Pasa claves de texto a códigos enteros comunes a ambos lados (-1 si vacía)"""
+    codigos, unicos = pd.factorize(
+        pd.concat([claves_mendez, claves_arca], ignore_index=True)
+    )
+    codigos[np.isin(codigos, np.flatnonzero(unicos == ""))] = -1
+    return codigos[: len(claves_mendez)], codigos[len(claves_mendez) :]
+
+
+def pares_por_clave(claves_mendez, claves_arca, max_pares=MAX_PARES_POR_BLOQUE):
+    """Pares (fila_mendez, fila_arca) con la misma clave de bloqueo.
+
+    Las claves son enteros no negativos; -1 no forma bloque. Los bloques con
+    más de max_pares pares se descartan.
+    """
+    tamano = max(claves_mendez.max(initial=-1), claves_arca.max(initial=-1)) + 1
+    por_clave = np.bincount(
+        claves_mendez[claves_mendez >= 0], minlength=tamano
+    ) * np.bincount(claves_arca[claves_arca >= 0], minlength=tamano)
+    validas = np.append((por_clave > 0) & (por_clave <= max_pares), False)
+
+    filas_mendez = np.flatnonzero(validas[claves_mendez])
+    filas_arca = np.flatnonzero(validas[claves_arca])
+    return pd.merge(
+        pd.DataFrame(
+            {"clave": claves_mendez[filas_mendez], "fila_mendez": filas_mendez}
+        ),
+        pd.DataFrame({"clave": claves_arca[filas_arca], "fila_arca": filas_arca}),
+        on="clave",
+    )[["fila_mendez", "fila_arca"]]
+
+
+def rangos_importe(importes, desplazamiento=0):
+    """Rango de importe de cada fila como clave de bloqueo (-1 si no hay importe)"""
+    rangos = importes // ANCHO_RANGO_IMPORTE + desplazamiento
+    return np.where((importes != 0) & (rangos >= 0), rangos, -1)
+
+
+def pares_candidatos(mendez, arca, max_pares=MAX_PARES_POR_BLOQUE):
+    """Une los pares de todos los bloques, sin repetir"""
+    importe_mendez = mendez["importe"].to_numpy()
+    importe_arca = arca["importe"].to_numpy()
+
+    bloques = [
+        pares_por_clave(
+            rangos_importe(importe_mendez),
+            rangos_importe(importe_arca, desplazamiento),
+            max_pares,
+        )
+        for desplazamiento in (-1, 0, 1)
+    ]
+    for claves_mendez, claves_arca in (
+        (mendez["cuit"], arca["cuit"]),
+        (
+            mendez["pv"] + "-" + digitos_ordenados(mendez["nro"]),
+            arca["pv"] + "-" + digitos_ordenados(arca["nro"]),
+        ),
+        (mendez["nro"], arca["nro"]),
+    ):
+        bloques.append(
+            pares_por_clave(*codigos_clave(claves_mendez, claves_arca), max_pares)
+        )
+    return pd.concat(bloques, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+# ============================================================================
+# PUNTAJE
+# ============================================================================
+
+
+def distancia_edicion(a, largos_a, b, largos_b):
+    """Distancia de edición (con transposiciones) entre filas de dos matrices uint8.
+
+    Calcula la programación dinámica para todos los pares a la vez, fila por
+    fila, y toma de cada par el valor en (largo de a, largo de b).
+    """
+    n, ancho_a = a.shape
+    ancho_b = b.shape[1]
+    columnas = np.arange(ancho_b + 1)
+    anterior2 = None
+    anterior = np.broadcast_to(columnas, (n, ancho_b + 1)).copy()
+    distancias = anterior[np.arange(n), largos_b].copy()
+
+    for i in range(1, ancho_a + 1):
+        actual = np.empty_like(anterior)
+        actual[:, 0] = i
+        for j in range(1, ancho_b + 1):
+            costo = (a[:, i - 1] != b[:, j - 1]).astype(np.int64)
+            valor = np.minimum(
+                np.minimum(anterior[:, j] + 1, actual[:, j - 1] + 1),
+                anterior[:, j - 1] + costo,
+            )
+            if anterior2 is not None and j > 1:
+                transpuesto = (a[:, i - 1] == b[:, j - 2]) & (
+                    a[:, i - 2] == b[:, j - 1]
+                )
+                valor = np.where(
+                    transpuesto, np.minimum(valor, anterior2[:, j - 2] + 1), valor
+                )
+            actual[:, j] = valor
+        terminan = largos_a == i
+        distancias[terminan] = actual[terminan, largos_b[terminan]]
+        anterior2, anterior = anterior, actual
+
+    return distancias
+
+
+def similitud(textos_a, textos_b):
+    """Similitud entre 0 y 1 según la distancia de edición relativa (0 si falta).
+
+    La distancia se calcula una sola vez por cada combinación distinta de
+    textos: los pares de un mismo bloque repiten mucho la razón social y el
+    CUIT. Devuelve también las distancias.
+    """
+    codigos_a, unicos_a = pd.factorize(textos_a)
+    codigos_b, unicos_b = pd.factorize(textos_b)
+    combinaciones, inversa = np.unique(
+        codigos_a.astype(np.int64) * max(len(unicos_b), 1) + codigos_b,
+        return_inverse=True,
+    )
+    a, largos_a = a_matriz(pd.Series(unicos_a[combinaciones // max(len(unicos_b), 1)]))
+    b, largos_b = a_matriz(pd.Series(unicos_b[combinaciones % max(len(unicos_b), 1)]))
+    distancias = distancia_edicion(a, largos_a, b, largos_b)
+    largo = np.maximum(largos_a, largos_b)
+    similitudes = np.where(largo > 0, 1 - distancias / np.maximum(largo, 1), 0.0)
+    return similitudes[inversa], distancias[inversa]
+
+
+def puntuar(mendez, arca, pares):
+    """Agrega a los pares el puntaje (0 a 100) y en qué criterios coinciden"""
+    m = mendez.iloc[pares["fila_mendez"].to_numpy()].reset_index(drop=True)
+    a = arca.iloc[pares["fila_arca"].to_numpy()].reset_index(drop=True)
+
+    similitudes = {}
+    similitudes["CUIT"], _ = similitud(m["cuit"], a["cuit"])
+    similitudes["Nro"], distancia_nro = similitud(m["nro"], a["nro"])
+    similitudes["razón social"], _ = similitud(m["razon"], a["razon"])
+    similitudes["PV"] = (m["pv"].to_numpy() == a["pv"].to_numpy()).astype(float)
+
+    importe_m = m["importe"].to_numpy()
+    importe_a = a["importe"].to_numpy()
+    diferencia = np.abs(importe_m - importe_a)
+    similitudes["importe"] = np.where(
+        diferencia <= ANCHO_RANGO_IMPORTE,
+        1.0,
+        1 - np.minimum(diferencia / np.maximum(np.maximum(importe_m, importe_a), 1), 1),
+    )
+
+    puntaje = sum(peso * similitudes[nombre] for nombre, peso in PESOS_PUNTAJE.items())
+
+    pares = pares.reset_index(drop=True)
+    pares["puntaje"] = np.round(puntaje * 100).astype(np.int64)
+    for nombre in PESOS_PUNTAJE:
+        pares[nombre] = similitudes[nombre] == 1
+    pares["distancia_nro"] = distancia_nro
+    return pares
+
+
+def criterios_coincidentes(pares):
+    """Texto con los criterios en que coincide cada par (y los cambios del Nro)"""
+    partes = [np.where(pares[nombre], nombre, "") for nombre in PESOS_PUNTAJE]
+    distancia = pares["distancia_nro"].to_numpy()
+    partes.append(
+        np.where(
+            (distancia > 0) & (distancia <= 2),
+            "Nro a " + distancia.astype(str) + " cambio(s)",
+            "",
+        )
+    )
+    return [", ".join(filter(None, criterios)) for criterios in zip(*partes)]
+
+
+def rankear(pares, max_sugerencias=MAX_SUGERENCIAS, puntaje_minimo=PUNTAJE_MINIMO):
+    """Numera los candidatos de cada faltante y deja los max_sugerencias mejores.
+
+    Un par queda si está entre los mejores de su comprobante de Mendez o de
+    su comprobante de ARCA.
+    """
+    pares = pares[pares["puntaje"] >= puntaje_minimo]
+    for lado in ("mendez", "arca"):
+        pares = pares.sort_values(
+            [f"fila_{lado}", "puntaje"], ascending=[True, False], kind="stable"
+        )
+        pares[f"rango_{lado}"] = pares.groupby(f"fila_{lado}").cumcount() + 1
+    mejores = (pares["rango_mendez"] <= max_sugerencias) | (
+        pares["rango_arca"] <= max_sugerencias
+    )
+    return pares[mejores].sort_values(["fila_mendez", "rango_mendez"])
+
+
+# ============================================================================
+# SUGERENCIAS
+# ============================================================================
+
+
+def sugerir_coincidencias(
+    mendez_no_en_arca,
+    arca_no_en_mendez,
+    max_sugerencias=MAX_SUGERENCIAS,
+    registro=None,
+):
+    """Devuelve las sugerencias de coincidencia entre los faltantes de cada lado.
+
+    Cada fila es un par candidato con su puntaje, los criterios en que
+    coincide y su rango entre los candidatos del comprobante de Mendez y
+    del de ARCA. Los importes van en pesos, como en el consolidado.
+    """
+    with medir_etapa(
+        registro,
+        "sugerencias",
+        bytes_entrada=lambda: tamano_dataframes(mendez_no_en_arca, arca_no_en_mendez),
+    ) as medicion:
+        mendez = preparar_mendez(mendez_no_en_arca)
+        arca = preparar_arca(arca_no_en_mendez)
+
+        pares = rankear(
+            puntuar(mendez, arca, pares_candidatos(mendez, arca)), max_sugerencias
+        )
+        denominacion = columna_arca(arca_no_en_mendez, "denominacion").to_numpy()
+        cuit_arca = columna_arca(arca_no_en_mendez, "nro_doc").to_numpy()
+        fm = pares["fila_mendez"].to_numpy()
+        fa = pares["fila_arca"].to_numpy()
+
+        sugerencias = pd.DataFrame(
+            {
+                "Rango Mendez": pares["rango_mendez"].to_numpy(),
+                "Rango ARCA": pares["rango_arca"].to_numpy(),
+                "Puntaje": pares["puntaje"].to_numpy(),
+                "Coincide en": criterios_coincidentes(pares),
+                "PV Mendez": mendez_no_en_arca["PV"].to_numpy()[fm],
+                "Nro Mendez": mendez_no_en_arca["Nro"].to_numpy()[fm],
+                "Razon Social Mendez": mendez_no_en_arca["Razon Social"].to_numpy()[fm],
+                "CUIT Mendez": mendez_no_en_arca["CUIT"].to_numpy()[fm],
+                "PV ARCA": arca_no_en_mendez["Punto de Venta"].to_numpy()[fa],
+                "Nro ARCA": arca_no_en_mendez["Número de Comprobante"].to_numpy()[fa],
+                "Denominación ARCA": denominacion[fa],
+                "CUIT ARCA": cuit_arca[fa],
+                # Importes al final, donde el consolidado aplica formato de moneda
+                "Total Mendez": mendez["importe"].to_numpy()[fm] / 100,
+                "Total ARCA": arca["importe"].to_numpy()[fa] / 100,
+            }
+        )
+        medicion["filas"] = len(sugerencias)
+
+    return sugerencias
+
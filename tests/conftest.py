@@ -0,0 +1,80 @@
+"""Datos compartidos por las pruebas: libros de Mendez y ZIP de ARCA en memoria."""
+
+import os
+import sys
+from io import BytesIO, StringIO
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generar_datos import generar_txt, generar_zip  # noqa: E402
+
+
+def libro_txt(movimientos, semilla=0, operacion="Ventas", **opciones):
+    """Genera un TXT de Mendez en memoria; devuelve sus bytes y los comprobantes.
+
+    opciones se pasan a generar_txt (por ejemplo, periodo o puntos_de_venta).
+    """
+    salida = StringIO(newline="")
+    comprobantes = generar_txt(
+        salida, movimientos, semilla=semilla, operacion=operacion, **opciones
+    )
+    contenido = salida.getvalue().replace("\n", "\r\n").encode("latin-1")
+    return contenido, comprobantes
+
+
+def zip_arca(comprobantes, semilla=0, **opciones):
+    """Genera en memoria el ZIP de ARCA de los comprobantes de un libro.
+
+    opciones se pasan a generar_zip (por ejemplo, archivos_csv).
+    """
+    salida = BytesIO()
+    generar_zip(salida, comprobantes, semilla=semilla, **opciones)
+    return salida.getvalue()
+
+
+def comprobante(nro, tipo="FC", **campos):
+    """Campos de ancho fijo de un movimiento de prueba; campos reemplaza los fijos"""
+    return {
+        "dia": 5,
+        "tipo": tipo,
+        "pv": 1,
+        "nro": nro,
+        "letra": "A",
+        "razon": f"CLIENTE {nro}",
+        "condicion": "RI",
+        "cuit": "30-12345678-9",
+        "concepto": 1,
+        "jurisdiccion": "C",
+        **campos,
+    }
+
+
+def armar_txt(cuerpo, libro="LIBRO  IVA VENTAS"):
+    """TXT con el encabezado de 9 líneas, el cuerpo indicado y sin pie de totales"""
+    encabezado = [
+        "\x1b[1m",
+        "ESTUDIO DE PRUEBA SA",
+        "CALLE 123",
+        "30-71234567-8",
+        libro,
+        "PERIODO  01/2024",
+        "",
+        "",
+        "",
+    ]
+    return ("\r\n".join(encabezado + cuerpo) + "\r\n").encode("latin-1")
+
+
+@pytest.fixture
+def generar_libro():
+    """Fábrica de TXT de Mendez en memoria (ver libro_txt)"""
+    return libro_txt
+
+
+@pytest.fixture
+def generar_zip_arca():
+    """Fábrica de ZIP de ARCA en memoria (ver zip_arca)"""
+    return zip_arca
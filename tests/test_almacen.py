@@ -0,0 +1,116 @@
+"""Pruebas del historial SQLite y de la búsqueda en períodos vecinos."""
+
+from io import BytesIO
+
+import pytest
+
+from almacen import AlmacenLibros, buscar_en_periodos_vecinos, guardar_cruce
+from procesador import cruzar_comprobantes, procesar_archivo, procesar_zip_csv
+
+CUIT = "30-71234567-8"
+PERIODO = "01/2024"
+
+# Los primeros comprobantes del libro faltan en el ARCA del período
+FALTANTES = 10
+
+
+def leer_zip(generar_zip_arca, comprobantes, solo_arca=0.0):
+    """ZIP de ARCA con todos los comprobantes indicados, ya leído"""
+    contenido = generar_zip_arca(
+        comprobantes, solapamiento=1.0, solo_arca=solo_arca
+    )
+    return procesar_zip_csv(BytesIO(contenido))
+
+
+def clave(pv, nro):
+    return f"{int(pv):05d}-{int(nro):08d}"
+
+
+@pytest.fixture
+def escenario(generar_libro, generar_zip_arca, tmp_path):
+    """Enero cruzado, con sus faltantes repartidos en otros períodos guardados"""
+    txt, comprobantes = generar_libro(200)
+    _, libro = procesar_archivo(BytesIO(txt))
+    # El ARCA de enero trae además algunos comprobantes que solo están en ARCA
+    df_arca = leer_zip(generar_zip_arca, comprobantes[FALTANTES:], solo_arca=0.03)
+    cruce = cruzar_comprobantes(libro.movimientos, df_arca)
+
+    almacen = AlmacenLibros(str(tmp_path / "historial.sqlite"))
+    guardar_cruce(almacen, CUIT, PERIODO, libro, df_arca)
+    # Faltantes de Mendez: la mitad en el ARCA de febrero, el resto en abril
+    almacen.guardar_arca(
+        CUIT, "02/2024", leer_zip(generar_zip_arca, comprobantes[: FALTANTES // 2])
+    )
+    almacen.guardar_arca(
+        CUIT,
+        "04/2024",
+        leer_zip(generar_zip_arca, comprobantes[FALTANTES // 2 : FALTANTES]),
+    )
+    # Faltantes de ARCA: dos en el Mendez de diciembre y uno en el de marzo
+    solo_arca = cruce.arca_no_en_mendez
+    otros = libro.movimientos.head(3).copy()
+    otros["PV"] = solo_arca["Punto de Venta"].astype("int64").to_numpy()[:3]
+    otros["Nro"] = solo_arca["Número de Comprobante"].astype("int64").to_numpy()[:3]
+    almacen.guardar_mendez(CUIT, "12/2023", otros.head(2))
+    almacen.guardar_mendez(CUIT, "03/2024", otros.tail(1))
+    # Los faltantes en el período vecino de otro CUIT no cuentan
+    almacen.guardar_arca(
+        "20-11111111-2", "12/2023", leer_zip(generar_zip_arca, comprobantes)
+    )
+
+    return almacen, comprobantes, cruce, otros
+
+
+def test_faltantes_se_encuentran_en_el_mes_vecino(escenario):
+    almacen, comprobantes, cruce, otros = escenario
+    assert len(cruce.mendez_no_en_arca) == FALTANTES
+    assert len(cruce.arca_no_en_mendez) >= 3
+
+    mendez, arca = buscar_en_periodos_vecinos(almacen, CUIT, PERIODO, cruce)
+
+    en_febrero = {clave(c["pv"], c["nro"]) for c in comprobantes[: FALTANTES // 2]}
+    encontrados = {clave(pv, nro) for pv, nro in zip(mendez["PV"], mendez["Nro"])}
+    assert encontrados == en_febrero
+    assert set(mendez["Período ARCA"]) == {"2024-02"}
+
+    en_diciembre = {
+        clave(pv, nro) for pv, nro in zip(otros["PV"][:2], otros["Nro"][:2])
+    }
+    encontrados = {
+        clave(pv, nro)
+        for pv, nro in zip(arca["Punto de Venta"], arca["Número de Comprobante"])
+    }
+    assert encontrados == en_diciembre
+    assert set(arca["Período Mendez"]) == {"2023-12"}
+
+
+def test_ventana_mas_amplia_encuentra_el_resto(escenario):
+    almacen, _, cruce, _ = escenario
+
+    mendez, arca = buscar_en_periodos_vecinos(almacen, CUIT, PERIODO, cruce, meses=3)
+
+    assert len(mendez) == FALTANTES
+    assert set(mendez["Período ARCA"]) == {"2024-02", "2024-04"}
+    assert list(arca["Período Mendez"]) == ["2023-12", "2023-12", "2024-03"]
+
+
+def test_guardar_de_nuevo_reemplaza_el_periodo(escenario, generar_zip_arca):
+    almacen, comprobantes, cruce, _ = escenario
+    # Se vuelve a guardar febrero, ahora sin los faltantes de enero
+    almacen.guardar_arca(
+        CUIT, "2024-02", leer_zip(generar_zip_arca, comprobantes[FALTANTES:])
+    )
+
+    mendez, _ = buscar_en_periodos_vecinos(almacen, CUIT, PERIODO, cruce)
+
+    assert mendez.empty
+    guardados = almacen.periodos_guardados(CUIT)
+    febrero = guardados[guardados["periodo"] == "2024-02"]
+    assert febrero["filas"].tolist() == [len(comprobantes) - FALTANTES]
+    assert set(guardados["periodo"]) == {
+        "2023-12",
+        "2024-01",
+        "2024-02",
+        "2024-03",
+        "2024-04",
+    }
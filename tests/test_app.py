@@ -0,0 +1,87 @@
+"""Pruebas de las funciones de la app que no dibujan la página."""
+
+import json
+from io import BytesIO
+
+import pytest
+
+app = pytest.importorskip("app")
+
+from diagnostico import RegistroEtapas  # noqa: E402
+from procesador import (  # noqa: E402
+    HOJA_DIFERENCIAS,
+    cruzar_comprobantes,
+    procesar_archivo,
+    procesar_zip_csv,
+)
+
+
+@pytest.fixture
+def resultado(generar_libro, generar_zip_arca):
+    """ResultadoTrabajo de un cruce, con la etapa del cruce ya medida"""
+    txt, comprobantes = generar_libro(100)
+    _, libro = procesar_archivo(BytesIO(txt))
+    df_arca = procesar_zip_csv(BytesIO(generar_zip_arca(comprobantes)))
+    registro = RegistroEtapas()
+    cruce = cruzar_comprobantes(
+        libro.movimientos, df_arca, registro=registro, importes_mendez=libro.importes
+    )
+    return app.ResultadoTrabajo(
+        cruce, libro.importes, libro.control, None, None, registro, None, [], set()
+    )
+
+
+@pytest.fixture
+def metricas(tmp_path, monkeypatch):
+    """Rutas de las métricas exportadas por la app, en una carpeta temporal"""
+    rutas = {"jsonl": tmp_path / "metricas.jsonl", "prom": tmp_path / "metricas.prom"}
+    monkeypatch.setenv(app.VARIABLE_METRICAS_JSONL, str(rutas["jsonl"]))
+    monkeypatch.setenv(app.VARIABLE_METRICAS_PROMETHEUS, str(rutas["prom"]))
+    app.crear_archivo_consolidado_cacheado.clear()
+    yield rutas
+    app.crear_archivo_consolidado_cacheado.clear()
+
+
+def test_cada_consolidado_se_mide_una_vez(resultado, metricas):
+    for _ in range(3):
+        # Sin caché el consolidado se vuelve a generar y a medir en cada clic
+        app.crear_archivo_consolidado_cacheado.clear()
+        assert app.generar_consolidado(("txt",), ("zip",), "csv", 1.0, resultado, False)
+
+    etapas = [medicion["etapa"] for medicion in resultado.registro.etapas]
+    assert etapas == ["cruce", "csv"]
+
+    # El JSON lines recibe solo la exportación y Prometheus, todo el registro
+    lineas = metricas["jsonl"].read_text(encoding="utf-8").splitlines()
+    assert [json.loads(linea)["etapa"] for linea in lineas] == ["csv"]
+    prometheus = metricas["prom"].read_text(encoding="utf-8")
+    assert 'etapa="cruce"' in prometheus
+    assert 'etapa="csv"' in prometheus
+
+
+def test_otro_formato_suma_su_medicion(resultado, metricas):
+    for formato in ("csv", "xlsx", "csv"):
+        app.generar_consolidado(("txt",), ("zip",), formato, 1.0, resultado, False)
+
+    etapas = [medicion["etapa"] for medicion in resultado.registro.etapas]
+    assert etapas == ["cruce", "csv", "excel"]
+    prometheus = metricas["prom"].read_text(encoding="utf-8")
+    assert all(f'etapa="{etapa}"' in prometheus for etapa in ("cruce", "csv", "excel"))
+
+
+
+def test_vista_previa_cacheada_por_tolerancia(resultado):
+    # Los datos generados no tienen diferencias: se simulan dos hojas distintas
+    mendez = resultado.cruce.mendez
+    tablas = {1.0: mendez, 0.0: mendez.head(5)}
+    app.posiciones_filtradas_cacheado.clear()
+
+    # Con otra tolerancia la hoja tiene otras filas y no sale de la caché
+    posiciones = {
+        tolerancia: app.posiciones_filtradas_cacheado(
+            "txt", "zip", tolerancia, HOJA_DIFERENCIAS, app.FiltroVista(), tabla
+        )
+        for tolerancia, tabla in tablas.items()
+    }
+
+    assert {t: len(p) for t, p in posiciones.items()} == {1.0: len(mendez), 0.0: 5}
@@ -0,0 +1,91 @@
+"""Pruebas de la lectura del ZIP de ARCA."""
+
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from procesador import ErrorProcesamiento, procesar_zip_csv
+
+MOTORES = ["c", "pyarrow"]
+
+
+def reescribir_zip(contenido, cambiar):
+    """Devuelve otro ZIP con cambiar(texto) aplicado a cada CSV"""
+    salida = BytesIO()
+    with zipfile.ZipFile(BytesIO(contenido)) as origen:
+        with zipfile.ZipFile(salida, "w") as destino:
+            for nombre in origen.namelist():
+                texto = origen.read(nombre).decode("utf-8")
+                destino.writestr(nombre, cambiar(texto))
+    return salida.getvalue()
+
+
+@pytest.fixture
+def comprobantes(generar_libro):
+    return generar_libro(500)[1]
+
+
+@pytest.mark.parametrize("motor", MOTORES)
+def test_varios_csv_igual_que_uno(generar_zip_arca, comprobantes, motor):
+    uno = procesar_zip_csv(BytesIO(generar_zip_arca(comprobantes)), motor=motor)
+    varios_zip = generar_zip_arca(comprobantes, archivos_csv=3)
+    with zipfile.ZipFile(BytesIO(varios_zip)) as z:
+        assert len(z.namelist()) == 3
+
+    varios = procesar_zip_csv(BytesIO(varios_zip), motor=motor)
+
+    assert len(uno) > 0
+    pd.testing.assert_frame_equal(varios, uno)
+
+
+def test_motores_dan_el_mismo_resultado(generar_zip_arca, comprobantes):
+    contenido = generar_zip_arca(comprobantes, archivos_csv=2)
+    con_pyarrow = procesar_zip_csv(BytesIO(contenido), motor="pyarrow")
+    # Bloques chicos para que el motor de C concatene varios por CSV
+    con_c = procesar_zip_csv(BytesIO(contenido), motor="c", filas_por_bloque=37)
+
+    pd.testing.assert_frame_equal(con_c, con_pyarrow)
+    assert con_c["Punto de Venta"].dtype == "Int64"
+    assert con_c["Tipo de Comprobante"].dtype == "category"
+    assert pd.api.types.is_datetime64_any_dtype(con_c["Fecha de Emisión"])
+
+
+@pytest.mark.parametrize("motor", MOTORES)
+def test_numero_desde_es_el_numero_de_comprobante(
+    generar_zip_arca, comprobantes, motor
+):
+    contenido = generar_zip_arca(comprobantes)
+    esperado = procesar_zip_csv(BytesIO(contenido), motor=motor)
+    con_alias = reescribir_zip(
+        contenido,
+        lambda texto: texto.replace("Número de Comprobante", "Número Desde"),
+    )
+
+    pd.testing.assert_frame_equal(
+        procesar_zip_csv(BytesIO(con_alias), motor=motor), esperado
+    )
+
+
+@pytest.mark.parametrize("motor", MOTORES)
+def test_csv_sin_columnas_de_la_clave(generar_zip_arca, comprobantes, motor):
+    sin_clave = reescribir_zip(
+        generar_zip_arca(comprobantes),
+        lambda texto: texto.replace("Punto de Venta", "PV").replace(
+            "Número de Comprobante", "Nro"
+        ),
+    )
+
+    with pytest.raises(ErrorProcesamiento) as error:
+        procesar_zip_csv(BytesIO(sin_clave), motor=motor)
+    assert "Punto de Venta, Número de Comprobante" in str(error.value)
+    assert "comprobantes_1.csv" in str(error.value)
+
+
+def test_zip_sin_csv():
+    contenido = BytesIO()
+    with zipfile.ZipFile(contenido, "w") as z:
+        z.writestr("leeme.txt", "sin comprobantes")
+
+    assert procesar_zip_csv(contenido) is None
@@ -0,0 +1,55 @@
+"""Prueba de sesiones simultáneas: cada una procesa sus propios archivos en memoria."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+
+from procesador import cruzar_comprobantes, procesar_archivo, procesar_zip_csv
+
+SESIONES = 24
+HILOS = 8
+PARES = 4
+
+
+def sesion(txt, zip_bytes):
+    """Lo que hace una sesión: procesa su TXT y su ZIP en memoria y los cruza"""
+    df_encabezado, libro = procesar_archivo(BytesIO(txt), procesos=1)
+    df_arca = procesar_zip_csv(BytesIO(zip_bytes))
+    cruce = cruzar_comprobantes(
+        libro.movimientos, df_arca, importes_mendez=libro.importes
+    )
+    return df_encabezado, libro, cruce
+
+
+def comparar(obtenido, esperado):
+    df_encabezado, libro, cruce = obtenido
+    pd.testing.assert_frame_equal(df_encabezado, esperado[0])
+    pd.testing.assert_frame_equal(libro.movimientos, esperado[1].movimientos)
+    pd.testing.assert_frame_equal(libro.importes, esperado[1].importes)
+    for campo, df in cruce._asdict().items():
+        pd.testing.assert_frame_equal(df, getattr(esperado[2], campo), obj=campo)
+
+
+def test_sesiones_simultaneas_no_mezclan_resultados(
+    generar_libro, generar_zip_arca, tmp_path, monkeypatch
+):
+    # Pares distintos en tamaño y contenido, para que cualquier mezcla se note
+    pares = []
+    for semilla in range(PARES):
+        txt, comprobantes = generar_libro(300 + 150 * semilla, semilla=semilla)
+        pares.append((txt, generar_zip_arca(comprobantes, semilla=semilla)))
+    esperados = [sesion(txt, zip_bytes) for txt, zip_bytes in pares]
+
+    monkeypatch.chdir(tmp_path)
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        futuros = [
+            (i % PARES, pool.submit(sesion, *pares[i % PARES]))
+            for i in range(SESIONES)
+        ]
+        for par, futuro in futuros:
+            comparar(futuro.result(), esperados[par])
+
+    # Nada se escribe en disco
+    assert os.listdir(tmp_path) == []
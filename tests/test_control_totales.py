@@ -0,0 +1,92 @@
+"""Pruebas del control de los movimientos contra los TOTALES POR TASA del TXT."""
+
+from io import BytesIO
+
+import pytest
+
+from benchmarks.generar_datos import linea_movimiento, region_importes
+from conftest import armar_txt, comprobante
+from procesador import (
+    ESTADO_SIN_TOTALES,
+    ESTADO_TOTALES_DIFIERE,
+    ESTADO_TOTALES_OK,
+    ErrorProcesamiento,
+    estado_control_totales,
+    procesar_archivo,
+)
+
+# Una factura por tasa y una NC que resta en la de 21%
+MOVIMIENTOS = [
+    (comprobante(1), "Tasa 21%", [1000, 210, 1210]),
+    (comprobante(2), "T.10.5%", [200, 21, 221]),
+    (comprobante(3, "NC"), "Tasa 21%", [100, 21, 121]),
+]
+
+# El pie que corresponde a MOVIMIENTOS
+PIE = [("Tasa 21%", [900, 189, 1089]), ("T.10.5%", [200, 21, 221])]
+
+
+def txt_con_pie(pie):
+    """TXT con MOVIMIENTOS y el pie indicado (None: sin pie)"""
+    cuerpo = [
+        linea_movimiento(campos, region_importes(tasa, importes))
+        for campos, tasa, importes in MOVIMIENTOS
+    ]
+    if pie is not None:
+        cuerpo += ["", "TOTALES POR TASA"]
+        cuerpo += [region_importes(tasa, importes) for tasa, importes in pie]
+    return BytesIO(armar_txt(cuerpo))
+
+
+def control_de(pie, **opciones):
+    _, libro = procesar_archivo(txt_con_pie(pie), **opciones)
+    return libro.control.set_index("Tasa")
+
+
+def test_pie_que_coincide():
+    control = control_de(PIE, exigir_totales=True)
+
+    assert control["Estado"].to_dict() == {
+        "Tasa 21%": ESTADO_TOTALES_OK,
+        "T.10.5%": ESTADO_TOTALES_OK,
+    }
+    assert control.loc["Tasa 21%", "Total Movimientos"] == pytest.approx(1089)
+    assert estado_control_totales(control) == ESTADO_TOTALES_OK
+
+
+def test_importes_que_difieren_del_pie():
+    # El pie tiene un peso más de IVA en la de 21% y le falta la de 10,5%
+    control = control_de([("Tasa 21%", [900, 190, 1090])])
+
+    assert control["Estado"].to_dict() == {
+        "Tasa 21%": ESTADO_TOTALES_DIFIERE,
+        "T.10.5%": ESTADO_TOTALES_DIFIERE,
+    }
+    fila = control.loc["Tasa 21%"]
+    assert fila["Difiere en"] == "IVA, Total"
+    assert fila["IVA Totales"] == pytest.approx(190)
+    assert fila["IVA Movimientos"] == pytest.approx(189)
+    assert fila["Diferencia IVA"] == pytest.approx(-1)
+    assert fila["Diferencia Neto"] == 0
+    # La tasa que falta en el pie cuenta como 0
+    assert control.loc["T.10.5%", "Total Totales"] == 0
+    assert control.loc["T.10.5%", "Difiere en"] == "Neto, IVA, Total"
+    assert estado_control_totales(control) == ESTADO_TOTALES_DIFIERE
+
+
+def test_exigir_totales_corta_si_difieren():
+    with pytest.raises(ErrorProcesamiento, match="TOTALES POR TASA.*Tasa 21%"):
+        control_de([("Tasa 21%", [900, 190, 1090]), PIE[1]], exigir_totales=True)
+
+
+def test_libro_sin_pie():
+    # Sin pie no hay contra qué controlar, ni siquiera exigiendo los totales
+    control = control_de(None, exigir_totales=True)
+
+    assert list(control.index) == ["Tasa 21%", "T.10.5%"]
+    assert (control["Estado"] == ESTADO_SIN_TOTALES).all()
+    assert (control["Difiere en"] == "").all()
+    assert (control["Total Totales"] == 0).all()
+    assert control.loc["T.10.5%", "Total Movimientos"] == pytest.approx(221)
+    assert estado_control_totales(control) == ESTADO_SIN_TOTALES
+    assert estado_control_totales(None) == ESTADO_SIN_TOTALES
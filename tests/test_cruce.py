@@ -0,0 +1,228 @@
+"""Pruebas del cruce por PV-Nro y de las diferencias de tipo, CUIT e importes."""
+
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generar_datos import linea_movimiento, region_importes
+from conftest import armar_txt, comprobante
+from procesador import cruzar_comprobantes, procesar_archivo
+
+CUIT = "30-12345678-9"
+OTRO_CUIT = "20-87654321-0"
+
+
+def libro_de(*movimientos):
+    """Parsea un TXT con los movimientos (comprobante, [(tasa, importes), ...])"""
+    cuerpo = []
+    for campos, lineas in movimientos:
+        (tasa, importes), *resto = lineas
+        cuerpo.append(linea_movimiento(campos, region_importes(tasa, importes)))
+        cuerpo.extend(" " * 70 + region_importes(tasa, imp) for tasa, imp in resto)
+    _, libro = procesar_archivo(BytesIO(armar_txt(cuerpo)))
+    return libro
+
+
+def arca_de(*filas):
+    """DataFrame de ARCA como el de procesar_zip_csv, solo con las columnas usadas"""
+    columnas = {
+        "Tipo de Comprobante": "1",
+        "Punto de Venta": 1,
+        "Nro. Doc. Emisor/Receptor": CUIT.replace("-", ""),
+        "Tipo Cambio": 1.0,
+        "Moneda": "PES",
+        "IVA": 0.0,
+    }
+    df = pd.DataFrame([{**columnas, **fila} for fila in filas])
+    return df.astype(
+        {
+            "Punto de Venta": "Int64",
+            "Número de Comprobante": "Int64",
+            "Tipo de Comprobante": "category",
+        }
+    )
+
+
+def diferencias(libro, df_arca, tolerancia=1.0):
+    cruce = cruzar_comprobantes(
+        libro.movimientos,
+        df_arca,
+        importes_mendez=libro.importes,
+        tolerancia=tolerancia,
+    )
+    return cruce, cruce.diferencias.set_index("Nro")
+
+
+def factura(nro, **campos):
+    """Factura A con neto 1000, IVA 210 y total 1210"""
+    return comprobante(nro, cuit=CUIT, **campos), [("Tasa 21%", [1000, 210, 1210])]
+
+
+def iguales(nro, **campos):
+    """Fila de ARCA con los mismos importes que factura(nro)"""
+    return {
+        "Número de Comprobante": nro,
+        "Imp. Neto Gravado": 1000.0,
+        "IVA": 210.0,
+        "Imp. Total": 1210.0,
+        **campos,
+    }
+
+
+def test_importe_en_el_limite_de_la_tolerancia():
+    libro = libro_de(factura(1), factura(2))
+    df_arca = arca_de(
+        # Justo en la tolerancia: no difiere
+        iguales(1, **{"Imp. Neto Gravado": 1001.0, "Imp. Total": 1211.0}),
+        # Un centavo más allá: difieren el neto y el total
+        iguales(2, **{"Imp. Neto Gravado": 1001.01, "Imp. Total": 1211.01}),
+    )
+
+    _, tabla = diferencias(libro, df_arca, tolerancia=1.0)
+
+    assert list(tabla.index) == ["00000002"]
+    fila = tabla.loc["00000002"]
+    assert fila["Difiere en"] == "Neto, Total"
+    assert fila["Diferencia Neto"] == pytest.approx(-1.01)
+    assert fila["Diferencia IVA"] == 0
+    assert fila["Neto Mendez"] == 1000
+    assert fila["Total ARCA"] == pytest.approx(1211.01)
+
+    # Con tolerancia 0 también difiere el que estaba justo en el límite
+    _, tabla = diferencias(libro, df_arca, tolerancia=0)
+    assert list(tabla.index) == ["00000001", "00000002"]
+
+
+def test_diferencia_de_tipo_y_de_cuit():
+    libro = libro_de(factura(1), factura(2), factura(3))
+    df_arca = arca_de(
+        # Factura B en ARCA para una factura A de Mendez
+        iguales(1, **{"Tipo de Comprobante": "6"}),
+        iguales(2, **{"Nro. Doc. Emisor/Receptor": OTRO_CUIT.replace("-", "")}),
+        iguales(3),
+    )
+
+    cruce, tabla = diferencias(libro, df_arca)
+
+    assert len(cruce.coincidentes) == 3
+    assert tabla["Difiere en"].to_dict() == {"00000001": "Tipo", "00000002": "CUIT"}
+    assert tabla.loc["00000001", "Tipo ARCA"] == "6"
+    assert tabla.loc["00000002", "CUIT Mendez"] == CUIT
+    assert tabla.loc["00000002", "CUIT ARCA"] == OTRO_CUIT.replace("-", "")
+
+
+def test_mismo_pv_nro_de_dos_proveedores():
+    # En Compras dos proveedores pueden tener el mismo PV-Nro
+    # (no seguidos: dos líneas seguidas con el mismo PV-Nro son un movimiento)
+    otro = comprobante(7, cuit=OTRO_CUIT), [("Tasa 21%", [2000, 420, 2420])]
+    libro = libro_de(factura(7), factura(8), otro)
+    df_arca = arca_de(
+        iguales(7),
+        iguales(8),
+        {
+            "Número de Comprobante": 7,
+            "Nro. Doc. Emisor/Receptor": OTRO_CUIT.replace("-", ""),
+            "Imp. Neto Gravado": 2000.0,
+            "IVA": 420.0,
+            "Imp. Total": 2420.0,
+        },
+    )
+
+    cruce, tabla = diferencias(libro, df_arca)
+
+    # El merge por PV-Nro arma cuatro pares del 7, pero los cruzados entre
+    # proveedores se descartan porque cada uno tiene su par completo
+    assert len(cruce.coincidentes) == 5
+    assert tabla.empty
+
+
+def test_par_sin_clave_completa_se_informa_si_no_hay_otro():
+    libro = libro_de(factura(7))
+    df_arca = arca_de(
+        iguales(7, **{"Nro. Doc. Emisor/Receptor": OTRO_CUIT.replace("-", "")})
+    )
+
+    _, tabla = diferencias(libro, df_arca)
+
+    assert tabla["Difiere en"].tolist() == ["CUIT"]
+
+
+def test_importes_de_mendez_suman_sus_tasas():
+    # Neto e IVA salen de las tasas con IVA; el exento solo suma al total
+    nc = comprobante(2, "NC", cuit=CUIT)
+    libro = libro_de(
+        (
+            comprobante(1, cuit=CUIT),
+            [
+                ("Tasa 21%", [1000, 210, 1210]),
+                ("T.10.5%", [100, 10.5, 110.5]),
+                ("Exento", [50, 50]),
+            ],
+        ),
+        (nc, [("Tasa 21%", [500, 105, 605])]),
+    )
+    df_arca = arca_de(
+        {
+            "Número de Comprobante": 1,
+            "Imp. Neto Gravado": 1100.0,
+            "IVA": 220.5,
+            "Imp. Total": 1370.5,
+        },
+        # ARCA informa la NC en positivo y Mendez la resta
+        {
+            "Tipo de Comprobante": "3",
+            "Número de Comprobante": 2,
+            "Imp. Neto Gravado": 500.0,
+            "IVA": 105.0,
+            "Imp. Total": 605.0,
+        },
+    )
+
+    _, tabla = diferencias(libro, df_arca, tolerancia=0)
+
+    assert tabla.empty
+
+
+def test_comprobante_en_moneda_extranjera():
+    libro = libro_de(factura(1), factura(2), factura(3))
+    df_arca = arca_de(
+        # En dólares, con el tipo de cambio del día
+        {
+            "Número de Comprobante": 1,
+            "Moneda": "DOL",
+            "Tipo Cambio": 1000.0,
+            "Imp. Neto Gravado": 1.0,
+            "IVA": 0.21,
+            "Imp. Total": 1.21,
+        },
+        # Sin tipo de cambio se toma 1
+        iguales(2, **{"Tipo Cambio": np.nan}),
+        {
+            "Número de Comprobante": 3,
+            "Moneda": "DOL",
+            "Tipo Cambio": 1000.0,
+            "Imp. Neto Gravado": 1.1,
+            "IVA": 0.21,
+            "Imp. Total": 1.31,
+        },
+    )
+
+    _, tabla = diferencias(libro, df_arca)
+
+    assert list(tabla.index) == ["00000003"]
+    assert tabla.loc["00000003", "Neto ARCA"] == pytest.approx(1100)
+    assert tabla.loc["00000003", "Difiere en"] == "Neto, Total"
+
+
+def test_faltantes_de_cada_lado():
+    libro = libro_de(factura(1), factura(2))
+    df_arca = arca_de(iguales(2), iguales(3))
+
+    cruce, tabla = diferencias(libro, df_arca)
+
+    assert cruce.mendez_no_en_arca["Nro"].tolist() == ["00000001"]
+    assert cruce.arca_no_en_mendez["Número de Comprobante"].tolist() == ["00000003"]
+    assert cruce.coincidentes["clave"].tolist() == ["00001-00000002"]
+    assert tabla.empty
@@ -0,0 +1,130 @@
+"""Pruebas de la exportación de las mediciones por etapa."""
+
+import json
+import os
+
+import pytest
+
+import diagnostico
+from diagnostico import (
+    RegistroEtapas,
+    a_json_lines,
+    a_prometheus,
+    escribir_prometheus,
+    medir_etapa,
+)
+
+
+def medicion(etapa, **valores):
+    """Medición con los campos de RegistroEtapas.etapa, en None salvo los indicados"""
+    return {
+        "etapa": etapa,
+        "segundos": None,
+        "filas": None,
+        "bytes_entrada": None,
+        "bytes_salida": None,
+        "pico_bytes": None,
+        **valores,
+    }
+
+
+@pytest.fixture
+def registro():
+    registro = RegistroEtapas()
+    registro.etapas = [
+        medicion("lectura_txt", segundos=0.5, filas=120, bytes_entrada=4096),
+        medicion("cruce", segundos=0.25, filas=100, archivo='01\\"2024"\nB.txt'),
+    ]
+    return registro
+
+
+def test_prometheus_con_etiquetas(registro):
+    texto = a_prometheus(registro, cliente="ACME")
+
+    assert texto.endswith("\n")
+    assert "# TYPE cruce_arca_etapa_segundos gauge" in texto
+    assert (
+        'cruce_arca_etapa_segundos{cliente="ACME",etapa="lectura_txt"} 0.5' in texto
+    )
+    # Barras, comillas y saltos de línea se escapan dentro del valor
+    assert (
+        'cruce_arca_etapa_filas{cliente="ACME",etapa="cruce",'
+        'archivo="01\\\\\\"2024\\" B.txt"} 100'
+    ) in texto
+
+
+def test_prometheus_omite_los_valores_en_none(registro):
+    texto = a_prometheus(registro)
+
+    # Solo lectura_txt midió bytes de entrada
+    lineas_bytes = [
+        linea
+        for linea in texto.splitlines()
+        if linea.startswith("cruce_arca_etapa_bytes_entrada{")
+    ]
+    assert lineas_bytes == ['cruce_arca_etapa_bytes_entrada{etapa="lectura_txt"} 4096']
+    # Nadie midió bytes de salida ni memoria: esas métricas no aparecen
+    assert "bytes_salida" not in texto
+    assert "pico_memoria_bytes" not in texto
+    assert "None" not in texto
+
+
+def test_prometheus_de_registro_vacio():
+    assert a_prometheus(RegistroEtapas()) == ""
+
+
+def test_json_lines_una_por_etapa(registro):
+    lineas = a_json_lines(registro, cliente="ACME").splitlines()
+
+    assert len(lineas) == 2
+    datos = [json.loads(linea) for linea in lineas]
+    assert [dato["etapa"] for dato in datos] == ["lectura_txt", "cruce"]
+    assert all(dato["cliente"] == "ACME" and "fecha" in dato for dato in datos)
+    assert datos[0]["filas"] == 120
+    assert datos[0]["pico_bytes"] is None
+
+
+def test_escribir_prometheus_reemplaza_el_textfile(registro, tmp_path):
+    ruta = tmp_path / "cruce.prom"
+    ruta.write_text("viejo\n")
+
+    escribir_prometheus(ruta, registro)
+
+    assert ruta.read_text(encoding="utf-8") == a_prometheus(registro)
+    assert os.listdir(tmp_path) == ["cruce.prom"]
+
+
+def test_escribir_prometheus_fallido_no_deja_temporales(
+    registro, tmp_path, monkeypatch
+):
+    ruta = tmp_path / "cruce.prom"
+    ruta.write_text("viejo\n")
+
+    def falla(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(diagnostico, "a_prometheus", falla)
+    with pytest.raises(OSError):
+        escribir_prometheus(ruta, registro)
+
+    assert os.listdir(tmp_path) == ["cruce.prom"]
+    assert ruta.read_text() == "viejo\n"
+
+
+def test_medir_etapa_sin_registro_no_evalua_los_bytes():
+    def no_llamar():
+        raise AssertionError("bytes_entrada se evaluó sin registro")
+
+    with medir_etapa(None, "cruce", bytes_entrada=no_llamar) as datos:
+        datos["filas"] = 3
+
+
+def test_medir_etapa_registra_filas(registro):
+    with medir_etapa(registro, "exportacion", bytes_entrada=lambda: 10) as datos:
+        datos["filas"] = 3
+
+    ultima = registro.etapas[-1]
+    assert ultima["etapa"] == "exportacion"
+    assert ultima["filas"] == 3
+    assert ultima["bytes_entrada"] == 10
+    assert ultima["segundos"] >= 0
@@ -0,0 +1,275 @@
+"""Pruebas de la exportación del consolidado."""
+
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import procesador
+
+from libro_excel import FORMATO_MONEDA
+from procesador import (
+    COLUMNA_PERIODO,
+    FORMATO_CSV,
+    FORMATO_PARQUET,
+    FORMATO_XLSX,
+    HOJA_CONTROL_TOTALES,
+    HOJA_SUGERENCIAS,
+    combinar_libros,
+    crear_archivo_consolidado,
+    crear_archivo_excel,
+    cruzar_comprobantes,
+    formato_ancho,
+    formatos_disponibles,
+    hojas_consolidado,
+    partir_hoja,
+    procesar_archivo,
+    procesar_zip_csv,
+)
+from sugerencias import sugerir_coincidencias
+
+
+def cruce_de_prueba(generar_libro, generar_zip_arca, movimientos, cambiados=0):
+    """Cruza un libro generado con su ZIP, con Nro corridos en los primeros de ARCA"""
+    txt, comprobantes = generar_libro(movimientos)
+    en_arca = [dict(comprobante) for comprobante in comprobantes]
+    for comprobante in en_arca[:cambiados]:
+        comprobante["nro"] += 1
+    df_encabezado, libro = procesar_archivo(BytesIO(txt))
+    df_arca = procesar_zip_csv(BytesIO(generar_zip_arca(en_arca)))
+    cruce = cruzar_comprobantes(
+        libro.movimientos, df_arca, importes_mendez=libro.importes
+    )
+    return df_encabezado, libro, cruce
+
+
+def formatos_por_columna(contenido, hoja):
+    """Devuelve {título: formato numérico de la primera fila} de una hoja del xlsx"""
+    ws = load_workbook(BytesIO(contenido), read_only=True)[hoja]
+    titulos, primera = ws.iter_rows(min_row=1, max_row=2)
+    return {
+        titulo.value: celda.number_format for titulo, celda in zip(titulos, primera)
+    }
+
+
+def consolidado_de_prueba(cruce, libro, formato):
+    """Devuelve (bytes del consolidado, hojas que debería tener) del cruce"""
+    tablas = (
+        cruce.mendez,
+        cruce.arca,
+        cruce.arca_no_en_mendez,
+        cruce.mendez_no_en_arca,
+        libro.importes,
+    )
+    contenido = crear_archivo_consolidado(
+        *tablas, formato=formato, diferencias=cruce.diferencias
+    )
+    return contenido, hojas_consolidado(*tablas, diferencias=cruce.diferencias)
+
+
+@pytest.mark.parametrize("formato", formatos_disponibles())
+def test_libro_sin_movimientos_se_exporta(generar_libro, generar_zip_arca, formato):
+    # Un mes vacío: el TXT no tiene movimientos y el ZIP no tiene comprobantes
+    df_encabezado, libro, cruce = cruce_de_prueba(generar_libro, generar_zip_arca, 0)
+
+    assert libro.movimientos.empty
+    assert list(formato_ancho(libro.movimientos, libro.importes).columns) == list(
+        libro.movimientos.columns
+    )
+    contenido = crear_archivo_consolidado(
+        cruce.mendez,
+        cruce.arca,
+        cruce.arca_no_en_mendez,
+        cruce.mendez_no_en_arca,
+        libro.importes,
+        formato=formato,
+        diferencias=cruce.diferencias,
+    )
+    assert contenido
+    assert crear_archivo_excel(df_encabezado, libro)
+
+
+def test_hoja_de_sugerencias_con_moneda_solo_en_los_importes(
+    generar_libro, generar_zip_arca
+):
+    _, libro, cruce = cruce_de_prueba(
+        generar_libro, generar_zip_arca, 300, cambiados=20
+    )
+    sugerencias = sugerir_coincidencias(
+        cruce.mendez_no_en_arca, cruce.arca_no_en_mendez
+    )
+    assert not sugerencias.empty
+
+    contenido = crear_archivo_consolidado(
+        cruce.mendez,
+        cruce.arca,
+        cruce.arca_no_en_mendez,
+        cruce.mendez_no_en_arca,
+        libro.importes,
+        hojas_adicionales={HOJA_SUGERENCIAS: sugerencias},
+        formato=FORMATO_XLSX,
+    )
+    formatos = formatos_por_columna(contenido, HOJA_SUGERENCIAS)
+    importes = {"Total Mendez", "Total ARCA"}
+    assert {col for col, formato in formatos.items() if formato == FORMATO_MONEDA} == (
+        importes
+    )
+
+
+@pytest.mark.parametrize("libros", [1, 2])
+def test_hoja_de_control_con_moneda_solo_en_los_importes(
+    generar_libro, generar_zip_arca, libros
+):
+    _, libro, cruce = cruce_de_prueba(generar_libro, generar_zip_arca, 300)
+    control = libro.control
+    if libros > 1:
+        # Con varios libros la hoja suma la columna Periodo a la izquierda
+        control = combinar_libros([libro] * libros, ["01/2024", "02/2024"]).control
+    assert control is not None and not control.empty
+
+    contenido = crear_archivo_consolidado(
+        cruce.mendez,
+        cruce.arca,
+        cruce.arca_no_en_mendez,
+        cruce.mendez_no_en_arca,
+        libro.importes,
+        hojas_adicionales={HOJA_CONTROL_TOTALES: control},
+        formato=FORMATO_XLSX,
+    )
+    formatos = formatos_por_columna(contenido, HOJA_CONTROL_TOTALES)
+    importes = set(control.columns) - {COLUMNA_PERIODO, "Tasa", "Estado", "Difiere en"}
+    assert len(importes) == 9
+    assert {col for col, formato in formatos.items() if formato == FORMATO_MONEDA} == (
+        importes
+    )
+
+
+# ============================================================================
+# HOJAS PARTIDAS Y FORMATOS POR BLOQUES
+# ============================================================================
+
+
+def test_partir_hoja_en_partes_con_nombre_corto(monkeypatch):
+    monkeypatch.setattr(procesador, "MAX_FILAS_HOJA", 4)
+    nombre = "COMPROBANTES CON NOMBRE MUY LARGO"
+    df = pd.DataFrame({"Nro": range(10)})
+
+    partes = list(partir_hoja(nombre, df))
+
+    assert [nombre for nombre, _ in partes] == [
+        "COMPROBANTES CON NOMBRE MUY LAR",
+        "COMPROBANTES CON NOMBRE MUY (2)",
+        "COMPROBANTES CON NOMBRE MUY (3)",
+    ]
+    assert all(len(nombre) <= 31 for nombre, _ in partes)
+    assert [len(parte) for _, parte in partes] == [4, 4, 2]
+    pd.testing.assert_frame_equal(pd.concat(parte for _, parte in partes), df)
+    # Una hoja vacía se escribe igual, con sus títulos
+    assert [len(parte) for _, parte in partir_hoja(nombre, df.head(0))] == [0]
+
+
+def test_excel_parte_las_hojas_grandes(generar_libro, generar_zip_arca, monkeypatch):
+    monkeypatch.setattr(procesador, "MAX_FILAS_HOJA", 50)
+    _, libro, cruce = cruce_de_prueba(generar_libro, generar_zip_arca, 120)
+
+    contenido, hojas = consolidado_de_prueba(cruce, libro, FORMATO_XLSX)
+
+    wb = load_workbook(BytesIO(contenido), read_only=True)
+    esperadas = {
+        nombre: [nombre]
+        + [f"{nombre} ({i})" for i in range(2, -(-len(df) // 50) + 1)]
+        for nombre, df in hojas.items()
+    }
+    assert wb.sheetnames == [hoja for partes in esperadas.values() for hoja in partes]
+    assert len(esperadas["Mendez"]) > 1
+
+    for nombre, df in hojas.items():
+        titulos = []
+        filas = []
+        for hoja in esperadas[nombre]:
+            primera, *resto = wb[hoja].iter_rows(values_only=True)
+            titulos.append(list(primera))
+            filas.extend(resto)
+        # Cada parte repite los títulos y entre todas tienen todas las filas
+        assert titulos == [list(df.columns)] * len(esperadas[nombre])
+        assert len(filas) == len(df)
+        assert [fila[0] for fila in filas] == df.iloc[:, 0].tolist()
+
+
+def es_numero(serie):
+    """Columnas que el CSV guarda como números"""
+    return pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(
+        serie
+    )
+
+
+def leer_csv_consolidado(z, nombre, esperado):
+    """Lee un CSV del consolidado con el tipo de cada columna del DataFrame"""
+    texto = [col for col in esperado.columns if not es_numero(esperado[col])]
+    with z.open(f"{nombre}.csv") as f:
+        leido = pd.read_csv(
+            f,
+            sep=";",
+            decimal=",",
+            encoding="utf-8-sig",
+            dtype={col: str for col in texto},
+            keep_default_na=False,
+        )
+    for col in texto:
+        if pd.api.types.is_datetime64_any_dtype(esperado[col]):
+            leido[col] = pd.to_datetime(leido[col])
+    return leido
+
+
+def como_texto(df):
+    """Pasa a texto las columnas no numéricas, como quedan al leer el CSV"""
+    df = df.reset_index(drop=True).copy()
+    for col in df.columns:
+        if not es_numero(df[col]) and not pd.api.types.is_datetime64_any_dtype(
+            df[col]
+        ):
+            df[col] = df[col].astype(object).where(df[col].notna(), "").astype(str)
+    return df
+
+
+def test_csv_por_bloques_conserva_los_valores(
+    generar_libro, generar_zip_arca, monkeypatch
+):
+    # Bloques chicos para que cada CSV se escriba en varias partes
+    monkeypatch.setattr(procesador, "FILAS_POR_BLOQUE", 7)
+    _, libro, cruce = cruce_de_prueba(generar_libro, generar_zip_arca, 120)
+
+    contenido, hojas = consolidado_de_prueba(cruce, libro, FORMATO_CSV)
+
+    with zipfile.ZipFile(BytesIO(contenido)) as z:
+        assert z.namelist() == [f"{nombre}.csv" for nombre in hojas]
+        for nombre, df in hojas.items():
+            pd.testing.assert_frame_equal(
+                leer_csv_consolidado(z, nombre, df),
+                como_texto(df),
+                check_dtype=False,
+                obj=nombre,
+            )
+
+
+@pytest.mark.skipif(
+    FORMATO_PARQUET not in formatos_disponibles(), reason="Falta pyarrow"
+)
+def test_parquet_por_grupos_conserva_los_valores(
+    generar_libro, generar_zip_arca, monkeypatch
+):
+    monkeypatch.setattr(procesador, "FILAS_POR_GRUPO_PARQUET", 7)
+    _, libro, cruce = cruce_de_prueba(generar_libro, generar_zip_arca, 120)
+
+    contenido, hojas = consolidado_de_prueba(cruce, libro, FORMATO_PARQUET)
+
+    with zipfile.ZipFile(BytesIO(contenido)) as z:
+        assert z.namelist() == [f"{nombre}.parquet" for nombre in hojas]
+        for nombre, df in hojas.items():
+            with z.open(f"{nombre}.parquet") as f:
+                leido = pd.read_parquet(BytesIO(f.read()))
+            pd.testing.assert_frame_equal(
+                leido, df.reset_index(drop=True), check_categorical=False, obj=nombre
+            )
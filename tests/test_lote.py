@@ -0,0 +1,85 @@
+"""Pruebas del cruce por lotes sin la interfaz."""
+
+import os
+
+import pandas as pd
+import pytest
+
+import lote
+from lote import NOMBRE_RESUMEN, main, procesar_cliente
+from procesador import formatos_disponibles
+
+
+def escribir_cliente(carpeta, cliente, txt, zip_bytes):
+    """Deja el par <cliente>.txt / <cliente>.zip en la carpeta del lote"""
+    (carpeta / f"{cliente}.txt").write_bytes(txt)
+    (carpeta / f"{cliente}.zip").write_bytes(zip_bytes)
+
+
+def test_cliente_con_error_no_frena_el_lote(generar_libro, generar_zip_arca, tmp_path):
+    entrada = tmp_path / "entrada"
+    salida = tmp_path / "salida"
+    entrada.mkdir()
+    txt, comprobantes = generar_libro(200)
+    escribir_cliente(entrada, "bueno", txt, generar_zip_arca(comprobantes))
+    # El ZIP del otro cliente está roto
+    escribir_cliente(entrada, "roto", txt, b"esto no es un zip")
+
+    assert main([str(entrada), "--salida", str(salida), "--procesos", "2"]) == 1
+
+    resumen = pd.read_csv(
+        salida / NOMBRE_RESUMEN, sep=";", dtype=str, keep_default_na=False
+    ).set_index("cliente")
+    assert resumen.loc["bueno", "estado"] == "ok"
+    assert resumen.loc["bueno", "error"] == ""
+    assert resumen.loc["bueno", "movimientos_mendez"] != ""
+    assert resumen.loc["roto", "estado"] == "error"
+    assert "BadZipFile" in resumen.loc["roto", "error"]
+    assert resumen.loc["roto", "consolidado"] == ""
+    assert sorted(os.listdir(salida)) == ["bueno.xlsx", NOMBRE_RESUMEN]
+
+
+def test_consolidado_a_medio_escribir_no_queda(
+    generar_libro, generar_zip_arca, tmp_path, monkeypatch
+):
+    txt, comprobantes = generar_libro(200)
+    escribir_cliente(tmp_path, "cliente", txt, generar_zip_arca(comprobantes))
+    salida = tmp_path / "salida"
+    salida.mkdir()
+
+    def falla_a_mitad(*args, destino, **kwargs):
+        destino.write(b"PK parcial")
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(lote, "crear_archivo_consolidado", falla_a_mitad)
+    fila = procesar_cliente(
+        "cliente", str(tmp_path / "cliente.txt"), str(tmp_path / "cliente.zip"), salida
+    )
+
+    assert fila["estado"] == "error"
+    assert "disco lleno" in fila["error"]
+    assert os.listdir(salida) == []
+
+
+@pytest.mark.parametrize("formato", formatos_disponibles())
+def test_consolidado_se_escribe_con_su_sufijo(
+    generar_libro, generar_zip_arca, tmp_path, formato
+):
+    txt, comprobantes = generar_libro(100)
+    escribir_cliente(tmp_path, "cliente", txt, generar_zip_arca(comprobantes))
+    salida = tmp_path / "salida"
+    salida.mkdir()
+
+    fila = procesar_cliente(
+        "cliente",
+        str(tmp_path / "cliente.txt"),
+        str(tmp_path / "cliente.zip"),
+        salida,
+        formato=formato,
+    )
+
+    assert fila["estado"] == "ok", fila["error"]
+    nombre = "cliente" + lote.SUFIJOS_FORMATO[formato]
+    assert os.listdir(salida) == [nombre]
+    assert fila["consolidado"] == os.path.join(salida, nombre)
+    assert os.path.getsize(fila["consolidado"]) > 0
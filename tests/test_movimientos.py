@@ -0,0 +1,50 @@
+"""Pruebas del armado de la tabla de movimientos a partir del parseo."""
+
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from procesador import (
+    combinar_movimientos_duplicados,
+    crear_dataframe_movimientos,
+    formato_ancho,
+    parsear_txt,
+)
+
+CLAVE = ["Nro", "PV", "Razon Social"]
+
+
+def combinar_fila_por_fila(df, columnas):
+    """Versión original: suma cada fila con la misma clave que la anterior"""
+    resultado = []
+    fila_actual = df.iloc[0].copy()
+    for i in range(1, len(df)):
+        fila_siguiente = df.iloc[i]
+        if all(fila_actual[campo] == fila_siguiente[campo] for campo in CLAVE):
+            fila_actual[columnas] += fila_siguiente[columnas]
+        else:
+            resultado.append(fila_actual)
+            fila_actual = fila_siguiente.copy()
+    resultado.append(fila_actual)
+    return pd.DataFrame(resultado).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("semilla, operacion", [(0, "Ventas"), (7, "Compras")])
+def test_combinar_equivale_al_recorrido_fila_por_fila(
+    generar_libro, semilla, operacion
+):
+    # El generador parte a veces un comprobante en dos entradas seguidas
+    contenido, _ = generar_libro(3000, semilla=semilla, operacion=operacion)
+    _, acumulador = parsear_txt(BytesIO(contenido))
+    libro = crear_dataframe_movimientos(acumulador)
+
+    sin_combinar = formato_ancho(libro.movimientos, libro.importes)
+    columnas = list(sin_combinar.columns[len(libro.movimientos.columns) :])
+    esperado = combinar_fila_por_fila(sin_combinar, columnas)
+    assert len(esperado) < len(sin_combinar)
+
+    combinado = combinar_movimientos_duplicados(libro)
+    obtenido = formato_ancho(combinado.movimientos, combinado.importes)
+    obtenido = obtenido[list(esperado.columns)]
+    pd.testing.assert_frame_equal(obtenido, esperado.astype(obtenido.dtypes))
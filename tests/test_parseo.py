@@ -0,0 +1,201 @@
+"""Pruebas del parseo del TXT de Mendez."""
+
+import random
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from benchmarks.generar_datos import linea_movimiento, region_importes
+from conftest import armar_txt, comprobante
+from procesador import (
+    FIN_CUERPO,
+    LECTURA_LINEAS,
+    LECTURA_MAPEADA,
+    crear_dataframe_movimientos,
+    parsear_txt,
+    parsear_txt_en_paralelo,
+    parsear_txt_mapeado,
+    procesar_archivo,
+)
+
+# Formas de parsear que deben dar el mismo resultado: (lectura, procesos)
+PARSERS = {
+    "lineas": (LECTURA_LINEAS, 1),
+    "mapeada": (LECTURA_MAPEADA, 1),
+    "paralelo": (LECTURA_MAPEADA, 2),
+}
+
+
+def parsear(contenido, parser):
+    lectura, procesos = PARSERS[parser]
+    return procesar_archivo(BytesIO(contenido), procesos=procesos, lectura=lectura)
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_operacion_del_encabezado_vale_para_el_cuerpo(parser):
+    # El cuerpo no repite "IVA VENTAS": el monotributo discrimina IVA igual
+    cuerpo = [
+        linea_movimiento(
+            comprobante(1), region_importes("R.Monot21", [1000, 210, 1210])
+        ),
+    ]
+    _, libro = parsear(armar_txt(cuerpo), parser)
+
+    importes = libro.importes
+    assert importes["con_iva"].tolist() == [True]
+    assert importes["iva"].tolist() == [21000]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_operacion_por_seccion(parser):
+    # Cada movimiento usa la operación de la última marca anterior a su línea
+    cuerpo = [
+        "-" * 132,
+        "Fe Cp PV    Numero   L Razon Social  IVA VENTAS",
+        "--",
+        linea_movimiento(
+            comprobante(1), region_importes("R.Monot21", [1000, 210, 1210])
+        ),
+        "-" * 132,
+        "Fe Cp PV    Numero   L Razon Social  IVA COMPRAS",
+        "--",
+        linea_movimiento(comprobante(2), region_importes("R.Monot21", [500, 500])),
+    ]
+    _, libro = parsear(armar_txt(cuerpo), parser)
+
+    importes = libro.importes.sort_values("movimiento")
+    assert importes["con_iva"].tolist() == [True, False]
+    assert importes["neto"].tolist() == [100000, 50000]
+    assert importes["iva"].tolist() == [21000, 0]
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_lineas_repetidas_de_monotributo_en_compras_se_suman(parser):
+    cuerpo = [
+        "Fe Cp PV    Numero   L Razon Social  IVA COMPRAS",
+        linea_movimiento(comprobante(1), region_importes("R.Monot21", [500, 500])),
+        " " * 70 + region_importes("R.Monot21", [250.5, 250.5]),
+        " " * 70 + region_importes("Exento", [100, 100]),
+    ]
+    _, libro = parsear(armar_txt(cuerpo, libro="LIBRO  IVA COMPRAS"), parser)
+
+    importes = libro.importes.set_index("tasa")
+    assert importes.loc["R.Monot21", "neto"] == 75050
+    assert importes.loc["R.Monot21", "iva"] == 0
+    assert libro.movimientos["Total"].tolist() == [85050]
+
+
+def test_libro_de_compras_coincide_con_sus_totales(generar_libro):
+    # El generador repite a veces la misma tasa en un movimiento
+    contenido, _ = generar_libro(2000, semilla=3, operacion="Compras")
+    _, libro = procesar_archivo(BytesIO(contenido), procesos=1, exigir_totales=True)
+    assert (libro.control["Estado"] == "OK").all()
+
+
+# ============================================================================
+# EQUIVALENCIA ENTRE PARSERS
+# ============================================================================
+
+
+SALTO_PAGINA = [b"-" * 132, b"Fe Cp PV    Numero   L Razon Social", b"--"]
+
+
+def desordenar(contenido, semilla):
+    """Agrega a un TXT generado los casos que complican cortarlo en bloques.
+
+    Saltos de página entre un movimiento y sus líneas de continuación,
+    secuencias de escape y caracteres de control en medio de una línea,
+    razones sociales en UTF-8 y Latin-1, marcas de operación en los títulos
+    de página, saltos de línea sin \\r y, a veces, una línea corta que
+    termina el cuerpo antes de tiempo o la falta del pie de totales.
+    """
+    rnd = random.Random(semilla)
+    lineas = contenido.split(b"\r\n")
+    cuerpo, resto = lineas[:9], lineas[9:]
+    for linea in resto:
+        sorteo = rnd.random()
+        if linea.startswith(b" " * 70) and sorteo < 0.3:
+            cuerpo.extend(SALTO_PAGINA)
+        elif linea.startswith(b"\x1b[0m") and sorteo < 0.05:
+            linea = linea[:30] + b"\x1b[1m" + linea[30:]
+        elif linea.startswith(b"\x1b[0m") and sorteo < 0.1:
+            linea = linea[:40] + b"\x07" + linea[40:]
+        elif linea.startswith(b"\x1b[0m") and sorteo < 0.15:
+            linea = linea[:30] + "Ñ".encode("utf-8") + linea[32:]
+        elif linea.startswith(b"\x1b[0m") and sorteo < 0.2:
+            linea = linea[:30] + "Ñ".encode("latin-1") + linea[31:]
+        elif linea.startswith(b"\x1b[0m") and sorteo < 0.22:
+            # Espacio duro de Latin-1, que str.strip quita y bytes.strip no
+            linea = linea[:30] + b"\xa0" + linea[31:]
+        elif linea.startswith(b"Fe Cp") and sorteo < 0.3:
+            linea += rnd.choice((b"  IVA COMPRAS", b"  IVA VENTAS"))
+        cuerpo.append(linea)
+
+    if rnd.random() < 0.3:
+        cuerpo.insert(rnd.randrange(9, len(cuerpo)), b"")
+    contenido = b"\r\n".join(cuerpo)
+    if rnd.random() < 0.3:
+        contenido = contenido.replace(b"\r\n", b"\n")
+    if rnd.random() < 0.2:
+        contenido = contenido[: contenido.find(FIN_CUERPO)]
+    return contenido
+
+
+def parseo_en_serie(contenido):
+    return parsear_txt(BytesIO(contenido))
+
+
+def parseo_en_paralelo(procesos):
+    return lambda contenido: parsear_txt_en_paralelo(BytesIO(contenido), procesos)
+
+
+PARSEOS = {
+    "mapeado": lambda contenido: parsear_txt_mapeado(BytesIO(contenido)),
+    "paralelo_2": parseo_en_paralelo(2),
+    "paralelo_5": parseo_en_paralelo(5),
+}
+
+
+@pytest.mark.parametrize("parseo", PARSEOS)
+@pytest.mark.parametrize("semilla", range(8))
+def test_parseo_igual_al_serie(generar_libro, parseo, semilla):
+    contenido, _ = generar_libro(400, semilla=semilla)
+    contenido = desordenar(contenido, semilla)
+
+    encabezado, acumulador = parseo_en_serie(contenido)
+    esperado = crear_dataframe_movimientos(acumulador)
+    obtenido_encabezado, obtenido = PARSEOS[parseo](contenido)
+    obtenido = crear_dataframe_movimientos(obtenido)
+
+    assert obtenido_encabezado == encabezado
+    pd.testing.assert_frame_equal(obtenido.movimientos, esperado.movimientos)
+    pd.testing.assert_frame_equal(obtenido.importes, esperado.importes)
+
+
+@pytest.mark.parametrize("parseo", PARSEOS)
+def test_parseo_de_libro_vacio_igual_al_serie(generar_libro, parseo):
+    contenido, _ = generar_libro(0)
+    esperado = crear_dataframe_movimientos(parseo_en_serie(contenido)[1])
+    obtenido = crear_dataframe_movimientos(PARSEOS[parseo](contenido)[1])
+
+    pd.testing.assert_frame_equal(obtenido.movimientos, esperado.movimientos)
+    pd.testing.assert_frame_equal(obtenido.importes, esperado.importes)
+    # Sin filas las categorías tienen que seguir siendo de texto
+    for df in (obtenido.movimientos, obtenido.importes):
+        for columna in df.select_dtypes("category"):
+            assert pd.api.types.is_string_dtype(df[columna].cat.categories)
+
+
+def test_parseo_mapeado_desde_ruta(generar_libro, tmp_path):
+    # Desde una ruta el parseo mapeado trabaja sobre un mmap del archivo
+    contenido, _ = generar_libro(400, semilla=11)
+    contenido = desordenar(contenido, 11)
+    ruta = tmp_path / "libro.txt"
+    ruta.write_bytes(contenido)
+
+    esperado = crear_dataframe_movimientos(parseo_en_serie(contenido)[1])
+    obtenido = crear_dataframe_movimientos(parsear_txt_mapeado(str(ruta))[1])
+
+    pd.testing.assert_frame_equal(obtenido.movimientos, esperado.movimientos)
+    pd.testing.assert_frame_equal(obtenido.importes, esperado.importes)
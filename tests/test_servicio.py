@@ -0,0 +1,236 @@
+"""Pruebas del servicio HTTP, con el servidor escuchando en un puerto libre."""
+
+import json
+import threading
+import time
+import zipfile
+from http.client import HTTPConnection
+from io import BytesIO
+
+import pytest
+
+import servicio
+from procesador import FORMATO_CSV, ErrorProcesamiento
+from trabajos import (
+    ESTADO_CANCELADO,
+    ESTADO_EN_COLA,
+    ESTADO_EN_CURSO,
+    ESTADO_ERROR,
+    ESTADO_TERMINADO,
+    ESTADOS_FINALES,
+)
+
+# Segundos máximos que una prueba espera a un trabajo
+ESPERA = 30
+
+LIMITE = "----limite-de-prueba"
+
+
+def formulario(**campos):
+    """Cuerpo y Content-Type de un multipart/form-data con los campos (bytes)"""
+    partes = []
+    for nombre, valor in campos.items():
+        partes.append(
+            f"--{LIMITE}\r\n"
+            f'Content-Disposition: form-data; name="{nombre}"; '
+            f'filename="{nombre}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".encode() + valor + b"\r\n"
+        )
+    cuerpo = b"".join(partes) + f"--{LIMITE}--\r\n".encode()
+    return cuerpo, f"multipart/form-data; boundary={LIMITE}"
+
+
+class Cliente:
+    """Peticiones al servidor de prueba; cada una en su propia conexión"""
+
+    def __init__(self, servidor):
+        self.host, self.puerto = servidor.server_address[:2]
+
+    def pedir(self, metodo, ruta, cuerpo=None, encabezados=None):
+        """Devuelve (estado, encabezados, cuerpo) de la respuesta"""
+        conexion = HTTPConnection(self.host, self.puerto, timeout=ESPERA)
+        try:
+            conexion.request(metodo, ruta, body=cuerpo, headers=encabezados or {})
+            respuesta = conexion.getresponse()
+            return respuesta.status, respuesta.headers, respuesta.read()
+        finally:
+            conexion.close()
+
+    def json(self, metodo, ruta, **opciones):
+        estado, encabezados, cuerpo = self.pedir(metodo, ruta, **opciones)
+        return estado, encabezados, json.loads(cuerpo)
+
+    def enviar(self, **campos):
+        cuerpo, tipo = formulario(**campos)
+        return self.json(
+            "POST", "/trabajos", cuerpo=cuerpo, encabezados={"Content-Type": tipo}
+        )
+
+    def esperar(self, id_trabajo, estado_final=ESTADO_TERMINADO):
+        """Consulta el estado hasta que el trabajo llega a estado_final"""
+        limite = time.monotonic() + ESPERA
+        while time.monotonic() < limite:
+            _, _, estado = self.json("GET", f"/trabajos/{id_trabajo}")
+            if estado["estado"] == estado_final:
+                return estado
+            assert estado["estado"] not in ESTADOS_FINALES, estado
+            time.sleep(0.05)
+        pytest.fail(f"El trabajo no llegó a {estado_final}: {estado}")
+
+
+@pytest.fixture
+def iniciar():
+    """Inicia servidores en un hilo con las opciones dadas y los cierra al final"""
+    servidores = []
+
+    def _iniciar(**opciones):
+        servidor = servicio.crear_servidor(puerto=0, **opciones)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        servidores.append(servidor)
+        return Cliente(servidor)
+
+    yield _iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+@pytest.fixture
+def bloqueados(monkeypatch):
+    """Reemplaza el cruce por uno que espera al evento y termina con error"""
+    liberar = threading.Event()
+
+    def cruzar_subidos(trabajo, *args):
+        trabajo.avanzar("txt")
+        liberar.wait(ESPERA)
+        trabajo.verificar()
+        raise ErrorProcesamiento("Cruce de prueba.")
+
+    monkeypatch.setattr(servicio, "cruzar_subidos", cruzar_subidos)
+    yield liberar
+    liberar.set()
+
+
+@pytest.fixture
+def archivos(generar_libro, generar_zip_arca):
+    txt, comprobantes = generar_libro(200)
+    return {"txt": txt, "zip": generar_zip_arca(comprobantes)}
+
+
+def test_envio_consulta_y_descarga(iniciar, archivos):
+    cliente = iniciar()
+
+    estado_http, encabezados, enviado = cliente.enviar(
+        **archivos, tolerancia=b"0.5", formato=FORMATO_CSV.encode()
+    )
+
+    assert estado_http == 202
+    id_trabajo = enviado["id"]
+    assert encabezados["Location"] == f"/trabajos/{id_trabajo}"
+    estado = cliente.esperar(id_trabajo)
+    assert estado["progreso"] == 1.0
+    resumen = estado["resumen"]
+    assert resumen["mendez_no_en_arca"] > 0
+    _, _, todos = cliente.json("GET", "/trabajos")
+    assert [trabajo["id"] for trabajo in todos] == [id_trabajo]
+
+    estado_http, _, resultado = cliente.json("GET", estado["resultado"])
+    assert estado_http == 200
+    for tabla in ("arca_no_en_mendez", "mendez_no_en_arca", "sugerencias"):
+        assert len(resultado[tabla]) == resumen[tabla]
+    assert len(resultado["diferencias"]) == resumen["diferencias_de_importe"]
+    assert resultado["control_totales"]
+
+    estado_http, encabezados, contenido = cliente.pedir("GET", estado["consolidado"])
+    assert estado_http == 200
+    assert encabezados["Content-Type"] == "application/zip"
+    assert "Cruce_Consolidado_csv.zip" in encabezados["Content-Disposition"]
+    assert zipfile.ZipFile(BytesIO(contenido)).namelist()
+
+
+@pytest.mark.parametrize(
+    "campos, tipo, mensaje",
+    [
+        ({"txt": b"x"}, None, "Faltan los archivos: zip"),
+        ({"txt": b"x", "zip": b"y", "tolerancia": b"uno"}, None, "tolerancia"),
+        ({"txt": b"x", "zip": b"y", "tolerancia": b"-1"}, None, "negativa"),
+        ({"txt": b"x", "zip": b"y", "formato": b"pdf"}, None, "Formato"),
+        ({"txt": b"x", "zip": b"y"}, "application/json", "multipart"),
+    ],
+)
+def test_envio_invalido_responde_400(iniciar, campos, tipo, mensaje):
+    cliente = iniciar()
+    cuerpo, tipo_formulario = formulario(**campos)
+
+    estado_http, _, respuesta = cliente.json(
+        "POST",
+        "/trabajos",
+        cuerpo=cuerpo,
+        encabezados={"Content-Type": tipo or tipo_formulario},
+    )
+
+    assert estado_http == 400
+    assert mensaje in respuesta["error"]
+    _, _, todos = cliente.json("GET", "/trabajos")
+    assert todos == []
+
+
+@pytest.mark.parametrize("expect", [False, True])
+def test_envio_grande_responde_413_sin_leerlo(iniciar, expect):
+    cliente = iniciar(max_mb=1)
+    conexion = HTTPConnection(cliente.host, cliente.puerto, timeout=ESPERA)
+    # Solo se anuncia el tamaño: el servidor rechaza sin esperar el cuerpo
+    conexion.putrequest("POST", "/trabajos")
+    conexion.putheader("Content-Type", f"multipart/form-data; boundary={LIMITE}")
+    conexion.putheader("Content-Length", str(2**20 + 1))
+    if expect:
+        conexion.putheader("Expect", "100-continue")
+    conexion.endheaders()
+
+    respuesta = conexion.getresponse()
+
+    assert respuesta.status == 413
+    assert "1 MB" in json.loads(respuesta.read())["error"]
+    conexion.close()
+
+
+def test_cola_llena_responde_503(iniciar, bloqueados):
+    cliente = iniciar(max_en_cola=1)
+    estado_http, _, primero = cliente.enviar(txt=b"x", zip=b"y")
+    assert estado_http == 202
+
+    estado_http, encabezados, respuesta = cliente.enviar(txt=b"x", zip=b"y")
+
+    assert estado_http == 503
+    assert encabezados["Retry-After"] == str(servicio.SEGUNDOS_REINTENTO)
+    assert "reintente" in respuesta["error"]
+
+    # Al terminar el primero vuelve a haber lugar
+    bloqueados.set()
+    cliente.esperar(primero["id"], ESTADO_ERROR)
+    estado_http, _, _ = cliente.enviar(txt=b"x", zip=b"y")
+    assert estado_http == 202
+
+
+def test_delete_cancela_el_trabajo(iniciar, bloqueados):
+    cliente = iniciar(max_en_cola=2)
+    _, _, en_curso = cliente.enviar(txt=b"x", zip=b"y")
+    _, _, en_cola = cliente.enviar(txt=b"x", zip=b"y")
+    cliente.esperar(en_curso["id"], ESTADO_EN_CURSO)
+    assert en_cola["estado"] == ESTADO_EN_COLA
+
+    # El que espera en la cola se cancela enseguida
+    estado_http, _, cancelado = cliente.json("DELETE", f"/trabajos/{en_cola['id']}")
+    assert estado_http == 200
+    assert cancelado["estado"] == ESTADO_CANCELADO
+
+    # El que está en curso se cancela en su próximo punto de cancelación
+    _, _, cancelando = cliente.json("DELETE", f"/trabajos/{en_curso['id']}")
+    assert cancelando["cancelando"]
+    bloqueados.set()
+    cliente.esperar(en_curso["id"], ESTADO_CANCELADO)
+
+    # Cancelar uno que ya terminó lo olvida
+    cliente.json("DELETE", f"/trabajos/{en_curso['id']}")
+    assert cliente.json("GET", f"/trabajos/{en_curso['id']}")[0] == 404
+    assert cliente.json("DELETE", "/trabajos/inexistente")[0] == 404
@@ -0,0 +1,74 @@
+"""Pruebas de las sugerencias de coincidencia entre los faltantes."""
+
+from io import BytesIO
+
+import pytest
+
+from procesador import cruzar_comprobantes, procesar_archivo, procesar_zip_csv
+from sugerencias import sugerir_coincidencias
+
+# PV que no usa ningún comprobante generado
+PV_EQUIVOCADO = 9
+
+
+def transponer(nro):
+    """Nro con los dos últimos dígitos invertidos"""
+    texto = str(nro)
+    return int(texto[:-2] + texto[-1] + texto[-2])
+
+
+@pytest.fixture
+def errores_de_carga(generar_libro, generar_zip_arca):
+    """Sugerencias de un cruce con un Nro transpuesto y un PV equivocado en ARCA"""
+    txt, comprobantes = generar_libro(300)
+    en_arca = [dict(comprobante) for comprobante in comprobantes]
+    usados = {(c["pv"], c["nro"]) for c in en_arca}
+    # Nro cuya transposición cambia el número y no es de otro comprobante
+    transpuesto, otro_pv = [
+        c
+        for c in en_arca
+        if c["nro"] >= 10
+        and transponer(c["nro"]) != c["nro"]
+        and (c["pv"], transponer(c["nro"])) not in usados
+    ][:2]
+    originales = {
+        "Nro": (transpuesto["pv"], transpuesto["nro"]),
+        "PV": (otro_pv["pv"], otro_pv["nro"]),
+    }
+    transpuesto["nro"] = transponer(transpuesto["nro"])
+    otro_pv["pv"] = PV_EQUIVOCADO
+
+    _, libro = procesar_archivo(BytesIO(txt))
+    contenido = generar_zip_arca(en_arca, solapamiento=1.0, solo_arca=0.0)
+    df_arca = procesar_zip_csv(BytesIO(contenido))
+    cruce = cruzar_comprobantes(libro.movimientos, df_arca)
+    sugerencias = sugerir_coincidencias(
+        cruce.mendez_no_en_arca, cruce.arca_no_en_mendez
+    )
+    return sugerencias, originales, transpuesto, otro_pv
+
+
+def test_nro_transpuesto_y_pv_equivocado_quedan_primeros(errores_de_carga):
+    sugerencias, originales, transpuesto, otro_pv = errores_de_carga
+    primeras = sugerencias[
+        (sugerencias["Rango Mendez"] == 1) & (sugerencias["Rango ARCA"] == 1)
+    ]
+    pares = {
+        (int(m_pv), int(m_nro)): (int(a_pv), int(a_nro))
+        for m_pv, m_nro, a_pv, a_nro in zip(
+            primeras["PV Mendez"],
+            primeras["Nro Mendez"],
+            primeras["PV ARCA"],
+            primeras["Nro ARCA"],
+        )
+    }
+
+    assert pares == {
+        originales["Nro"]: (transpuesto["pv"], transpuesto["nro"]),
+        originales["PV"]: (PV_EQUIVOCADO, otro_pv["nro"]),
+    }
+    fila = primeras[primeras["Nro ARCA"].astype(int) == transpuesto["nro"]].iloc[0]
+    assert "Nro a 1 cambio(s)" in fila["Coincide en"]
+    fila = primeras[primeras["PV ARCA"].astype(int) == PV_EQUIVOCADO].iloc[0]
+    assert "PV" not in fila["Coincide en"].split(", ")
+    assert "Nro" in fila["Coincide en"].split(", ")
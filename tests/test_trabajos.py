@@ -0,0 +1,187 @@
+"""Pruebas de los trabajos en segundo plano y de su cola."""
+
+import gc
+import threading
+import weakref
+
+import pytest
+
+from trabajos import (
+    ESTADO_CANCELADO,
+    ESTADO_EN_COLA,
+    ESTADO_EN_CURSO,
+    ESTADO_ERROR,
+    ESTADO_TERMINADO,
+    ColaTrabajos,
+    Trabajo,
+)
+
+# Segundos máximos que una prueba espera un evento de otro hilo
+ESPERA = 10
+
+
+def esperar(trabajo):
+    trabajo.futuro.result(timeout=ESPERA)
+    assert trabajo.terminado()
+
+
+def test_trabajo_terminado_con_su_resultado():
+    pasos_vistos = []
+
+    def funcion(trabajo):
+        for paso in ("txt", "zip", "cruce"):
+            trabajo.avanzar(paso)
+            pasos_vistos.append((paso, trabajo.progreso()))
+        return 42
+
+    trabajo = Trabajo(funcion, pasos=("txt", "zip", "cruce"))
+    assert trabajo.estado == ESTADO_EN_COLA
+    assert trabajo.progreso() == 0.0
+
+    trabajo.ejecutar()
+
+    assert trabajo.estado == ESTADO_TERMINADO
+    assert trabajo.resultado == 42
+    assert pasos_vistos == [("txt", 0.0), ("zip", 1 / 3), ("cruce", 2 / 3)]
+    assert trabajo.progreso() == 1.0
+
+
+def test_avanzar_y_verificar_actualizan_el_detalle():
+    def funcion(trabajo):
+        trabajo.avanzar("txt")
+        trabajo.verificar("bloque 1 de 2")
+        detalles.append(trabajo.detalle)
+        trabajo.verificar()
+        detalles.append(trabajo.detalle)
+        trabajo.avanzar("zip")
+        detalles.append(trabajo.detalle)
+
+    detalles = []
+    trabajo = Trabajo(funcion, pasos=("txt", "zip"))
+    trabajo.ejecutar()
+
+    # verificar sin detalle conserva el anterior; un paso nuevo lo limpia
+    assert detalles == ["bloque 1 de 2", "bloque 1 de 2", None]
+    assert trabajo.paso == "zip"
+
+
+def test_error_queda_en_el_trabajo():
+    def funcion(trabajo):
+        raise ValueError("ZIP roto")
+
+    trabajo = Trabajo(funcion)
+    trabajo.ejecutar()
+
+    assert trabajo.estado == ESTADO_ERROR
+    assert str(trabajo.error) == "ZIP roto"
+    assert trabajo.resultado is None
+
+
+def test_cancelar_antes_de_empezar():
+    llamadas = []
+    trabajo = Trabajo(llamadas.append)
+
+    trabajo.cancelar()
+    assert trabajo.cancelando()
+    trabajo.ejecutar()
+
+    assert trabajo.estado == ESTADO_CANCELADO
+    assert llamadas == []
+    assert not trabajo.cancelando()
+
+
+def test_cancelar_a_mitad_de_un_paso():
+    en_paso = threading.Event()
+    cancelado = threading.Event()
+    pasos_hechos = []
+
+    def funcion(trabajo):
+        trabajo.avanzar("txt")
+        en_paso.set()
+        assert cancelado.wait(ESPERA)
+        pasos_hechos.append("txt")
+        # El paso en curso se entera en su próximo punto de verificación
+        trabajo.verificar("bloque 2")
+        pasos_hechos.append("después de verificar")
+
+    cola = ColaTrabajos()
+    trabajo = cola.enviar(funcion, pasos=("txt", "zip"))
+    assert en_paso.wait(ESPERA)
+    assert trabajo.estado == ESTADO_EN_CURSO
+
+    trabajo.cancelar()
+    assert trabajo.cancelando()
+    cancelado.set()
+    esperar(trabajo)
+
+    assert trabajo.estado == ESTADO_CANCELADO
+    assert pasos_hechos == ["txt"]
+    assert trabajo.resultado is None
+
+
+def test_cancelar_durante_el_ultimo_paso_descarta_el_resultado():
+    def funcion(trabajo):
+        trabajo.avanzar("cruce")
+        trabajo.cancelar()
+        return "resultado"
+
+    trabajo = Trabajo(funcion, pasos=("cruce",))
+    trabajo.ejecutar()
+
+    assert trabajo.estado == ESTADO_CANCELADO
+    assert trabajo.resultado is None
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_cola_respeta_los_trabajos_simultaneos(max_workers):
+    liberar = threading.Event()
+    lock = threading.Lock()
+    corriendo = []
+    maximo = []
+
+    def funcion(trabajo):
+        with lock:
+            corriendo.append(trabajo)
+            maximo.append(len(corriendo))
+        assert liberar.wait(ESPERA)
+        with lock:
+            corriendo.remove(trabajo)
+        return len(maximo)
+
+    cola = ColaTrabajos(max_workers)
+    trabajos = [cola.enviar(funcion) for _ in range(max_workers + 2)]
+
+    # Los que exceden max_workers esperan en la cola sin empezar
+    for trabajo in trabajos[max_workers:]:
+        assert trabajo.estado == ESTADO_EN_COLA
+    # Un trabajo en cola se cancela sin llegar a ejecutarse
+    trabajos[-1].cancelar()
+    assert trabajos[-1].estado == ESTADO_CANCELADO
+    assert trabajos[-1].funcion is None
+
+    liberar.set()
+    for trabajo in trabajos[:-1]:
+        esperar(trabajo)
+        assert trabajo.estado == ESTADO_TERMINADO
+    assert max(maximo) == max_workers
+    assert len(maximo) == len(trabajos) - 1
+
+
+def test_trabajo_suelta_la_funcion_al_terminar():
+    class Entradas:
+        """Representa los archivos subidos que retiene la función"""
+
+    entradas = Entradas()
+    referencia = weakref.ref(entradas)
+
+    def funcion(trabajo, entradas=entradas):
+        return len(repr(entradas))
+
+    trabajo = ColaTrabajos().enviar(funcion)
+    esperar(trabajo)
+    del entradas, funcion
+    gc.collect()
+
+    assert trabajo.funcion is None
+    assert trabajo.resultado > 0
+    assert referencia() is None
@@ -0,0 +1,110 @@
+"""Pruebas del cruce de varios TXT y varios ZIP en una sola corrida."""
+
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from procesador import (
+    COLUMNA_PERIODO,
+    cruzar_comprobantes,
+    procesar_archivo,
+    procesar_archivos,
+    procesar_zip_csv,
+    procesar_zips_csv,
+)
+
+# Dos meses del mismo cliente, con PV distintos para que no se pisen las claves
+MESES = {
+    "enero": {"movimientos": 300, "periodo": "01/2024", "puntos_de_venta": (1, 2)},
+    "febrero": {"movimientos": 250, "periodo": "02/2024", "puntos_de_venta": (3, 4)},
+}
+
+
+def sin_indice(df):
+    return df.reset_index(drop=True)
+
+
+@pytest.fixture
+def meses(generar_libro, generar_zip_arca):
+    """Por mes: TXT, ZIP y el resultado de procesarlos y cruzarlos por separado"""
+    datos = {}
+    for semilla, (nombre, opciones) in enumerate(MESES.items()):
+        opciones = dict(opciones)
+        movimientos = opciones.pop("movimientos")
+        txt, comprobantes = generar_libro(movimientos, semilla, **opciones)
+        zip_bytes = generar_zip_arca(comprobantes, semilla=semilla)
+        df_encabezado, libro = procesar_archivo(BytesIO(txt))
+        df_arca = procesar_zip_csv(BytesIO(zip_bytes))
+        cruce = cruzar_comprobantes(
+            libro.movimientos, df_arca, importes_mendez=libro.importes
+        )
+        datos[nombre] = (txt, zip_bytes, df_encabezado, libro, cruce)
+    return datos
+
+
+def test_varios_archivos_igual_que_cada_uno(meses):
+    encabezados, libro = procesar_archivos(
+        {f"{nombre}.txt": BytesIO(datos[0]) for nombre, datos in meses.items()},
+        procesos=2,
+    )
+    df_arca = procesar_zips_csv(
+        {f"{nombre}.zip": BytesIO(datos[1]) for nombre, datos in meses.items()}
+    )
+    cruce = cruzar_comprobantes(
+        libro.movimientos, df_arca, importes_mendez=libro.importes
+    )
+    separados = list(meses.values())
+
+    # Un encabezado por archivo, en el orden en que se pasaron
+    assert list(encabezados.columns) == ["enero.txt", "febrero.txt"]
+    for columna, (_, _, df_encabezado, _, _) in zip(encabezados, separados):
+        assert encabezados[columna].tolist() == df_encabezado.iloc[:, 0].tolist()
+
+    # Los movimientos de cada libro, uno detrás del otro, con su período
+    periodos = [opciones["periodo"] for opciones in MESES.values()]
+    esperado = pd.concat(
+        [
+            datos[3].movimientos.assign(**{COLUMNA_PERIODO: periodo})
+            for datos, periodo in zip(separados, periodos)
+        ],
+        ignore_index=True,
+    ).astype({COLUMNA_PERIODO: "category"})
+    pd.testing.assert_frame_equal(libro.movimientos, esperado, check_categorical=False)
+
+    # Los importes siguen apuntando a su movimiento
+    primero = len(separados[0][3].movimientos)
+    importes = libro.importes.assign(
+        movimiento=libro.importes["movimiento"].where(
+            libro.importes["movimiento"] < primero,
+            libro.importes["movimiento"] - primero,
+        )
+    )
+    pd.testing.assert_frame_equal(
+        importes,
+        pd.concat([datos[3].importes for datos in separados], ignore_index=True),
+        check_categorical=False,
+    )
+
+    # El control de cada libro, con su período adelante
+    assert list(libro.control[COLUMNA_PERIODO].unique()) == periodos
+    pd.testing.assert_frame_equal(
+        libro.control.drop(columns=COLUMNA_PERIODO),
+        pd.concat([datos[3].control for datos in separados], ignore_index=True),
+    )
+
+    # El cruce conjunto es la unión de los cruces de cada mes
+    for campo in ("arca_no_en_mendez", "mendez_no_en_arca", "diferencias"):
+        pd.testing.assert_frame_equal(
+            sin_indice(getattr(cruce, campo)).drop(
+                columns=COLUMNA_PERIODO, errors="ignore"
+            ),
+            pd.concat(
+                [getattr(datos[4], campo) for datos in separados], ignore_index=True
+            ),
+            check_categorical=False,
+            obj=campo,
+        )
+    assert len(cruce.coincidentes) == sum(
+        len(datos[4].coincidentes) for datos in separados
+    )
@@ -0,0 +1,180 @@
+"""Pruebas de los filtros y la paginación de la vista previa."""
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from conftest import libro_txt, zip_arca
+from procesador import (
+    HOJA_DIFERENCIAS,
+    HOJA_SUGERENCIAS,
+    cruzar_comprobantes,
+    procesar_archivo,
+    procesar_zip_csv,
+)
+from vista_previa import (
+    FILAS_POR_PAGINA,
+    FiltroVista,
+    cantidad_paginas,
+    opciones_tipo,
+    pagina,
+    posiciones_filtradas,
+    resumen_filtro,
+    tablas_vista,
+)
+
+
+@pytest.fixture(scope="module")
+def cruce():
+    """Cruce de un libro generado con su ZIP, compartido por las pruebas"""
+    txt, comprobantes = libro_txt(400)
+    _, libro = procesar_archivo(BytesIO(txt))
+    df_arca = procesar_zip_csv(BytesIO(zip_arca(comprobantes)))
+    resultado = cruzar_comprobantes(
+        libro.movimientos, df_arca, importes_mendez=libro.importes
+    )
+    return resultado, libro.importes
+
+
+def digitos(serie):
+    return serie.astype(str).str.replace(r"\D", "", regex=True)
+
+
+def test_cuit_parcial_por_digitos(cruce):
+    resultado, _ = cruce
+    mendez = resultado.mendez
+    cuit = mendez["CUIT"].iloc[0]
+    parcial = digitos(mendez["CUIT"]).iloc[0][2:8]
+
+    posiciones = posiciones_filtradas(mendez, FiltroVista(cuit=parcial))
+
+    esperadas = np.flatnonzero(digitos(mendez["CUIT"]).str.contains(parcial))
+    np.testing.assert_array_equal(posiciones, esperadas)
+    assert 0 in posiciones
+    # Con guiones se compara igual, solo por los dígitos
+    con_guiones = posiciones_filtradas(mendez, FiltroVista(cuit=cuit))
+    assert set(mendez["CUIT"].iloc[con_guiones]) == {cuit}
+
+
+def test_cuit_parcial_en_arca(cruce):
+    resultado, _ = cruce
+    arca = resultado.arca
+    nro_doc = arca["Nro. Doc. Emisor/Receptor"]
+    parcial = nro_doc.iloc[0][-6:]
+
+    posiciones = posiciones_filtradas(arca, FiltroVista(cuit=parcial))
+
+    esperadas = np.flatnonzero(nro_doc.str.contains(parcial))
+    np.testing.assert_array_equal(posiciones, esperadas)
+
+
+def test_rango_de_importes_incluye_los_extremos(cruce):
+    resultado, _ = cruce
+    mendez = resultado.mendez
+    # Los importes de Mendez están en centavos y el filtro va en pesos
+    totales = np.sort(mendez["Total"].to_numpy())
+    desde, hasta = totales[10], totales[-10]
+    filtro = FiltroVista(importe_min=desde / 100, importe_max=hasta / 100)
+
+    posiciones = posiciones_filtradas(mendez, filtro)
+
+    elegidos = mendez["Total"].to_numpy()[posiciones]
+    assert elegidos.min() == desde
+    assert elegidos.max() == hasta
+    fuera = np.delete(mendez["Total"].to_numpy(), posiciones)
+    assert ((fuera < desde) | (fuera > hasta)).all()
+
+    filas, total = resumen_filtro(mendez, posiciones)
+    assert filas == len(posiciones)
+    assert total == pytest.approx(elegidos.sum() / 100)
+
+
+def test_rango_de_importes_en_pesos_en_arca(cruce):
+    resultado, _ = cruce
+    arca = resultado.arca
+    solo_minimo = posiciones_filtradas(arca, FiltroVista(importe_min=100000))
+
+    assert (arca["Imp. Total"].to_numpy()[solo_minimo] >= 100000).all()
+    assert len(solo_minimo) == (arca["Imp. Total"] >= 100000).sum()
+
+
+def test_filtro_por_tipo(cruce):
+    resultado, _ = cruce
+    assert opciones_tipo(resultado.mendez) == ["FC", "NC"]
+
+    posiciones = posiciones_filtradas(resultado.mendez, FiltroVista(tipos=("NC",)))
+
+    assert len(posiciones) > 0
+    assert set(resultado.mendez["Comprobante"].iloc[posiciones]) == {"NC"}
+    # En ARCA los tipos son los códigos de comprobante
+    codigos = posiciones_filtradas(resultado.arca, FiltroVista(tipos=("3", "8")))
+    assert set(resultado.arca["Tipo de Comprobante"].iloc[codigos]) == {"3", "8"}
+
+
+def test_ultima_pagina_y_fuera_de_rango(cruce):
+    resultado, importes = cruce
+    arca = resultado.arca
+    posiciones = posiciones_filtradas(arca, FiltroVista())
+    paginas = cantidad_paginas(len(posiciones))
+    assert paginas == -(-len(arca) // FILAS_POR_PAGINA)
+
+    ultima = pagina(arca, posiciones, paginas, importes)
+    assert len(ultima) == len(arca) - (paginas - 1) * FILAS_POR_PAGINA
+    assert ultima["Número de Comprobante"].tolist() == (
+        arca["Número de Comprobante"].iloc[-len(ultima) :].tolist()
+    )
+    assert pagina(arca, posiciones, paginas + 1, importes).empty
+
+
+@pytest.mark.parametrize(
+    "filas, paginas", [(0, 1), (1, 1), (FILAS_POR_PAGINA, 1), (FILAS_POR_PAGINA + 1, 2)]
+)
+def test_cantidad_paginas(filas, paginas):
+    assert cantidad_paginas(filas) == paginas
+
+
+def test_pagina_de_mendez_en_formato_ancho_y_pesos(cruce):
+    resultado, importes = cruce
+    mendez = resultado.mendez
+    posiciones = posiciones_filtradas(mendez, FiltroVista())
+
+    primera = pagina(mendez, posiciones, 1, importes)
+
+    assert len(primera) == FILAS_POR_PAGINA
+    assert primera["Total"].tolist() == pytest.approx(
+        (mendez["Total"].iloc[:FILAS_POR_PAGINA] / 100).tolist()
+    )
+    assert len(primera.columns) > len(mendez.columns)
+
+
+def test_filtro_sin_resultados(cruce):
+    resultado, importes = cruce
+    mendez = resultado.mendez
+    filtro = FiltroVista(cuit="99999999999", importe_min=1)
+
+    posiciones = posiciones_filtradas(mendez, filtro)
+
+    assert len(posiciones) == 0
+    assert cantidad_paginas(len(posiciones)) == 1
+    vacia = pagina(mendez, posiciones, 1, importes)
+    assert vacia.empty
+    assert resumen_filtro(mendez, posiciones) == (0, 0)
+
+
+def test_tablas_en_el_orden_de_la_vista(cruce):
+    resultado, _ = cruce
+    sugerencias = resultado.mendez.head(0)
+
+    assert list(tablas_vista(resultado)) == [
+        "MENDEZ NO EN ARCA",
+        "ARCA NO EN MENDEZ",
+        HOJA_DIFERENCIAS,
+        "Mendez",
+        "ARCA",
+    ]
+    tablas = tablas_vista(resultado, sugerencias)
+    assert list(tablas)[2] == HOJA_SUGERENCIAS
+    assert tablas[HOJA_SUGERENCIAS] is sugerencias
+    # Un cruce sin importes de Mendez no tiene hoja de diferencias
+    assert HOJA_DIFERENCIAS not in tablas_vista(resultado._replace(diferencias=None))
@@ -0,0 +1,129 @@
+"""Ejecución de cruces en segundo plano, con progreso por paso y cancelación.
+
+Un Trabajo envuelve una función que recibe el propio trabajo y lo usa para
+informar en qué paso está (trabajo.avanzar). La cancelación es cooperativa:
+se pide con trabajo.cancelar() y toma efecto al empezar el paso siguiente o
+en el próximo trabajo.verificar() del paso en curso, o antes de empezar si el
+trabajo todavía está en la cola.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ESTADO_EN_COLA = "en cola"
+ESTADO_EN_CURSO = "en curso"
+ESTADO_TERMINADO = "terminado"
+ESTADO_CANCELADO = "cancelado"
+ESTADO_ERROR = "error"
+
+ESTADOS_FINALES = (ESTADO_TERMINADO, ESTADO_CANCELADO, ESTADO_ERROR)
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza dentro del trabajo cuando se pidió cancelarlo"""
+
+
+# ============================================================================
+# TRABAJOS
+# ============================================================================
+
+
+class Trabajo:
+    """Una ejecución en segundo plano con su estado, paso actual y resultado.
+
+    pasos es la secuencia de nombres de paso en el orden en que se ejecutan;
+    se usa para calcular el progreso. clave identifica las entradas del
+    trabajo, para saber si un trabajo ya existente sirve para otra ejecución.
+    """
+
+    def __init__(self, funcion, pasos=(), clave=None):
+        self.funcion = funcion
+        self.pasos = tuple(pasos)
+        self.clave = clave
+        self.estado = ESTADO_EN_COLA
+        self.paso = None
+        self.detalle = None
+        self.resultado = None
+        self.error = None
+        self.futuro = None
+        self._cancelado = threading.Event()
+
+    def ejecutar(self):
+        """Corre la función y deja el resultado, el error o la cancelación"""
+        if self._cancelado.is_set():
+            self.estado = ESTADO_CANCELADO
+            return
+        self.estado = ESTADO_EN_CURSO
+        try:
+            self.resultado = self.funcion(self)
+        except TrabajoCancelado:
+            self.estado = ESTADO_CANCELADO
+        except Exception as e:
+            self.error = e
+            self.estado = ESTADO_ERROR
+        else:
+            # Un pedido de cancelación que llegó durante el último paso
+            # también descarta el resultado
+            if self._cancelado.is_set():
+                self.resultado = None
+                self.estado = ESTADO_CANCELADO
+            else:
+                self.estado = ESTADO_TERMINADO
+        finally:
+            # La función suele retener las entradas (archivos subidos): se
+            # suelta para no conservarlas mientras se guarda el resultado
+            self.funcion = None
+
+    def avanzar(self, paso):
+        """Marca el comienzo de un paso; lanza TrabajoCancelado si se pidió cancelar"""
+        self.verificar()
+        self.paso = paso
+        self.detalle = None
+
+    def verificar(self, detalle=None):
+        """Punto de cancelación dentro de un paso; detalle describe por dónde va"""
+        if self._cancelado.is_set():
+            raise TrabajoCancelado()
+        if detalle is not None:
+            self.detalle = detalle
+
+    def cancelar(self):
+        """Pide cancelar el trabajo; si todavía no empezó, no llega a ejecutarse"""
+        self._cancelado.set()
+        if self.futuro is not None and self.futuro.cancel():
+            # Nunca va a correr: también suelta la función y sus entradas
+            self.funcion = None
+            self.estado = ESTADO_CANCELADO
+
+    def cancelando(self):
+        """Indica si se pidió cancelar y el trabajo todavía no terminó"""
+        return self._cancelado.is_set() and not self.terminado()
+
+    def terminado(self):
+        """Indica si el trabajo ya terminó (bien, con error o cancelado)"""
+        return self.estado in ESTADOS_FINALES
+
+    def progreso(self):
+        """Fracción de pasos completados, entre 0 y 1"""
+        if self.estado == ESTADO_TERMINADO:
+            return 1.0
+        if self.paso not in self.pasos:
+            return 0.0
+        return self.pasos.index(self.paso) / len(self.pasos)
+
+
+class ColaTrabajos:
+    """Pool de hilos que ejecuta los trabajos en orden de llegada.
+
+    Los trabajos que exceden max_workers esperan en la cola con estado
+    ESTADO_EN_COLA hasta que se libera un hilo.
+    """
+
+    def __init__(self, max_workers=1):
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="cruce")
+
+    def enviar(self, funcion, pasos=(), clave=None):
+        """Encola funcion(trabajo) y devuelve el Trabajo"""
+        trabajo = Trabajo(funcion, pasos, clave)
+        trabajo.futuro = self.pool.submit(trabajo.ejecutar)
+        return trabajo
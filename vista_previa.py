@@ -0,0 +1,151 @@
+"""Vista previa paginada y filtrable de los resultados del cruce.
+
+Los filtros se aplican sobre los DataFrames del cruce ya en memoria y
+devuelven posiciones; solo las filas de la página pedida se pasan a formato
+ancho y a pesos para mostrarlas, sin generar el consolidado.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from almacen import COLUMNAS_ARCA, normalizar_cuit
+from procesador import (
+    HOJA_DIFERENCIAS,
+    HOJA_SUGERENCIAS,
+    formato_ancho,
+    importes_en_pesos,
+)
+
+# Conjuntos de resultados del cruce, con el nombre de su hoja del consolidado
+HOJAS_VISTA = {
+    "MENDEZ NO EN ARCA": "mendez_no_en_arca",
+    "ARCA NO EN MENDEZ": "arca_no_en_mendez",
+    HOJA_DIFERENCIAS: "diferencias",
+    "Mendez": "mendez",
+    "ARCA": "arca",
+}
+
+FILAS_POR_PAGINA = 50
+
+# Columnas por las que se filtra cada tabla: CUIT, tipo de comprobante (None
+# si la tabla no lo tiene) e importe total (en centavos en las de Mendez, en
+# pesos en las demás)
+ColumnasFiltro = namedtuple("ColumnasFiltro", ["cuit", "tipo", "importe", "centavos"])
+
+COLUMNAS_FILTRO_MENDEZ = ColumnasFiltro("CUIT", "Comprobante", "Total", True)
+COLUMNAS_FILTRO_ARCA = ColumnasFiltro(
+    COLUMNAS_ARCA["nro_doc"], "Tipo de Comprobante", "Imp. Total", False
+)
+COLUMNAS_FILTRO_DIFERENCIAS = ColumnasFiltro(
+    "CUIT Mendez", "Comprobante", "Total Mendez", False
+)
+COLUMNAS_FILTRO_SUGERENCIAS = ColumnasFiltro("CUIT Mendez", None, "Total Mendez", False)
+
+# Filtros de la vista previa; None o vacío no filtra. Los importes van en pesos
+FiltroVista = namedtuple(
+    "FiltroVista",
+    ["cuit", "tipos", "importe_min", "importe_max"],
+    defaults=("", (), None, None),
+)
+
+
+# ============================================================================
+# FILTROS
+# ============================================================================
+
+
+def columnas_filtro(df):
+    """Columnas de filtro de la tabla según de qué resultado del cruce sea"""
+    if "Jurisdiccion" in df.columns:
+        return COLUMNAS_FILTRO_MENDEZ
+    if "Difiere en" in df.columns:
+        return COLUMNAS_FILTRO_DIFERENCIAS
+    if "Coincide en" in df.columns:
+        return COLUMNAS_FILTRO_SUGERENCIAS
+    cuit = next((col for col in COLUMNAS_FILTRO_ARCA.cuit if col in df.columns), None)
+    return COLUMNAS_FILTRO_ARCA._replace(cuit=cuit)
+
+
+def opciones_tipo(df):
+    """Tipos de comprobante presentes en la tabla, para elegir en el filtro"""
+    tipo = columnas_filtro(df).tipo
+    if tipo is None:
+        return []
+    return sorted(df[tipo].dropna().astype(str).unique())
+
+
+def posiciones_filtradas(df, filtro):
+    """Devuelve las posiciones (iloc) de las filas que cumplen el filtro.
+
+    El CUIT se compara solo por sus dígitos y puede ser parcial; los tipos
+    son los valores de la columna de tipo de comprobante de la tabla.
+    """
+    columnas = columnas_filtro(df)
+    mascara = np.ones(len(df), dtype=bool)
+
+    digitos = normalizar_cuit(filtro.cuit or "")
+    if digitos and columnas.cuit is not None:
+        cuits = df[columnas.cuit].astype("string").str.replace("-", "", regex=False)
+        mascara &= cuits.str.contains(digitos, regex=False).fillna(False).to_numpy()
+
+    if filtro.tipos and columnas.tipo is not None:
+        mascara &= df[columnas.tipo].astype(str).isin(filtro.tipos).to_numpy()
+
+    importe = df[columnas.importe].to_numpy()
+    escala = 100 if columnas.centavos else 1
+    if filtro.importe_min is not None:
+        mascara &= importe >= round(filtro.importe_min * escala, 2)
+    if filtro.importe_max is not None:
+        mascara &= importe <= round(filtro.importe_max * escala, 2)
+
+    return np.flatnonzero(mascara)
+
+
+# ============================================================================
+# PÁGINAS
+# ============================================================================
+
+
+def cantidad_paginas(filas, filas_por_pagina=FILAS_POR_PAGINA):
+    """Cantidad de páginas para mostrar las filas (al menos una)"""
+    return max(1, -(-filas // filas_por_pagina))
+
+
+def pagina(df, posiciones, numero, importes_mendez, filas_por_pagina=FILAS_POR_PAGINA):
+    """Devuelve la página numero (desde 1) de las filas filtradas, lista para mostrar.
+
+    Las tablas de Mendez se pasan a formato ancho con importes_mendez y los
+    importes en centavos, a pesos, igual que en el consolidado.
+    """
+    inicio = (numero - 1) * filas_por_pagina
+    filas = df.iloc[posiciones[inicio : inicio + filas_por_pagina]]
+    if "Jurisdiccion" in filas.columns:
+        filas = formato_ancho(filas, importes_mendez)
+    return importes_en_pesos(filas)
+
+
+def tablas_vista(cruce, sugerencias=None):
+    """Devuelve el dict nombre -> DataFrame de los resultados del cruce.
+
+    Las sugerencias de coincidencia, si se pasan, van después de los
+    faltantes.
+    """
+    tablas = {
+        nombre: getattr(cruce, campo)
+        for nombre, campo in HOJAS_VISTA.items()
+        if getattr(cruce, campo) is not None
+    }
+    if sugerencias is None:
+        return tablas
+    orden = list(tablas)
+    orden.insert(orden.index("ARCA NO EN MENDEZ") + 1, HOJA_SUGERENCIAS)
+    return {nombre: tablas.get(nombre, sugerencias) for nombre in orden}
+
+
+def resumen_filtro(df, posiciones):
+    """Cantidad de filas filtradas y suma de su importe total, en pesos"""
+    columnas = columnas_filtro(df)
+    total = pd.Series(df[columnas.importe].to_numpy()[posiciones]).sum()
+    return len(posiciones), total / 100 if columnas.centavos else total